@@ -0,0 +1,293 @@
+"""
+Benchmark del motor de búsqueda: mide nodos por segundo de minimax en posiciones de medio juego.
+Con --max-pip las posiciones son del doble nueve o del doble doce, y --latency mide cuánto tarda
+cada decisión de la máquina en partidas de ese juego. --startup mide lo que tarda en importarse el
+motor y en responder su primer movimiento un proceso nuevo de un pool.
+Uso: python benchmark.py [--depth 4] [--positions 5] [--seed 1] [--ordering] [--workers N] [--draws]
+                        [--inference GAMES] [--latency GAMES] [--time-budget 1] [--max-pip 9]
+                        [--startup ROUNDS]
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+
+from endgame import is_endgame
+import engine
+import game
+from metrics import percentile
+import selfplay
+
+IMPORT_SCRIPT = "from time import perf_counter; start = perf_counter(); import engine; print(perf_counter() - start)"
+
+
+def random_midgame(rng, hand_size=5, opponent_tiles=5, uncertain_size=15, tables=game.DEFAULT_TABLES):
+    """
+    Genera una posición de medio juego con fichas repartidas al azar.
+    :param rng: Generador de números aleatorios.
+    :param tables: DominoTables del juego de fichas.
+    :return: Un objeto Board listo para buscar con MAX al turno.
+    """
+    indices = list(range(len(tables.tiles)))
+    rng.shuffle(indices)
+    hand = indices[:hand_size]
+    uncertain = indices[hand_size:hand_size + uncertain_size]
+    played = indices[hand_size + uncertain_size:]
+    left = tables.tiles[played[0]][0]
+    right = tables.tiles[played[-1]][1]
+    mask = lambda tiles: sum(1 << i for i in tiles)
+    return game.Board(left, right, mask(hand), opponent_tiles, mask(uncertain), mask(played), tables=tables)
+
+
+def random_draw_heavy(rng, hand_size=4, opponent_tiles=5, tables=game.DEFAULT_TABLES):
+    """
+    Genera una posición en la que MAX no tiene fichas jugables y el pozo está lleno: la búsqueda
+    empieza en un nodo de azar y vuelve a robar en muchas ramas.
+    :param tables: DominoTables del juego de fichas.
+    :return: Un objeto Board con MAX al turno.
+    """
+    mask = lambda tiles: sum(1 << i for i in tiles)
+    while True:
+        indices = list(range(len(tables.tiles)))
+        rng.shuffle(indices)
+        played = indices[:rng.randint(2, 6)]
+        left = tables.tiles[played[0]][0]
+        right = tables.tiles[played[-1]][1]
+        open_mask = tables.open_masks[left][right]
+        rest = indices[len(played):]
+        hand = [tile for tile in rest if not (open_mask >> tile) & 1][:hand_size]
+        if len(hand) == hand_size:
+            uncertain = [tile for tile in rest if tile not in hand]
+            return game.Board(left, right, mask(hand), opponent_tiles, mask(uncertain), mask(played), tables=tables)
+
+
+def count_nodes(board, depth, **search_options):
+    """
+    Ejecuta minimax contando cada nodo visitado.
+    :param search_options: Argumentos adicionales para minimax (tabla, ordering, first_move...).
+    :return: Número de nodos y tiempo transcurrido en segundos.
+    """
+    counter = game.NodeCounter()
+    start = perf_counter()
+    counter.minimax(board, depth, True, float('-inf'), float('inf'), **search_options)
+    elapsed = perf_counter() - start
+    return counter.nodes, elapsed
+
+
+class UnorderedMoves(game.MoveOrdering):
+    """
+    Referencia para comparar el orden de movimientos: cuenta los cortes pero solo adelanta el
+    movimiento de la variación principal, como minimax sin ordering.
+    """
+
+    def order(self, moves, ply, maximizing, first_move, board):
+        game.put_first(moves, first_move)
+
+    def order_draws(self, tiles, board):
+        pass
+
+
+def compare_ordering(positions, depth):
+    """
+    Busca cada posición por profundización iterativa con y sin orden de movimientos y compara la
+    última iteración: nodos, cortes en el primer movimiento y factor de ramificación efectivo.
+    """
+    for label, ordering in (("Sin orden", UnorderedMoves()), ("Con orden", game.MoveOrdering())):
+        total_nodes = cutoffs = first_move_cutoffs = 0
+        for board in positions:
+            ordering.new_search()
+            best_move = None
+            for iteration in range(1, depth):
+                _, best_move = game.minimax(board, iteration, True, float('-inf'), float('inf'),
+                                            first_move=best_move, ordering=ordering)
+            ordering.cutoffs = ordering.first_move_cutoffs = 0
+            nodes, _ = count_nodes(board, depth, first_move=best_move, ordering=ordering)
+            total_nodes += nodes
+            cutoffs += ordering.cutoffs
+            first_move_cutoffs += ordering.first_move_cutoffs
+        branching = (total_nodes / len(positions)) ** (1 / depth)
+        first_rate = first_move_cutoffs / max(cutoffs, 1)
+        print(f"{label}: {total_nodes} nodos, {cutoffs} cortes, "
+              f"{first_rate:.1%} en el primer movimiento, ramificación efectiva {branching:.2f}")
+
+
+def compare_parallel(positions, depth, max_workers):
+    """
+    Mide el tiempo de búsqueda de las posiciones con 1, 2, 4... procesos en la raíz y la
+    aceleración respecto a minimax en serie. Ambos usan tabla de transposición.
+    """
+    start = perf_counter()
+    for board in positions:
+        game.minimax(board, depth, True, float('-inf'), float('inf'), game.TranspositionTable())
+    serial_time = perf_counter() - start
+    print(f"Serie: {serial_time:.3f} s")
+
+    workers = 2
+    while workers <= max_workers:
+        domino_set = positions[0].tables.domino_set
+        with ProcessPoolExecutor(max_workers=workers, initializer=game.init_search_worker,
+                                 initargs=(domino_set,)) as executor:
+            executor.submit(game.init_search_worker, domino_set).result()  # Arranca los procesos antes de medir
+            start = perf_counter()
+            for board in positions:
+                game.parallel_minimax(board, depth, executor, workers, game.TranspositionTable())
+            elapsed = perf_counter() - start
+        print(f"{workers} procesos: {elapsed:.3f} s (aceleración {serial_time / elapsed:.2f}x)")
+        workers *= 2
+
+
+def compare_inference(games, depth, seed, domino_set=game.DOUBLE_SIX):
+    """
+    Graba partidas de autojuego con semilla y busca cada posición en la que el OpponentTracker
+    excluye fichas del oponente, con y sin esa información: nodos y respuestas de MIN en la raíz.
+    """
+    positions = []
+    for index in range(games):
+        selfplay.play_game(['greedy', 'random'], seed + index, positions=positions, domino_set=domino_set)
+    positions = [board for board in positions
+                 if board.candidates != board.uncertain and not is_endgame(board) and not board.is_game_over()]
+
+    for label, use_candidates in (("Sin inferencia", False), ("Con inferencia", True)):
+        total_nodes, total_time, replies = 0, 0.0, 0
+        for board in positions:
+            if not use_candidates:
+                board = game.Board(*board.pack()[:6], tables=board.tables)
+            replies += len(board.get_legal_moves("MIN")[0])
+            nodes, elapsed = count_nodes(board, depth, table=game.TranspositionTable(), ordering=game.MoveOrdering())
+            total_nodes += nodes
+            total_time += elapsed
+        print(f"{label}: {len(positions)} posiciones, {total_nodes} nodos en {total_time:.3f} s, "
+              f"{replies / len(positions):.2f} respuestas de MIN por posición")
+
+
+def measure_latency(games, depth, time_budget, seed, domino_set=game.DOUBLE_SIX):
+    """
+    Latencia de la decisión de la máquina en partidas del juego de fichas actual: cada posición de
+    partidas greedy contra random y greedy contra greedy (que llegan a finales más grandes) se decide como en machine_move, con el Engine de minimax sin libro
+    (final exacto con plazo y profundización iterativa hasta depth o hasta agotar time_budget
+    segundos). Los finales se cuentan también aparte.
+    """
+    positions = []
+    for index in range(games):
+        for agents in (['greedy', 'random'], ['greedy', 'greedy']):
+            selfplay.play_game(agents, seed + index, positions=positions, domino_set=domino_set)
+    positions = [board for board in positions if not board.is_game_over()]
+
+    searcher = engine.Engine('minimax', opening_book=False, max_depth=depth, domino_set=domino_set)
+    latencies, depths, endgames = [], [], []
+    for board in positions:
+        _, stats = searcher.choose_move(board, time_budget)
+        latencies.append(stats.elapsed)
+        if is_endgame(board):
+            endgames.append(stats.elapsed)
+        if stats.depth is not None:
+            depths.append(stats.depth)
+    searcher.close()
+    max_pip, hand_size = domino_set
+    print(f"Doble {max_pip} ({len(searcher.tables.tiles)} fichas, manos de {hand_size}): {len(positions)} decisiones, "
+          f"p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p95 {percentile(latencies, 0.95) * 1000:.1f} ms, "
+          f"máximo {max(latencies) * 1000:.1f} ms, profundidad media {sum(depths) / len(depths):.2f} "
+          f"(máxima {depth}, {time_budget} s por decisión)")
+    if endgames:
+        print(f"  Finales: {len(endgames)} decisiones, p95 {percentile(endgames, 0.95) * 1000:.1f} ms, "
+              f"máximo {max(endgames) * 1000:.1f} ms")
+
+
+def measure_startup(rounds, time_budget, seed, domino_set=game.DOUBLE_SIX):
+    """
+    Arranque del motor en procesos nuevos: tiempo de importar engine en un intérprete nuevo y, con
+    cada método de inicio de multiprocessing, tiempo desde crear un pool de un proceso (con
+    engine.init_worker) hasta recibir su primer movimiento, comparado con el segundo movimiento del
+    mismo proceso. Los dos movimientos son de posiciones distintas de medio juego.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    imports = [float(subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=here, capture_output=True,
+                                    text=True, check=True).stdout) for _ in range(rounds)]
+    print(f"Importar engine: mediana {statistics.median(imports) * 1000:.1f} ms en {rounds} intérpretes nuevos")
+
+    rng = random.Random(seed)
+    for method in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context(method)
+        firsts, warms = [], []
+        for _ in range(rounds):
+            tables = game.domino_tables(domino_set)
+            first_board = random_midgame(rng, tables=tables).pack()
+            second_board = random_midgame(rng, tables=tables).pack()
+            start = perf_counter()
+            with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=engine.init_worker,
+                                     initargs=('minimax', domino_set)) as executor:
+                executor.submit(engine.choose_move, first_board, time_budget).result()
+                firsts.append(perf_counter() - start)
+                start = perf_counter()
+                executor.submit(engine.choose_move, second_board, time_budget).result()
+                warms.append(perf_counter() - start)
+        print(f"{method}: primer movimiento {statistics.median(firsts) * 1000:.1f} ms desde crear el pool, "
+              f"segundo {statistics.median(warms) * 1000:.1f} ms (medianas de {rounds}, {time_budget} s por movimiento)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--positions", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--ordering", action="store_true", help="Compara la búsqueda con y sin orden de movimientos")
+    parser.add_argument("--workers", type=int, default=0, help="Compara la búsqueda paralela hasta N procesos")
+    parser.add_argument("--draws", action="store_true",
+                        help="Mide posiciones en las que MAX debe robar (nodos de azar) en lugar de medio juego")
+    parser.add_argument("--inference", type=int, default=0,
+                        help="Compara la búsqueda con y sin inferencia sobre el oponente en GAMES partidas grabadas")
+    parser.add_argument("--latency", type=int, default=0,
+                        help="Mide la latencia por decisión de la máquina en GAMES partidas grabadas")
+    parser.add_argument("--time-budget", type=float, default=1.0, help="Segundos por decisión con --latency")
+    parser.add_argument("--max-pip", type=int, choices=sorted(game.DOMINO_SETS), default=6,
+                        help="Juego de fichas: doble seis, doble nueve o doble doce")
+    parser.add_argument("--startup", type=int, default=0, metavar="ROUNDS",
+                        help="Mide la importación del motor y el primer movimiento de un proceso nuevo")
+    args = parser.parse_args()
+
+    domino_set = game.DOMINO_SETS[args.max_pip]
+    tables = game.domino_tables(domino_set)
+    rng = random.Random(args.seed)
+    if args.latency:
+        measure_latency(args.latency, args.depth, args.time_budget, args.seed, domino_set)
+        return
+    if args.startup:
+        measure_startup(args.startup, args.time_budget, args.seed, domino_set)
+        return
+    if args.inference:
+        compare_inference(args.inference, args.depth, args.seed, domino_set)
+        return
+    if args.draws:
+        total_nodes, total_time = 0, 0.0
+        for _ in range(args.positions):
+            nodes, elapsed = count_nodes(random_draw_heavy(rng, tables=tables), args.depth, table=game.TranspositionTable(),
+                                         ordering=game.MoveOrdering())
+            total_nodes += nodes
+            total_time += elapsed
+        print(f"Robo, profundidad {args.depth}: {total_nodes} nodos en {total_time:.3f} s "
+              f"({total_nodes / total_time:.0f} nodos/s)")
+        return
+    if args.ordering:
+        compare_ordering([random_midgame(rng, tables=tables) for _ in range(args.positions)], args.depth)
+        return
+    if args.workers:
+        compare_parallel([random_midgame(rng, tables=tables) for _ in range(args.positions)], args.depth,
+                         args.workers)
+        return
+
+    total_nodes, total_time = 0, 0.0
+    for _ in range(args.positions):
+        nodes, elapsed = count_nodes(random_midgame(rng, tables=tables), args.depth)
+        total_nodes += nodes
+        total_time += elapsed
+    print(f"Profundidad {args.depth}: {total_nodes} nodos en {total_time:.3f} s "
+          f"({total_nodes / total_time:.0f} nodos/s)")
+
+
+if __name__ == "__main__":
+    main()
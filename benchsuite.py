@@ -0,0 +1,309 @@
+"""
+Suite de benchmarks reproducible del motor: un corpus fijo de posiciones (apertura, medio juego con
+pozo grande, final con el pozo vacío y posiciones de robo), operaciones básicas por segundo, nodos
+por segundo, latencia p50/p95 de la decisión a profundidades fijas y memoria máxima. El resultado
+se escribe en JSON y se compara con una línea base guardada: si algo empeora más que la
+tolerancia, el programa lo indica y termina con código 1. No usa red ni dependencias externas.
+Uso: python benchsuite.py [--depths 2 4] [--output resultado.json] [--baseline benchmark_baseline.json]
+                          [--save-baseline] [--tolerance 0.5] [--make-corpus]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+from time import perf_counter
+import tracemalloc
+
+from benchmark import random_draw_heavy, random_midgame
+from endgame import EndgameSolver, is_endgame
+import game
+from metrics import percentile
+import selfplay
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS_PATH = os.path.join(HERE, 'benchmark_corpus.json')
+BASELINE_PATH = os.path.join(HERE, 'benchmark_baseline.json')
+CATEGORIES = ('opening', 'midgame', 'endgame', 'draws')
+POSITIONS_PER_CATEGORY = 20
+DEFAULT_DEPTHS = (2, 4)
+DEFAULT_TOLERANCE = 0.5  # Los tiempos varían de una corrida a otra; los nodos son deterministas
+TIMING_ROUNDS = 3
+MIN_ROUND_SECONDS = 0.02
+MEMORY_POSITIONS = 5
+LATENCY_FLOOR = 0.001  # Diferencias de latencia menores que esto (segundos) no cuentan como regresión
+SUITE_TABLE_BYTES = 2 ** 20
+
+
+def make_corpus(seed=2024):
+    """
+    Genera el corpus de posiciones con semilla fija.
+    :return: Diccionario categoría -> lista de Board.pack().
+    """
+    rng = random.Random(seed)
+    rules = game.DominoRules()
+    corpus = {'opening': [], 'midgame': [], 'endgame': [], 'draws': []}
+    for index in range(POSITIONS_PER_CATEGORY):
+        rules.deal_dominoes(random.Random(seed + index))
+        corpus['opening'].append(rules.board_view(rules.player2, rules.player1).pack())
+        corpus['midgame'].append(random_midgame(rng, hand_size=5, opponent_tiles=5, uncertain_size=15).pack())
+        corpus['draws'].append(random_draw_heavy(rng).pack())
+
+    # Los finales salen de partidas de autojuego: con el pozo vacío y al menos tres fichas por mano
+    positions = []
+    game_seed = seed
+    while len(corpus['endgame']) < POSITIONS_PER_CATEGORY:
+        positions.clear()
+        selfplay.play_game(['greedy', 'random'], game_seed, positions=positions)
+        game_seed += 1
+        for board in positions:
+            if is_endgame(board) and board.hand.bit_count() >= 3 and board.num_opponent_tiles >= 3:
+                corpus['endgame'].append(board.pack())
+                break
+    return corpus
+
+
+def load_corpus(path=CORPUS_PATH):
+    """
+    Lee el corpus guardado.
+    :return: Diccionario categoría -> lista de Board.
+    """
+    with open(path) as stream:
+        packed = json.load(stream)
+    return {category: [game.Board.unpack(board) for board in packed[category]] for category in CATEGORIES}
+
+
+def best_time(function, rounds=TIMING_ROUNDS):
+    """
+    Tiempo por llamada de function, sin argumentos. Cada ronda repite la llamada hasta durar al
+    menos MIN_ROUND_SECONDS, como timeit.autorange, y se toma la ronda más rápida: en una máquina
+    compartida el mínimo es la medición menos afectada por el ruido.
+    """
+    number = 1
+    while True:
+        start = perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = perf_counter() - start
+        if elapsed >= MIN_ROUND_SECONDS:
+            break
+        number *= 2
+    best = elapsed
+    for _ in range(rounds - 1):
+        start = perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, perf_counter() - start)
+    return best / number
+
+
+def ops_per_second(operation, boards):
+    """
+    Operaciones por segundo de operation aplicada a cada tablero.
+    """
+    def run():
+        for board in boards:
+            operation(board)
+    return len(boards) / best_time(run)
+
+
+def first_move(board):
+    moves, draw_list = board.get_legal_moves("MAX")
+    if moves[0] == 'draw':
+        return "draw", draw_list[0]
+    return moves[0], None
+
+
+def make_unmake(state):
+    move, drawn_tile = first_move(state)
+    state.make(move, 'MAX', drawn_tile)
+    state.unmake()
+
+
+def micro_benchmarks(corpus):
+    """
+    Operaciones por segundo de las funciones básicas de Board sobre todo el corpus.
+    """
+    boards = [board for category in CATEGORIES for board in corpus[category]]
+    moves = [first_move(board) for board in boards]
+    states = [game.SearchState(board) for board in boards]
+    pairs = list(zip(boards, moves))
+    return {
+        'get_legal_moves_max': ops_per_second(lambda board: board.get_legal_moves("MAX"), boards),
+        'get_legal_moves_min': ops_per_second(lambda board: board.get_legal_moves("MIN"), boards),
+        'make_move': ops_per_second(lambda pair: pair[0].make_move(pair[1][0], 'MAX', pair[1][1]), pairs),
+        'make_unmake': ops_per_second(make_unmake, states),
+        'heuristica': ops_per_second(lambda board: board.heuristica(), boards),
+    }
+
+
+def decide(board, depth, table):
+    """
+    Una decisión de la máquina: profundización iterativa hasta depth con tabla vacía, como la del Engine.
+    """
+    table.clear()
+    return game.iterative_deepening(board, float('inf'), table, max_depth=depth)
+
+
+def search(board, depth, table):
+    """
+    Un minimax a profundidad fija desde la raíz. A diferencia de decide, no se detiene en los
+    movimientos forzados, así que las posiciones de robo sí recorren los nodos de azar.
+    """
+    table.clear()
+    return game.minimax(board, depth, True, float('-inf'), float('inf'), table)
+
+
+def search_benchmarks(boards, depth, table):
+    """
+    Nodos, nodos por segundo y memoria máxima del minimax a profundidad fija, y latencia por
+    decisión de una categoría. Los nodos se cuentan en una pasada aparte para que el contador
+    no afecte los tiempos.
+    """
+    counter = game.NodeCounter()
+    for board in boards:
+        table.clear()
+        counter.minimax(board, depth, True, float('-inf'), float('inf'), table)
+
+    seconds = best_time(lambda: [search(board, depth, table) for board in boards])
+
+    # tracemalloc hace lenta la búsqueda: la memoria se mide solo en las primeras posiciones
+    tracemalloc.start()
+    for board in boards[:MEMORY_POSITIONS]:
+        search(board, depth, table)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies = [best_time(lambda: decide(board, depth, table)) for board in boards]
+
+    return {
+        'nodes': counter.nodes,
+        'seconds': seconds,
+        'nodes_per_second': counter.nodes / seconds if seconds else 0.0,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'peak_kib': peak / 1024,
+    }
+
+
+def endgame_benchmarks(boards):
+    """
+    Latencia del solucionador exacto en las posiciones de final, con la memoización vacía en cada una.
+    """
+    latencies = [best_time(lambda: EndgameSolver().solve(board)) for board in boards]
+    return {'p50': percentile(latencies, 0.50), 'p95': percentile(latencies, 0.95)}
+
+
+def run_suite(corpus, depths=DEFAULT_DEPTHS):
+    """
+    Ejecuta la suite completa sobre el corpus.
+    :return: Diccionario serializable en JSON con los resultados.
+    """
+    table = game.TranspositionTable(SUITE_TABLE_BYTES)
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'micro': micro_benchmarks(corpus),
+        'search': {},
+        'endgame_solver': endgame_benchmarks(corpus['endgame']),
+    }
+    for category in CATEGORIES:
+        results['search'][category] = {f"depth {depth}": search_benchmarks(corpus[category], depth, table)
+                                       for depth in depths}
+    results['max_rss_kib'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return results
+
+
+# Métrica -> True si un valor mayor es mejor
+HIGHER_IS_BETTER = {'nodes_per_second': True, 'nodes': False, 'p50': False, 'p95': False, 'peak_kib': False}
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compara los resultados con la línea base.
+    :return: Lista de mensajes, uno por cada métrica que empeoró más que la tolerancia.
+    """
+    regressions = []
+
+    def check(name, value, base, higher_is_better, allowed, floor=0.0):
+        if not base or abs(value - base) < floor:
+            return
+        change = (value - base) / base
+        if (higher_is_better and change < -allowed) or (not higher_is_better and change > allowed):
+            regressions.append(f"{name}: {base:.6g} -> {value:.6g} ({change:+.0%})")
+
+    for name, base in baseline.get('micro', {}).items():
+        if name in results['micro']:
+            check(f"micro {name}", results['micro'][name], base, True, tolerance)
+    for category, depths in baseline.get('search', {}).items():
+        for depth, metrics in depths.items():
+            current = results['search'].get(category, {}).get(depth)
+            if current is None:
+                continue
+            for metric, higher_is_better in HIGHER_IS_BETTER.items():
+                # Los nodos no dependen de la máquina: cualquier aumento es una regresión del algoritmo
+                allowed = 0.0 if metric == 'nodes' else tolerance
+                floor = LATENCY_FLOOR if metric in ('p50', 'p95') else 0.0
+                check(f"{category} {depth} {metric}", current[metric], metrics[metric], higher_is_better, allowed,
+                      floor)
+    for metric in ('p50', 'p95'):
+        base = baseline.get('endgame_solver', {}).get(metric)
+        check(f"endgame_solver {metric}", results['endgame_solver'][metric], base, False, tolerance, LATENCY_FLOOR)
+    return regressions
+
+
+def print_summary(results):
+    micro = results['micro']
+    print("Operaciones por segundo: " + ", ".join(f"{name} {value:.0f}" for name, value in micro.items()))
+    for category, depths in results['search'].items():
+        for depth, metrics in depths.items():
+            print(f"{category:8} {depth}: {metrics['nodes']:8d} nodos, {metrics['nodes_per_second']:8.0f} nodos/s, "
+                  f"p50 {1000 * metrics['p50']:8.2f} ms, p95 {1000 * metrics['p95']:8.2f} ms, "
+                  f"pico {metrics['peak_kib']:8.1f} KiB")
+    solver = results['endgame_solver']
+    print(f"Final exacto: p50 {1000 * solver['p50']:.2f} ms, p95 {1000 * solver['p95']:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depths", type=int, nargs='+', default=list(DEFAULT_DEPTHS))
+    parser.add_argument("--output", default=None, help="Archivo JSON con los resultados")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Línea base con la que se comparan")
+    parser.add_argument("--save-baseline", action="store_true", help="Guarda los resultados como línea base")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Empeoramiento relativo permitido en tiempos y memoria")
+    parser.add_argument("--make-corpus", action="store_true", help="Regenera el corpus de posiciones")
+    args = parser.parse_args()
+
+    if args.make_corpus:
+        with open(CORPUS_PATH, 'w') as stream:
+            json.dump(make_corpus(), stream)
+        print(f"Corpus guardado en {CORPUS_PATH}")
+        return
+
+    results = run_suite(load_corpus(), args.depths)
+    print_summary(results)
+    if args.output:
+        with open(args.output, 'w') as stream:
+            json.dump(results, stream, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as stream:
+            json.dump(results, stream, indent=2)
+        print(f"Línea base guardada en {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as stream:
+            regressions = compare(results, json.load(stream), args.tolerance)
+        if regressions:
+            print("REGRESIONES respecto a la línea base:")
+            for message in regressions:
+                print("  " + message)
+            sys.exit(1)
+        print("Sin regresiones respecto a la línea base.")
+
+
+if __name__ == "__main__":
+    main()
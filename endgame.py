@@ -0,0 +1,132 @@
+"""
+Solucionador exacto del final de la partida.
+Cuando el pozo está vacío ya no se roba y la mano del oponente queda determinada: son todas las
+fichas inciertas, las que no están en nuestra mano ni en la mesa. La partida es entonces de
+información perfecta y se resuelve hasta el final, memoizando el resultado de cada estado.
+"""
+from collections import namedtuple
+from time import time
+
+from game import EMPTY, SearchTimeout, mask_to_indices
+from pimc import place_tile
+
+# Resultado para MAX: 1 gana, 0 tranque (empate), -1 pierde; y los puntos que quedan en cada mano al final
+EndgameResult = namedtuple('EndgameResult', 'move outcome hand_pips opponent_pips')
+MEMO_ENTRIES = 2 ** 18  # Estados memoizados a partir de los cuales la tabla se vacía antes de resolver
+DEADLINE_CHECK = 1023  # El plazo se consulta cada DEADLINE_CHECK + 1 estados: negamax es más barato que time()
+
+
+def is_endgame(board):
+    """
+    Indica si el tablero está en el final de información perfecta: pozo vacío y partida empezada.
+    """
+    return board.left != EMPTY and board.uncertain.bit_count() == board.num_opponent_tiles
+
+
+def pips(mask, tables):
+    """
+    Suma de puntos de las fichas de una máscara.
+    :param tables: DominoTables del juego de las fichas.
+    """
+    return sum(tables.tile_pip_sum[tile] for tile in mask_to_indices(mask))
+
+
+class EndgameSolver:
+    """
+    Negamax exacto con tabla de resultados. La clave compacta codifica la mano del jugador al
+    turno, la del otro, los extremos y si el turno anterior fue un pase; como el valor se guarda
+    desde el punto de vista de quien mueve, la tabla sirve para ambos jugadores y entre turnos.
+    La clave es de un juego de fichas: si el tablero es de otro, la tabla se vacía.
+    """
+
+    def __init__(self, max_entries=MEMO_ENTRIES):
+        """
+        :param max_entries: Tamaño de la tabla a partir del cual se vacía antes del siguiente final, para
+            que un solucionador que vive todo el proceso (el Engine de un servidor) no crezca sin límite.
+        """
+        self.memo = {}
+        self.max_entries = max_entries
+        self.nodes = 0  # Llamadas a negamax desde que se creó, incluidas las que encuentran el estado en memo
+        self.deadline = None
+        self.tables = None  # DominoTables de las claves de memo
+
+    def solve(self, board, deadline=None):
+        """
+        Resuelve el final desde el turno de MAX.
+        :param board: Tablero con el pozo vacío.
+        :param deadline: Momento (time()) a partir del cual se abandona la búsqueda, como en minimax.
+            Los estados ya resueltos quedan en la tabla, así que un nuevo intento sigue desde ahí.
+        :return: EndgameResult con el mejor movimiento ('pass' si no puede jugar) y el desenlace
+            de la variación principal, incluidos los puntos de cada mano si termina en tranque.
+        :raises SearchTimeout: Si se alcanza deadline antes de resolver el final.
+        """
+        if not is_endgame(board):
+            raise ValueError("El final exacto requiere el pozo vacío y fichas en la mesa")
+        opponent = board.uncertain
+        if len(self.memo) > self.max_entries or board.tables is not self.tables:
+            self.memo.clear()
+        self.tables = board.tables
+        self.deadline = deadline
+
+        outcome = self.negamax(board.left, board.right, board.hand, opponent, 0)
+        best_move = self.best_move(board.left, board.right, board.hand, opponent, 0, outcome)
+
+        # Recorre la variación principal hasta el final para informar los puntos que quedan
+        left, right, hands, passes, sign = board.left, board.right, [board.hand, opponent], 0, 1
+        while hands[0] and hands[1]:
+            mover = 0 if sign == 1 else 1
+            value = self.negamax(left, right, hands[mover], hands[1 - mover], passes)
+            move = self.best_move(left, right, hands[mover], hands[1 - mover], passes, value)
+            if move == 'pass':
+                if passes:
+                    break
+                passes = 1
+            else:
+                left, right = place_tile(left, right, move, self.tables.tiles)
+                hands[mover] &= ~(1 << move)
+                passes = 0
+            sign = -sign
+        return EndgameResult(best_move, outcome, pips(hands[0], self.tables), pips(hands[1], self.tables))
+
+    def best_move(self, left, right, hand, other, passes, value):
+        """
+        Devuelve un movimiento del jugador al turno que alcanza el valor dado.
+        """
+        playable = hand & self.tables.open_masks[left][right]
+        for tile in mask_to_indices(playable):
+            rest = hand & ~(1 << tile)
+            new_left, new_right = place_tile(left, right, tile, self.tables.tiles)
+            if not rest or -self.negamax(new_left, new_right, other, rest, 0) == value:
+                return tile
+        return 'pass'
+
+    def negamax(self, left, right, hand, other, passes):
+        """
+        Valor exacto (1, 0 o -1) para el jugador al turno, que tiene hand; other es la mano del otro.
+        """
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes & DEADLINE_CHECK and time() >= self.deadline:
+            raise SearchTimeout()
+        tables = self.tables
+        key = ((((hand << len(tables.tiles) | other) << 4 | left) << 4 | right) << 1) | passes
+        value = self.memo.get(key)
+        if value is not None:
+            return value
+
+        playable = hand & tables.open_masks[left][right]
+        if not playable:
+            # Si el otro también acaba de pasar, nadie puede jugar: tranque
+            value = 0 if passes else -self.negamax(left, right, other, hand, 1)
+        else:
+            value = -1
+            for tile in mask_to_indices(playable):
+                rest = hand & ~(1 << tile)
+                if not rest:
+                    value = 1
+                    break
+                new_left, new_right = place_tile(left, right, tile, tables.tiles)
+                value = max(value, -self.negamax(new_left, new_right, other, rest, 0))
+                if value == 1:
+                    break
+        self.memo[key] = value
+        return value
@@ -0,0 +1,219 @@
+"""
+Punto de entrada del motor, separado de la partida de consola: choose_move(estado, presupuesto)
+devuelve el movimiento de MAX y las estadísticas de la búsqueda. Importar este módulo no reparte,
+no abre el libro ni reserva tablas: solo carga game (las tablas de fichas y, si existe,
+heuristic_weights.json). Los motores, el libro de aperturas, el final exacto y el pool de procesos
+se importan y se crean al usarlos por primera vez, así que los procesos de un pool arrancan
+rápido y pueden usar choose_move directamente como tarea.
+DominoesGame.machine_move (la partida de consola) y los procesos del servidor buscan con Engine.
+"""
+from collections import namedtuple
+from time import perf_counter, time
+
+import game
+from game import DEFAULT_TIME_BUDGET, DOUBLE_SIX, ENGINES, Board, DominoSet, MoveOrdering, SearchTimeout, TranspositionTable
+
+# Estadísticas sin instrumentar: motor que eligió el movimiento ('book', 'endgame' o uno de
+# ENGINES), valor estimado (None si el motor no da uno), profundidad de la última iteración
+# completa de minimax (None con otros motores) y segundos de la decisión. SearchStats tiene los
+# mismos atributos, más los contadores de la búsqueda instrumentada.
+MoveStats = namedtuple('MoveStats', 'engine value depth elapsed')
+# Parte del presupuesto para el final exacto: si no lo resuelve a tiempo, el motor configurado
+# decide con lo que queda
+ENDGAME_SHARE = 0.5
+SESSION_TREES = 32  # Árboles de ISMCTS que conserva un Engine, uno por sesión; se descarta el menos reciente
+
+
+class Engine:
+    """
+    Estado de búsqueda de un jugador de la máquina, que se conserva entre turnos: tabla de
+    transposición, orden de movimientos opcional, libro de aperturas, final exacto, árboles de ISMCTS y pool
+    de procesos. Los tres últimos se crean la primera vez que hacen falta. Un Engine compartido por
+    varias partidas (los procesos del servidor) guarda un árbol de ISMCTS por sesión, porque el árbol
+    solo se reutiliza si sigue a la misma partida; la tabla y el final exacto tienen tamaño acotado.
+    Todo ese estado es de un juego de fichas, así que el Engine solo busca tableros de su juego.
+    """
+
+    def __init__(self, engine='minimax', workers=1, time_budget=DEFAULT_TIME_BUDGET, opening_book=True,
+                 table_bytes=16 * 2 ** 20, ordering=False, max_depth=None, domino_set=DOUBLE_SIX):
+        """
+        :param engine: Motor de búsqueda, uno de ENGINES.
+        :param workers: Con más de un proceso la búsqueda se reparte en un pool.
+        :param time_budget: Segundos por movimiento cuando choose_move no recibe otro presupuesto.
+        :param opening_book: Si es True, la primera jugada se consulta en el libro de aperturas.
+        :param table_bytes: Memoria de la tabla de transposición.
+        :param ordering: Si es True, minimax ordena con asesinos e historial (MoveOrdering). Sin él
+            solo explora primero el movimiento de la tabla, que en las posiciones de benchmark.py
+            --ordering visita los mismos nodos o menos y en menos tiempo.
+        :param max_depth: Profundidad máxima de minimax; por defecto la de max_search_depth.
+        :param domino_set: Juego de fichas de los tableros que busca (DominoSet).
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Motor inválido: {engine}")
+        self.engine = engine
+        self.domino_set = DominoSet(*domino_set)  # La tabla y el orden de movimientos son de este juego de fichas
+        self.tables = game.domino_tables(domino_set)
+        self.workers = workers
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.table = TranspositionTable(table_bytes)
+        self.ordering = MoveOrdering() if ordering else None  # El historial se conserva entre turnos
+        self.book = None
+        if opening_book:
+            from openingbook import load_book  # openingbook importa game
+            self.book = load_book(domino_set=self.domino_set)
+        self.endgame_solver = None
+        self.ismcts_trees = {}  # Sesión -> ISMCTS, en orden de uso (el más reciente al final)
+        self.executor = None
+
+    def ismcts_tree(self, session):
+        """
+        Árbol de ISMCTS de la sesión, que se crea si no existe. Se conservan los SESSION_TREES usados
+        más recientemente.
+        """
+        tree = self.ismcts_trees.pop(session, None)
+        if tree is None:
+            from ismcts import ISMCTS
+            tree = ISMCTS()
+            if len(self.ismcts_trees) >= SESSION_TREES:
+                del self.ismcts_trees[next(iter(self.ismcts_trees))]
+        self.ismcts_trees[session] = tree
+        return tree
+
+    def book_depth(self, time_budget):
+        """
+        Profundidad mínima de una entrada del libro para usarla en lugar de buscar: la que
+        completaría minimax con time_budget segundos, sin pasar de max_depth.
+        """
+        depth = self.book.reachable_depth(time_budget)
+        return depth if self.max_depth is None else min(depth, self.max_depth)
+
+    def search(self, board, time_budget, session=None, stats=None):
+        """
+        Elige el movimiento con el libro, el final exacto o el motor configurado.
+        :param session: Partida a la que pertenece el tablero, cuando el Engine atiende varias.
+        :param stats: NodeCounter opcional al que la búsqueda suma sus nodos.
+        :return: Movimiento (índice de ficha, 'pass' o ("draw", None)), motor que lo eligió, valor y profundidad.
+        """
+        from endgame import EndgameSolver, is_endgame  # endgame importa game
+        if board.tables is not self.tables:
+            raise ValueError(f"El tablero es del juego {tuple(board.tables.domino_set)} y el Engine, "
+                             f"del juego {tuple(self.domino_set)}")
+        if self.book is not None:
+            # Primera jugada de la máquina: se consulta el libro antes de buscar, si su entrada es
+            # al menos tan profunda como lo que alcanzaría la búsqueda con este presupuesto
+            book_move = self.book.lookup(board, self.book_depth(time_budget))
+            if book_move is not None:
+                return book_move, 'book', None, None
+        if is_endgame(board):
+            # Con el pozo vacío la partida es de información perfecta: se resuelve hasta el final
+            if self.endgame_solver is None:
+                self.endgame_solver = EndgameSolver()
+            start, start_nodes = time(), self.endgame_solver.nodes
+            try:
+                result = self.endgame_solver.solve(board, start + time_budget * ENDGAME_SHARE)
+                return result.move, 'endgame', result.outcome * game.WIN, None  # Misma escala que heuristica
+            except SearchTimeout:
+                # Un final grande (doble doce) no se resuelve a tiempo: lo resuelto queda en la tabla
+                # para el turno siguiente y el motor configurado decide con el tiempo que queda
+                time_budget -= time() - start
+            finally:
+                if stats is not None:
+                    stats.nodes += self.endgame_solver.nodes - start_nodes
+
+        if self.workers > 1 and self.executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=game.init_search_worker,
+                                                initargs=(self.domino_set,))
+
+        if self.engine == 'pimc':
+            from pimc import pimc_search
+            value, best_move, _ = pimc_search(board, time_budget=time_budget, executor=self.executor,
+                                              workers=self.workers, stats=stats)
+            return best_move, 'pimc', value, None
+        if self.engine == 'ismcts':
+            best_move = self.ismcts_tree(session).choose_move(board, time_budget, executor=self.executor,
+                                                             workers=self.workers, stats=stats)
+            return best_move, 'ismcts', None, None
+        self.table.new_search()
+        if self.ordering is not None:
+            self.ordering.new_search()
+        value, best_move, depth = game.iterative_deepening(board, time_budget, self.table, self.max_depth,
+                                                           ordering=self.ordering, executor=self.executor,
+                                                           workers=self.workers, stats=stats)
+        return best_move, 'minimax', value, depth
+
+    def choose_move(self, board, time_budget=None, instrument=False, profile=False, session=None):
+        """
+        Elige el movimiento de MAX para el tablero.
+        :param time_budget: Segundos de búsqueda; por defecto los del Engine.
+        :param session: Partida a la que pertenece el tablero, cuando el Engine atiende varias.
+        :param instrument: Si es True, la búsqueda se instrumenta y las estadísticas son un SearchStats.
+        :param profile: Si es True, además se perfila con cProfile.
+        :return: Movimiento y estadísticas (MoveStats, o SearchStats si se instrumentó).
+        """
+        if time_budget is None:
+            time_budget = self.time_budget
+        if not instrument and not profile:
+            start = perf_counter()
+            move, engine, value, depth = self.search(board, time_budget, session)
+            return move, MoveStats(engine, value, depth, perf_counter() - start)
+
+        from searchstats import SearchStats, collect, engine_for  # searchstats importa game y los motores
+        book_depth = self.book_depth(time_budget) if self.book is not None else 0
+        stats = SearchStats(engine_for(board, self.engine, self.book, book_depth), self.tables)
+        with collect(stats, profile):
+            move, engine, _, _ = self.search(board, time_budget, session, stats)
+        stats.engine = engine  # Un final que no se resolvió a tiempo lo decide el motor configurado
+        stats.move = move
+        if stats.engine == 'minimax' and stats.iterations:
+            stats.principal_variation = game.principal_variation(board, self.table, stats.depth)
+        return move, stats
+
+    def close(self):
+        """
+        Cierra el pool de procesos y el libro, si se abrieron.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+
+
+# Un Engine por motor y juego de fichas en cada proceso, creado en la primera llamada a choose_move
+_engines = {}
+
+
+def get_engine(engine='minimax', domino_set=DOUBLE_SIX):
+    """
+    Engine compartido del proceso para un motor y un juego de fichas: la tabla y el orden de
+    movimientos dependen del juego.
+    """
+    key = (engine, DominoSet(*domino_set))
+    if key not in _engines:
+        _engines[key] = Engine(engine, domino_set=domino_set)
+    return _engines[key]
+
+
+def init_worker(engine='minimax', domino_set=DOUBLE_SIX):
+    """
+    Inicializador opcional de un pool: crea el Engine del proceso para el juego de fichas del pool,
+    para que la primera tarea solo pague la búsqueda.
+    """
+    get_engine(engine, domino_set)
+
+
+def choose_move(state, budget, engine='minimax', session=None):
+    """
+    Elige el movimiento de MAX con el Engine compartido del proceso. Se puede enviar tal cual a un
+    ProcessPoolExecutor con el estado serializado.
+    :param state: Board, o la tupla de Board.pack(), que incluye el juego de fichas.
+    :param budget: Segundos de búsqueda.
+    :param engine: Motor de búsqueda, uno de ENGINES.
+    :param session: Identificador de la partida, para que ISMCTS reutilice el árbol de esa partida.
+    :return: Movimiento (índice de ficha, 'pass' o ("draw", None)) y MoveStats.
+    """
+    board = state if isinstance(state, Board) else Board.unpack(state)
+    return get_engine(engine, board.tables.domino_set).choose_move(board, budget, session=session)
@@ -1,7 +1,9 @@
-from collections import deque
+from array import array
+from collections import deque, namedtuple
+from functools import lru_cache
+import os
 import random
-import numpy as np
-from itertools import combinations
+from threading import Event, Thread
 from time import sleep, time
 
 
@@ -20,185 +22,496 @@ class Domino:
         return False
     
     @staticmethod
-    def from_string(s):
+    def from_string(s, max_pip=6):
+        """
+        Lee una ficha escrita 'a|b'.
+        :param max_pip: Número más alto del juego de fichas de la partida.
+        :return: Domino, o None si el texto no es una ficha de ese juego.
+        """
         parts = s.split("|")    
         if len(parts) != 2:
             return None
         try:
             left, right = int(parts[0]), int(parts[1])
-            if 0 <= left <= 6 and 0 <= right <= 6:
+            if 0 <= left <= max_pip and 0 <= right <= max_pip:
                 return Domino(left, right)
         except ValueError:
             pass
         return None
 
+# Juegos de fichas: max_pip es el número más alto y hand_size las fichas que recibe cada jugador.
+# La partida usa el doble seis (28 fichas); el doble nueve (55) y el doble doce (91) se eligen al
+# crear la partida, el Engine o el servidor, que llevan las tablas de su juego (DominoTables).
+DominoSet = namedtuple('DominoSet', 'max_pip hand_size')
+DOUBLE_SIX = DominoSet(6, 7)
+DOUBLE_NINE = DominoSet(9, 10)
+DOUBLE_TWELVE = DominoSet(12, 15)
+DOMINO_SETS = {6: DOUBLE_SIX, 9: DOUBLE_NINE, 12: DOUBLE_TWELVE}
+# Juego más grande admitido: los movimientos de la tabla de transposición y de ISMCTS caben en un
+# byte con signo y los extremos en 4 bits de la clave del final exacto
+LARGEST_MAX_PIP = 12
+MAX_TILE_COUNT = (LARGEST_MAX_PIP + 1) * (LARGEST_MAX_PIP + 2) // 2
+
+EMPTY = -1  # Extremo abierto de un tablero vacío
+
+
+class DominoTables:
+    """
+    Representación compacta de las fichas de un juego para la búsqueda: cada ficha ocupa un bit de
+    un entero (hasta 91 con el doble doce), de modo que la mano, las fichas inciertas y las jugadas
+    son máscaras de bits y los extremos abiertos son dos enteros pequeños. Hay un objeto por juego
+    (domino_tables) y no cambia después de crearse: cada Board lleva el de su juego, así que
+    partidas, hilos y procesos con juegos distintos no se pisan. Las claves de Zobrist salen
+    siempre de la misma semilla, así que un juego tiene las mismas claves en todos los procesos.
+    """
+
+    def __init__(self, domino_set):
+        """
+        :param domino_set: DominoSet o secuencia (max_pip, hand_size).
+        :raises ValueError: Si el juego es más grande que el doble doce o no alcanza para repartir dos manos.
+        """
+        domino_set = DominoSet(*domino_set)
+        max_pip, hand_size = domino_set
+        if not 1 <= max_pip <= LARGEST_MAX_PIP:
+            raise ValueError(f"Juego inválido: el número más alto debe estar entre 1 y {LARGEST_MAX_PIP}")
+        if not 1 <= hand_size <= (max_pip + 1) * (max_pip + 2) // 4:
+            raise ValueError(f"Juego inválido: no hay fichas para dos manos de {hand_size}")
+        self.domino_set = domino_set
+        self.max_pip, self.hand_size = domino_set
+        self.tiles = [(a, b) for a in range(max_pip + 1) for b in range(a, max_pip + 1)]
+        self.tile_index = {}
+        for index, (a, b) in enumerate(self.tiles):
+            self.tile_index[(a, b)] = index
+            self.tile_index[(b, a)] = index
+        # pip_masks[p] contiene todas las fichas que tienen el número p en alguno de sus lados
+        self.pip_masks = [sum(1 << i for i, tile in enumerate(self.tiles) if pip in tile) for pip in range(max_pip + 1)]
+        # Números distintos de cada ficha, para los conteos por número de SearchState
+        self.tile_pip_set = [(a,) if a == b else (a, b) for a, b in self.tiles]
+        self.tile_pip_sum = [a + b for a, b in self.tiles]
+        # Orden estático de las fichas: primero las mulas y después las de más puntos
+        self.static_score = [2 * (max_pip + 1) * (a == b) + a + b for a, b in self.tiles]
+        self.full_mask = (1 << len(self.tiles)) - 1
+        self.doubles_mask = sum(1 << self.tile_index[(pip, pip)] for pip in range(max_pip + 1))
+        self.build_end_tables()
+
+        # Claves de Zobrist para el hash incremental del estado de búsqueda. Los extremos se
+        # indexan con pip + 1 para que EMPTY ocupe la posición 0.
+        rng = random.Random(0x5EED)
+        self.zobrist_hand = [rng.getrandbits(64) for _ in self.tiles]
+        self.zobrist_uncertain = [rng.getrandbits(64) for _ in self.tiles]
+        self.zobrist_left = [rng.getrandbits(64) for _ in range(max_pip + 2)]
+        self.zobrist_right = [rng.getrandbits(64) for _ in range(max_pip + 2)]
+        self.zobrist_opponent = [rng.getrandbits(64) for _ in range(len(self.tiles) + 1)]
+        self.zobrist_max = rng.getrandbits(64)  # Se aplica cuando mueve MAX
+        # Fichas inciertas que el oponente no puede tener (las que no son candidatas)
+        self.zobrist_excluded = [rng.getrandbits(64) for _ in self.tiles]
+        # True si algún rasgo opcional de heuristica tiene peso o si con los pesos el valor podría
+        # llegar a ±WIN en este juego; set_weights lo actualiza
+        self.heuristic_extras = False
+
+    def build_end_tables(self):
+        """
+        Tablas indexadas por el par de extremos abiertos [left][right], con la regla de
+        DominoRules.is_legal_move. open_masks son las fichas jugables; EMPTY (-1) indexa la última
+        fila y columna: con el tablero vacío toda ficha va a la izquierda. placements[left][right][a][b]
+        es el resultado de is_legal_move para el dominó a|b tal como está escrito, sin pasar por
+        tile_index: ('left' o 'right', 'normal' o 'reversed'), o None.
+        """
+        pips = range(self.max_pip + 1)
+        ends = list(pips) + [EMPTY]
+        self.open_masks = [[0] * len(ends) for _ in ends]
+        self.placements = [[0] * len(ends) for _ in ends]
+        # Resultados de is_legal_move por (va a la izquierda, va invertida), compartidos por todo placements
+        placements = {(to_left, reversed_tile): ('left' if to_left else 'right', 'reversed' if reversed_tile else 'normal')
+                      for to_left in (True, False) for reversed_tile in (False, True)}
+        bits = [[1 << self.tile_index[(a, b)] for b in pips] for a in pips]
+        for left in ends:
+            for right in ends:
+                if left == EMPTY:
+                    # Sobre la mesa vacía va a la izquierda sin importar cómo está escrita
+                    self.open_masks[left][right] = self.full_mask
+                    self.placements[left][right] = [[placements[True, False]] * len(pips) for _ in pips]
+                    continue
+                # Fichas que van al extremo izquierdo (se prueba primero) y las que solo encajan en el derecho
+                left_mask = self.pip_masks[left]
+                right_mask = self.pip_masks[right] & ~left_mask if right != EMPTY else 0
+                open_mask = left_mask | right_mask
+                # Fichas que, escritas como en tiles (a <= b), se colocan con orientación 'reversed': a la
+                # izquierda si su lado derecho toca el extremo; a la derecha, si solo su lado izquierdo lo toca
+                reversed_mask = 0
+                for tile in mask_to_indices(open_mask):
+                    b = self.tiles[tile][1]
+                    if (b == left) if left_mask >> tile & 1 else (b != right):
+                        reversed_mask |= 1 << tile
+                self.open_masks[left][right] = open_mask
+                # Un dominó escrito al revés que en tiles (a > b) tiene la orientación contraria
+                self.placements[left][right] = [[placements[bool(left_mask & bit), bool(reversed_mask & bit) != (a > b)]
+                                                 if open_mask & bit else None for b, bit in enumerate(row)]
+                                                for a, row in enumerate(bits)]
+
+    def tiles_to_mask(self, tiles):
+        """
+        Convierte una colección de pares (a, b) en una máscara de bits.
+        :param tiles: Fichas como pares de números.
+        :return: Entero con un bit encendido por ficha.
+        """
+        mask = 0
+        for a, b in tiles:
+            mask |= 1 << self.tile_index[(a, b)]
+        return mask
+
+    def excluded_key(self, mask):
+        """
+        Parte de la clave de Zobrist que corresponde a las fichas inciertas excluidas de la mano del oponente.
+        """
+        key = 0
+        for tile in mask_to_indices(mask):
+            key ^= self.zobrist_excluded[tile]
+        return key
+
+    def zobrist_key(self, left, right, hand, num_opponent_tiles, uncertain, candidates=None):
+        """
+        Calcula desde cero la clave de Zobrist de un estado (sin el turno).
+        :return: Entero de 64 bits.
+        """
+        key = self.zobrist_left[left + 1] ^ self.zobrist_right[right + 1] ^ self.zobrist_opponent[num_opponent_tiles]
+        for tile in mask_to_indices(hand):
+            key ^= self.zobrist_hand[tile]
+        for tile in mask_to_indices(uncertain):
+            key ^= self.zobrist_uncertain[tile]
+        if candidates is not None:
+            key ^= self.excluded_key(uncertain & ~candidates)
+        return key
+
+
+def mask_to_indices(mask):
+    """
+    Devuelve los índices de las fichas presentes en una máscara, en orden ascendente.
+    :param mask: Máscara de bits de fichas.
+    :return: Lista de índices de tiles.
+    """
+    indices = []
+    while mask:
+        low_bit = mask & -mask
+        indices.append(low_bit.bit_length() - 1)
+        mask ^= low_bit
+    return indices
+
+
+# Tablas creadas en este proceso, una por juego
+_tables = {}
+
+
+def domino_tables(domino_set=DOUBLE_SIX):
+    """
+    Tablas de un juego de fichas, creadas la primera vez que se piden y compartidas después.
+    :param domino_set: DominoSet o secuencia (max_pip, hand_size).
+    :raises ValueError: Si el juego no es válido (ver DominoTables).
+    """
+    domino_set = DominoSet(*domino_set)
+    tables = _tables.get(domino_set)
+    if tables is None:
+        tables = DominoTables(domino_set)
+        tables.heuristic_extras = heuristic_extras(HEURISTIC_WEIGHTS, domino_set)
+        tables = _tables.setdefault(domino_set, tables)  # Otro hilo pudo crearlas a la vez
+    return tables
+
+
+# heuristica está acotada por ±WIN; los nodos de azar usan esta cota para podar
+WIN = 10
+
+# Pesos de heuristica. Los cuatro primeros son los términos originales (diversidad de números y
+# relación entre las fichas del oponente y las propias); los demás son rasgos opcionales, apagados
+# por defecto y normalizados entre 0 y 1: suma de puntos de la mano, fichas que encajan en los
+# extremos abiertos (control de palo) y mulas, los dos últimos por ficha de la mano.
+HeuristicWeights = namedtuple('HeuristicWeights',
+                              'diversity diversity_offset ratio ratio_offset pip_sum suit_control doubles')
+DEFAULT_WEIGHTS = HeuristicWeights(4, -4, 0.286, -0.0136, 0, 0, 0)
+# Pesos ajustados (tuning.py) que se cargan al importar el módulo, si el archivo existe
+HEURISTIC_WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'heuristic_weights.json')
+
+# Valor máximo de heuristica cuando hay que acotarla: por debajo de WIN, ganar sigue siendo mejor
+HEURISTIC_LIMIT = WIN - 0.1
+
+HEURISTIC_WEIGHTS = DEFAULT_WEIGHTS
+
+
+@lru_cache(maxsize=256)
+def heuristic_bound(weights, domino_set=DOUBLE_SIX):
+    """
+    Cota del valor absoluto de heuristica con estos pesos en un juego: recorre todas las
+    combinaciones de fichas en la mano, números distintos y fichas del oponente, y suma los rasgos
+    opcionales en su máximo.
+    """
+    diversity, diversity_offset, ratio, ratio_offset = weights[:4]
+    max_pip, hand_size = domino_set
+    max_hand_tiles = (max_pip + 1) * (max_pip + 2) // 2 - hand_size  # Una mano con todo el pozo
+    bound = 0.0
+    for num_fichas_mano in range(1, max_hand_tiles + 1):
+        for numeros_distintos in range(1, min(max_pip + 1, 2 * num_fichas_mano) + 1):
+            for num_opponent_tiles in range(1, max_hand_tiles + 1):
+                value = diversity * (numeros_distintos / num_fichas_mano) + diversity_offset + \
+                    ratio * (num_opponent_tiles / num_fichas_mano) + ratio_offset
+                bound = max(bound, abs(value))
+    return bound + sum(abs(weight) for weight in weights[4:])
+
+
+def heuristic_extras(weights, domino_set):
+    """
+    Indica si heuristica necesita adjust_value con estos pesos en un juego: algún rasgo opcional
+    tiene peso o el valor podría llegar a ±WIN. Con juegos más grandes que el doble seis el término
+    de fichas del oponente puede llegar y se acota.
+    """
+    return any(weights[4:]) or heuristic_bound(weights, domino_set) >= WIN
+
+
+def set_weights(weights):
+    """
+    Cambia los pesos de heuristica en este proceso. Con los pesos por defecto el valor ya está
+    dentro de ±WIN; si otros pesos pueden alcanzarlo, heuristica lo acota a ±HEURISTIC_LIMIT.
+    :param weights: HeuristicWeights o secuencia con los mismos campos.
+    """
+    global HEURISTIC_WEIGHTS
+    weights = HeuristicWeights(*weights)
+    HEURISTIC_WEIGHTS = weights
+    for domino_set, tables in list(_tables.items()):
+        tables.heuristic_extras = heuristic_extras(weights, domino_set)
+
+
+def load_weights(path=HEURISTIC_WEIGHTS_PATH):
+    """
+    Carga los pesos de un archivo JSON {campo: valor}; los campos que faltan toman el valor por defecto.
+    """
+    import json
+    with open(path) as stream:
+        values = json.load(stream)
+    unknown = set(values) - set(HeuristicWeights._fields)
+    if unknown:
+        raise ValueError(f"Pesos desconocidos en {path}: {', '.join(sorted(unknown))}")
+    set_weights(DEFAULT_WEIGHTS._replace(**values))
+
+
+def save_weights(weights, path=HEURISTIC_WEIGHTS_PATH):
+    """
+    Guarda los pesos en el formato de load_weights.
+    """
+    import json
+    with open(path, 'w') as stream:
+        json.dump(HeuristicWeights(*weights)._asdict(), stream, indent=2)
+
+
+def adjust_value(value, hand, left, right, num_fichas_mano, tables):
+    """
+    Agrega a los términos originales de heuristica los rasgos opcionales de una mano no vacía y
+    acota el resultado a ±HEURISTIC_LIMIT.
+    :param tables: DominoTables del juego de la mano.
+    """
+    pip_sum, suit_control, doubles = HEURISTIC_WEIGHTS[4:]
+    if pip_sum:
+        value += pip_sum * sum(tables.tile_pip_sum[tile] for tile in mask_to_indices(hand)) / \
+            (2 * tables.max_pip * num_fichas_mano)
+    if suit_control and left != EMPTY:
+        value += suit_control * (hand & tables.open_masks[left][right]).bit_count() / num_fichas_mano
+    if doubles:
+        value += doubles * (hand & tables.doubles_mask).bit_count() / num_fichas_mano
+    return max(-HEURISTIC_LIMIT, min(HEURISTIC_LIMIT, value))
+
+
+if os.path.exists(HEURISTIC_WEIGHTS_PATH):
+    load_weights()
+
+# Juego de los tableros que no dicen otro
+DEFAULT_TABLES = domino_tables(DOUBLE_SIX)
+
+
 class Board():
-    def __init__(self, sides: np.array, hand: np.array, num_opponent_tiles: int, uncertain_tiles: np.array):
+    __slots__ = ('left', 'right', 'hand', 'num_opponent_tiles', 'uncertain', 'played', 'key', 'candidates',
+                 'tables')
+
+    def __init__(self, left: int, right: int, hand: int, num_opponent_tiles: int, uncertain: int, played: int = 0,
+                 key: int = None, candidates: int = None, tables: DominoTables = None):
         """
         Constructor para inicializar el estado del tablero.
-        :param sides: Lados abiertos en el juego de dominó.
-        :param hand: Las fichas que tiene el jugador en la mano.
+        :param left: Extremo izquierdo abierto (EMPTY si el tablero está vacío).
+        :param right: Extremo derecho abierto (EMPTY si el tablero está vacío).
+        :param hand: Máscara de las fichas que tiene el jugador en la mano.
         :param num_opponent_tiles: Número de fichas que tiene el oponente.
-        :param uncertain_tiles: Fichas que están disponibles para robar.
+        :param uncertain: Máscara de las fichas que el jugador no ve: el pozo y la mano del oponente.
+        :param played: Máscara de las fichas que ya están en la mesa.
+        :param key: Clave de Zobrist del estado; se calcula si no se proporciona.
+        :param candidates: Máscara de las fichas inciertas que el oponente puede tener según lo que
+            se ha observado (ver OpponentTracker); por defecto todas las inciertas.
+        :param tables: DominoTables del juego de fichas; por defecto el doble seis.
         """
-        self.sides = sides
+        if tables is None:
+            tables = DEFAULT_TABLES
+        self.tables = tables
+        self.left = left
+        self.right = right
         self.hand = hand
         self.num_opponent_tiles = num_opponent_tiles
-        self.uncertain_tiles = uncertain_tiles
+        self.uncertain = uncertain
+        self.played = played
+        if candidates is None:
+            candidates = uncertain
+        self.candidates = candidates
+        if key is None:
+            key = tables.zobrist_key(left, right, hand, num_opponent_tiles, uncertain, candidates)
+        self.key = key
+
+    def pack(self):
+        """
+        Serializa el estado en una tupla para enviarlo a otro proceso: los enteros del estado y, al
+        final, el juego de fichas, que dice qué ficha es cada bit.
+        """
+        return self.left, self.right, self.hand, self.num_opponent_tiles, self.uncertain, self.played, \
+            self.candidates, self.tables.domino_set
+
+    @staticmethod
+    def unpack(packed):
+        """
+        Reconstruye un tablero serializado con pack, con las tablas de su juego de fichas.
+        """
+        left, right, hand, num_opponent_tiles, uncertain, played, candidates, domino_set = packed
+        return Board(left, right, hand, num_opponent_tiles, uncertain, played, candidates=candidates,
+                     tables=domino_tables(domino_set))
 
     def get_legal_moves(self, player):
         """
         Calcula los movimientos legales para el jugador actual basándose en el estado del tablero.
+        Los movimientos son índices de tables.tiles, 'draw' o 'pass'.
         :param player: El jugador para el que se deben calcular los movimientos legales.
         :return: Una lista de movimientos legales y una lista de fichas disponibles para robar.
         """
-        legal_moves = []  # Lista para almacenar los movimientos legales
-        draw_list = []  # Lista para almacenar las fichas disponibles para robar
-            # Si el tablero está vacío, todos los movimientos son legales
-
-        if self.sides[0] is None and self.sides[1] is None:
+        # Si el tablero está vacío, todos los movimientos son legales
+        if self.left == EMPTY:
             if player == 'MAX':
-                return [tile.tolist() for tile in self.hand], []
+                return mask_to_indices(self.hand), []
             else:
-                return [tile.tolist() for tile in self.uncertain_tiles], []
-
+                return mask_to_indices(self.candidates), []
 
+        open_mask = self.tables.open_masks[self.left][self.right]
+        draw_list = []  # Lista para almacenar las fichas disponibles para robar
 
         # Verifica los movimientos legales para el jugador MAX
-        if player == 'MAX':  
-            for tile in self.hand:
-                # Verifica si alguna ficha en la mano coincide con algún lado abierto en el tablero
-                if tile[0] in self.sides or tile[1] in self.sides:
-                    legal_moves.append(tile.tolist())
-            
+        if player == 'MAX':
+            legal_moves = mask_to_indices(self.hand & open_mask)
+
             # Si no se encontraron movimientos legales, verifica si puede robar o debe pasar
             if not legal_moves:
-                if len(self.uncertain_tiles) > self.num_opponent_tiles:
+                if self.uncertain.bit_count() > self.num_opponent_tiles:
                     legal_moves.append('draw')
-                    for tile in self.uncertain_tiles:
-                        draw_list.append(tile.tolist())
+                    draw_list = mask_to_indices(self.uncertain)
                 else:
                     legal_moves.append('pass')
         # Verifica los movimientos legales para el jugador MIN
         else:
-            for tile in self.uncertain_tiles:
-                if tile[0] in self.sides or tile[1] in self.sides:
-                    legal_moves.append(tile.tolist())
-
-            no_play_found = False
-            try:
-                # Intenta encontrar un subconjunto de fichas que no se pueden jugar
-                for subset in combinations(self.uncertain_tiles, self.num_opponent_tiles):
-                    if all(tile[0] not in self.sides and tile[1] not in self.sides for tile in subset):
-                        no_play_found = True
-                        break
-            except:
-                import sys
-                print("Error de python: ", sys.exc_info()[0:3])
-                self.print_board()
-            
+            legal_moves = mask_to_indices(self.candidates & open_mask)
+
+            # El oponente puede estar bloqueado si entre las fichas que puede tener hay al menos
+            # num_opponent_tiles que no coinciden con ningún extremo abierto
+            blocked_tiles = self.candidates.bit_count() - len(legal_moves)
+            no_play_found = blocked_tiles >= self.num_opponent_tiles
+
             # Si no se encontró un movimiento legal, verifica si puede robar o debe pasar
             if no_play_found:
-                if self.num_opponent_tiles < len(self.uncertain_tiles):
+                if self.num_opponent_tiles < self.uncertain.bit_count():
                     legal_moves.append('draw')
                 else:
                     legal_moves.append('pass')
 
         return legal_moves, draw_list
 
-
-    # Updated make_move method with the new_uncertain_tiles default value
-
     def make_move(self, move, player, drawn_tile=None):
         """
         Realiza un movimiento y devuelve un nuevo estado del tablero.
-        :param move: El movimiento a realizar.
+        :param move: El movimiento a realizar (índice de ficha, 'draw' o 'pass').
         :param player: El jugador que realiza el movimiento.
-        :param drawn_tile: La ficha robada, si corresponde.
+        :param drawn_tile: El índice de la ficha robada, si corresponde.
         :return: Un nuevo objeto Board que representa el estado del tablero después del movimiento.
         """
-        new_num_opponent_tiles = self.num_opponent_tiles
-        new_uncertain_tiles = self.uncertain_tiles
-        new_hand = self.hand
-        new_sides = self.sides
-        
+        if player != 'MAX' and player != 'MIN':
+            raise ValueError("Jugador inválido")
 
-        if self.sides[0] is None and self.sides[1] is None:
-            new_sides = np.array(move)
-            return Board(new_sides, new_hand, new_num_opponent_tiles, new_uncertain_tiles)
+        left, right = self.left, self.right
+        hand, uncertain, played = self.hand, self.uncertain, self.played
+        num_opponent_tiles = self.num_opponent_tiles
+        candidates = self.candidates
+        key = self.key
+        tables = self.tables
 
-        # Proceso para el jugador MAX
-        if player == 'MAX':
-            if move == 'draw':
-                new_hand = np.vstack([self.hand, [drawn_tile]])
-                index_to_remove = np.where((self.uncertain_tiles == drawn_tile).all(axis=1))[0][0]
-                new_uncertain_tiles = np.delete(self.uncertain_tiles, index_to_remove, axis=0)
-            elif move == 'pass':
-                pass
+        if move == 'draw':
+            if player == 'MAX':
+                bit = 1 << drawn_tile
+                hand |= bit
+                uncertain &= ~bit
+                key ^= tables.zobrist_hand[drawn_tile] ^ tables.zobrist_uncertain[drawn_tile]
+                if not candidates & bit:
+                    key ^= tables.zobrist_excluded[drawn_tile]
+                candidates &= ~bit
             else:
-                move = np.array(move)
-                tile_index = np.where((self.hand == move).all(axis=1))[0][0]
-                new_hand = np.delete(self.hand, tile_index, axis=0)
-                a, b = move
-                s1, s2 = self.sides
-                # Cambia los lados según la ficha jugada
-                if a == s1:
-                    new_sides = np.array([b, s2])
-                elif a == s2:
-                    new_sides = np.array([s1, b])
-                elif b == s1:
-                    new_sides = np.array([a, s2])
-                elif b == s2:
-                    new_sides = np.array([s1, a])
-                else:
-                    raise ValueError(f"Movimiento inválido")
-
-        # Proceso para el jugador MIN
-        elif player == 'MIN':
-            if move == 'draw':
-                new_num_opponent_tiles += 1
-            elif move == 'pass':
-                pass
+                num_opponent_tiles += 1
+                key ^= tables.zobrist_opponent[num_opponent_tiles - 1] ^ tables.zobrist_opponent[num_opponent_tiles]
+                # La ficha robada puede ser cualquiera del pozo, incluso una excluida
+                key ^= tables.excluded_key(uncertain & ~candidates)
+                candidates = uncertain
+        elif move == 'pass':
+            if player == 'MIN' and left != EMPTY:
+                # Si MIN pasa, no tiene ninguna ficha con los números de los extremos
+                blocked = candidates & tables.open_masks[left][right]
+                key ^= tables.excluded_key(blocked)
+                candidates &= ~blocked
+        else:
+            a, b = tables.tiles[move]
+            # Cambia los lados según la ficha jugada; como is_legal_move, prueba primero el extremo izquierdo.
+            # place_domino pone la primera ficha a|b (a <= b) invertida en la mesa
+            if left == EMPTY:
+                left, right = b, a
+            elif a == left:
+                left = b
+            elif b == left:
+                left = a
+            elif a == right:
+                right = b
+            elif b == right:
+                right = a
             else:
-                move = np.array(move)
-                tile_index = np.where((self.uncertain_tiles == move).all(axis=1))[0][0]
-                new_uncertain_tiles = np.delete(self.uncertain_tiles, tile_index, axis=0)
-                new_num_opponent_tiles -= 1
-                a, b = move
-                s1, s2 = self.sides
-                # Cambia los lados según la ficha jugada
-                if a == s1:
-                    new_sides = np.array([b, s2])
-                elif a == s2:
-                    new_sides = np.array([s1, b])
-                elif b == s1:
-                    new_sides = np.array([a, s2])
-                elif b == s2:
-                    new_sides = np.array([s1, a])
-                else:
-                   raise ValueError(f"Movimiento inválido")
+                raise ValueError("Movimiento inválido")
 
-        else:
-            raise ValueError("Jugador inválido")
+            key ^= tables.zobrist_left[self.left + 1] ^ tables.zobrist_left[left + 1]
+            key ^= tables.zobrist_right[self.right + 1] ^ tables.zobrist_right[right + 1]
 
-        return Board(new_sides, new_hand, new_num_opponent_tiles, new_uncertain_tiles)
+            bit = 1 << move
+            played |= bit
+            if player == 'MAX':
+                hand &= ~bit
+                key ^= tables.zobrist_hand[move]
+            else:
+                uncertain &= ~bit
+                num_opponent_tiles -= 1
+                key ^= tables.zobrist_uncertain[move]
+                key ^= tables.zobrist_opponent[num_opponent_tiles + 1] ^ tables.zobrist_opponent[num_opponent_tiles]
+                if not candidates & bit:
+                    key ^= tables.zobrist_excluded[move]
+                candidates &= ~bit
+
+        return Board(left, right, hand, num_opponent_tiles, uncertain, played, key, candidates, tables)
 
     def print_board(self):
         """
         Imprime el estado actual del tablero.
         """
-        print("Sides:", self.sides)
-        print("Hand:", self.hand)
-        print("Uncertain tiles:", self.uncertain_tiles)
+        print("Sides:", (self.left, self.right))
+        print("Hand:", [self.tables.tiles[i] for i in mask_to_indices(self.hand)])
+        print("Uncertain tiles:", [self.tables.tiles[i] for i in mask_to_indices(self.uncertain)])
         print("Number of opponent tiles:", self.num_opponent_tiles)
 
-    
     def heuristica(self):
         """
         Calcula el valor heurístico del estado actual del tablero.
         :return: Valor heurístico.
         """
-        num_fichas_mano = len(self.hand)
+        num_fichas_mano = self.hand.bit_count()
 
         # Si el jugador MAX no tiene fichas, retorna un valor alto
         if num_fichas_mano == 0:
@@ -207,15 +520,18 @@ class Board():
         elif self.num_opponent_tiles == 0:
             return -10
 
+        diversity, diversity_offset, ratio, ratio_offset = HEURISTIC_WEIGHTS[:4]
         valor_h = 0
-        fichas_mano_plano = [numero for ficha in self.hand for numero in ficha]
+        numeros_distintos = sum(1 for pip_mask in self.tables.pip_masks if self.hand & pip_mask)
 
         # Diversidad: valor proporcional al número de diferentes números en las fichas de la mano
-        valor_h += 4 * (len(set(fichas_mano_plano)) / num_fichas_mano) - 4
+        valor_h += diversity * (numeros_distintos / num_fichas_mano) + diversity_offset
 
         # Número de fichas: valor proporcional a la relación entre las fichas del oponente y las fichas propias
-        valor_h += 0.286 * (self.num_opponent_tiles / num_fichas_mano) - 0.0136
+        valor_h += ratio * (self.num_opponent_tiles / num_fichas_mano) + ratio_offset
 
+        if self.tables.heuristic_extras:
+            valor_h = adjust_value(valor_h, self.hand, self.left, self.right, num_fichas_mano, self.tables)
         return valor_h
 
     def is_game_over(self):
@@ -223,16 +539,556 @@ class Board():
         Verifica si el juego ha terminado.
         :return: True si el juego ha terminado, False en caso contrario.
         """
-        return self.hand.size == 0 or self.num_opponent_tiles == 0
+        return self.hand == 0 or self.num_opponent_tiles == 0
+
+
+class SearchState(Board):
+    """
+    Estado mutable de la búsqueda. make aplica un movimiento en el mismo objeto y guarda lo
+    necesario para que unmake lo deshaga, en lugar de crear un Board nuevo en cada nodo.
+    Además de la clave de Zobrist mantiene de forma incremental cuántas fichas de la mano tienen
+    cada número y cuántos números distintos hay en la mano (término de heuristica).
+    """
+    __slots__ = ('hand_pips', 'distinct', 'undo')
+
+    def __init__(self, board):
+        """
+        :param board: Board (o SearchState) del que se copia el estado inicial.
+        """
+        Board.__init__(self, board.left, board.right, board.hand, board.num_opponent_tiles, board.uncertain,
+                       board.played, board.key, board.candidates, board.tables)
+        self.hand_pips = [(board.hand & pip_mask).bit_count() for pip_mask in board.tables.pip_masks]
+        self.distinct = sum(1 for count in self.hand_pips if count)
+        self.undo = []
+
+    def snapshot(self):
+        """
+        Devuelve un Board inmutable con el estado actual.
+        """
+        return Board(self.left, self.right, self.hand, self.num_opponent_tiles, self.uncertain, self.played,
+                     self.key, self.candidates, self.tables)
+
+    def make(self, move, player, drawn_tile=None):
+        """
+        Aplica un movimiento en el mismo estado, con las reglas de Board.make_move.
+        :param move: El movimiento a realizar (índice de ficha, 'draw' o 'pass').
+        :param player: El jugador que realiza el movimiento.
+        :param drawn_tile: El índice de la ficha robada, si corresponde.
+        """
+        self.undo.append((self.left, self.right, self.hand, self.uncertain, self.played, self.num_opponent_tiles,
+                          self.key, self.candidates, self.distinct, move, player, drawn_tile))
+        tables = self.tables
+        if move == 'draw':
+            if player == 'MAX':
+                bit = 1 << drawn_tile
+                self.hand |= bit
+                self.uncertain &= ~bit
+                self.key ^= tables.zobrist_hand[drawn_tile] ^ tables.zobrist_uncertain[drawn_tile]
+                if not self.candidates & bit:
+                    self.key ^= tables.zobrist_excluded[drawn_tile]
+                self.candidates &= ~bit
+                hand_pips = self.hand_pips
+                for pip in tables.tile_pip_set[drawn_tile]:
+                    if not hand_pips[pip]:
+                        self.distinct += 1
+                    hand_pips[pip] += 1
+            else:
+                self.num_opponent_tiles += 1
+                self.key ^= tables.zobrist_opponent[self.num_opponent_tiles - 1] ^ \
+                    tables.zobrist_opponent[self.num_opponent_tiles]
+                if self.candidates != self.uncertain:
+                    self.key ^= tables.excluded_key(self.uncertain & ~self.candidates)
+                    self.candidates = self.uncertain
+        elif move == 'pass':
+            if player == 'MIN' and self.left != EMPTY:
+                blocked = self.candidates & tables.open_masks[self.left][self.right]
+                if blocked:
+                    self.key ^= tables.excluded_key(blocked)
+                    self.candidates &= ~blocked
+        else:
+            left, right = self.left, self.right
+            a, b = tables.tiles[move]
+            if left == EMPTY:
+                left, right = b, a  # Como place_domino
+            elif a == left:
+                left = b
+            elif b == left:
+                left = a
+            elif a == right:
+                right = b
+            elif b == right:
+                right = a
+            else:
+                self.undo.pop()
+                raise ValueError("Movimiento inválido")
+            key = self.key ^ tables.zobrist_left[self.left + 1] ^ tables.zobrist_left[left + 1]
+            key ^= tables.zobrist_right[self.right + 1] ^ tables.zobrist_right[right + 1]
+            self.left, self.right = left, right
+
+            bit = 1 << move
+            self.played |= bit
+            if player == 'MAX':
+                self.hand &= ~bit
+                key ^= tables.zobrist_hand[move]
+                hand_pips = self.hand_pips
+                for pip in tables.tile_pip_set[move]:
+                    hand_pips[pip] -= 1
+                    if not hand_pips[pip]:
+                        self.distinct -= 1
+            else:
+                self.uncertain &= ~bit
+                self.num_opponent_tiles -= 1
+                key ^= tables.zobrist_uncertain[move]
+                key ^= tables.zobrist_opponent[self.num_opponent_tiles + 1] ^ tables.zobrist_opponent[self.num_opponent_tiles]
+                if not self.candidates & bit:
+                    key ^= tables.zobrist_excluded[move]
+                self.candidates &= ~bit
+            self.key = key
+
+    def unmake(self):
+        """
+        Deshace el último movimiento aplicado con make.
+        """
+        (self.left, self.right, self.hand, self.uncertain, self.played, self.num_opponent_tiles, self.key,
+         self.candidates, self.distinct, move, player, drawn_tile) = self.undo.pop()
+        if player != 'MAX' or move == 'pass':
+            return
+        if move == 'draw':
+            for pip in self.tables.tile_pip_set[drawn_tile]:
+                self.hand_pips[pip] -= 1
+        else:
+            for pip in self.tables.tile_pip_set[move]:
+                self.hand_pips[pip] += 1
+
+    def heuristica(self):
+        """
+        Igual que Board.heuristica, con el número de números distintos mantenido por make/unmake.
+        """
+        num_fichas_mano = self.hand.bit_count()
+        if num_fichas_mano == 0:
+            return 10
+        elif self.num_opponent_tiles == 0:
+            return -10
+
+        diversity, diversity_offset, ratio, ratio_offset = HEURISTIC_WEIGHTS[:4]
+        valor_h = 0
+        valor_h += diversity * (self.distinct / num_fichas_mano) + diversity_offset
+        valor_h += ratio * (self.num_opponent_tiles / num_fichas_mano) + ratio_offset
+        if self.tables.heuristic_extras:
+            valor_h = adjust_value(valor_h, self.hand, self.left, self.right, num_fichas_mano, self.tables)
+        return valor_h
+
+    def leaf_values(self, moves, player):
+        """
+        Valores de heuristica de los hijos que resultan de cada movimiento, calculados juntos y sin
+        aplicar make/unmake: una jugada de MAX solo cambia el número de fichas de la mano y los
+        números distintos, y una de MIN solo el número de fichas del oponente. Son idénticos a
+        los de heuristica en cada hijo. No se usa para el robo de MAX, que es un nodo de azar.
+        Con rasgos opcionales o valor acotado (tables.heuristic_extras) se aplica cada movimiento.
+        :param moves: Movimientos legales del jugador (índices de ficha, 'draw' o 'pass').
+        :return: Lista de valores, en el orden de moves.
+        """
+        if self.tables.heuristic_extras:
+            # Los rasgos opcionales dependen de los extremos y la cota de todo el valor: cada hijo se
+            # evalúa aplicando el movimiento
+            values = []
+            for move in moves:
+                self.make(move, player)
+                values.append(self.heuristica())
+                self.unmake()
+            return values
+        diversity, diversity_offset, ratio, ratio_offset = HEURISTIC_WEIGHTS[:4]
+        num_fichas_mano = self.hand.bit_count()
+        num_opponent_tiles = self.num_opponent_tiles
+        distinct = self.distinct
+        if player == 'MAX':
+            if num_fichas_mano == 1:
+                return [10 if move != 'pass' else self.heuristica() for move in moves]
+            hand_pips = self.hand_pips
+            # Término del número de fichas, común a todas las jugadas
+            ratio_term = ratio * (num_opponent_tiles / (num_fichas_mano - 1)) + ratio_offset
+            values = []
+            for move in moves:
+                if move == 'pass':
+                    values.append(self.heuristica())
+                    continue
+                # Los números de la ficha que solo aparecen en ella dejan de estar en la mano
+                lost = 0
+                for pip in self.tables.tile_pip_set[move]:
+                    if hand_pips[pip] == 1:
+                        lost += 1
+                values.append(diversity * ((distinct - lost) / (num_fichas_mano - 1)) + diversity_offset + ratio_term)
+            return values
+
+        diversity_term = diversity * (distinct / num_fichas_mano) + diversity_offset
+        values = []
+        for move in moves:
+            opponent = num_opponent_tiles if move == 'pass' else \
+                num_opponent_tiles + 1 if move == 'draw' else num_opponent_tiles - 1
+            if opponent == 0:
+                values.append(-10)
+            else:
+                values.append(diversity_term + (ratio * (opponent / num_fichas_mano) + ratio_offset))
+        return values
+
+
+# Límite de tiempo por movimiento de play() y tiempo de búsqueda por defecto de la máquina,
+# con margen para convertir el estado y aplicar el movimiento
+MOVE_TIME_LIMIT = 60
+DEFAULT_TIME_BUDGET = MOVE_TIME_LIMIT - 10
+
+# Motores de búsqueda que puede usar DominoesGame.machine_move
+ENGINES = ('minimax', 'pimc', 'ismcts')
+
+# Tipos de cota guardados en la tabla de transposición
+EXACT, LOWER, UPPER = 1, 2, 3
+# Códigos de robo y pase de encode_move, fuera del rango de índices de ficha de cualquier juego
+DRAW_CODE = MAX_TILE_COUNT
+
+
+def encode_move(move):
+    """
+    Codifica un movimiento de búsqueda en un entero pequeño para la tabla de transposición, el
+    mismo en todos los juegos de fichas.
+    """
+    if move is None:
+        return -1
+    if isinstance(move, tuple):  # ("draw", None): MAX roba una ficha al azar
+        return DRAW_CODE
+    if move == 'pass':
+        return DRAW_CODE + 1
+    if move == 'draw':
+        return DRAW_CODE + 2
+    return move
+
+
+def decode_move(code):
+    """
+    Operación inversa de encode_move.
+    """
+    if code < 0:
+        return None
+    if code == DRAW_CODE:
+        return ("draw", None)
+    if code == DRAW_CODE + 1:
+        return 'pass'
+    if code == DRAW_CODE + 2:
+        return 'draw'
+    return code
+
+
+class TranspositionTable:
+    """
+    Tabla de transposición de tamaño fijo indexada por la clave de Zobrist.
+    Cada entrada guarda valor, profundidad, tipo de cota y mejor movimiento en arreglos
+    compactos, de modo que la memoria ocupada no crece durante la partida.
+    """
+    ENTRY_BYTES = 20  # clave (8) + valor (8) + profundidad, cota, movimiento y edad (1 cada uno)
+    POLICIES = ('depth', 'two-tier')
+
+    def __init__(self, max_bytes=16 * 2 ** 20, policy='depth'):
+        """
+        :param max_bytes: Memoria máxima que puede ocupar la tabla.
+        :param policy: 'depth' reemplaza solo con búsquedas al menos igual de profundas (o de turnos
+            anteriores); 'two-tier' usa cubetas de dos entradas, una por profundidad y otra siempre reemplazable.
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Política de reemplazo inválida: {policy}")
+        size = 2
+        while size * 2 * self.ENTRY_BYTES <= max_bytes:
+            size *= 2
+        self.policy = policy
+        self.size = size
+        self.mask = size - 1 if policy == 'depth' else size // 2 - 1
+        self.age = 0
+        # Repetir un elemento es más rápido que copiar bytes: la tabla se crea al arrancar cada proceso
+        self.keys = array('Q', [0]) * size
+        self.values = array('d', [0.0]) * size
+        self.depths = array('b', bytes(size))
+        self.flags = array('b', bytes(size))  # 0 indica una entrada vacía
+        self.moves = array('b', bytes(size))
+        self.ages = array('B', bytes(size))
+
+    def new_search(self):
+        """
+        Marca el inicio de un nuevo turno: las entradas anteriores siguen siendo válidas
+        pero pasan a ser las primeras candidatas a reemplazo.
+        """
+        self.age = (self.age + 1) & 0xFF
+
+    def clear(self):
+        """
+        Vacía la tabla.
+        """
+        self.flags = array('b', bytes(self.size))
+
+    def _slots(self, key):
+        if self.policy == 'depth':
+            return (key & self.mask,)
+        slot = (key & self.mask) * 2
+        return (slot, slot + 1)
+
+    def probe(self, key):
+        """
+        Busca un estado en la tabla.
+        :param key: Clave de Zobrist (incluyendo el turno).
+        :return: Tupla (valor, profundidad, cota, mejor movimiento) o None si no está.
+        """
+        for slot in self._slots(key):
+            if self.flags[slot] and self.keys[slot] == key:
+                return self.values[slot], self.depths[slot], self.flags[slot], decode_move(self.moves[slot])
+        return None
+
+    def store(self, key, value, depth, flag, move):
+        """
+        Guarda el resultado de una búsqueda aplicando la política de reemplazo.
+        """
+        slots = self._slots(key)
+        slot = slots[0]
+        if self.flags[slot] and self.keys[slot] != key and self.ages[slot] == self.age \
+                and self.depths[slot] > depth:
+            if len(slots) == 1:
+                return
+            slot = slots[1]  # Segundo nivel: siempre se reemplaza
+        self.keys[slot] = key
+        self.values[slot] = value
+        self.depths[slot] = depth
+        self.flags[slot] = flag
+        self.moves[slot] = encode_move(move)
+        self.ages[slot] = self.age
+
+
+def store_result(table, key, value, depth, alpha, beta, best_move):
+    """
+    Guarda en la tabla el valor de un nodo clasificándolo según la ventana alfa-beta original.
+    """
+    if value <= alpha:
+        flag = UPPER
+    elif value >= beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    table.store(key, value, depth, flag, best_move)
+
+
+class SearchTimeout(Exception):
+    """
+    Se lanza dentro de minimax cuando se agota el tiempo asignado a la búsqueda.
+    """
+
+
+class NodeCounter:
+    """
+    Contador de nodos explícito para una búsqueda: se pasa como stats a minimax, iterative_deepening
+    o a los otros motores, y solo cuenta lo que recorre esa búsqueda, en este proceso. minimax
+    recorre cada hijo a través de stats.minimax, así que una subclase puede medir cada nodo.
+    """
+
+    def __init__(self):
+        self.nodes = 0
+
+    def minimax(self, board, depth, maximizing, alpha, beta, table=None, deadline=None, first_move=None,
+                ordering=None, ply=0, stats=None):
+        self.nodes += 1
+        return minimax(board, depth, maximizing, alpha, beta, table, deadline, first_move, ordering, ply, self)
+
+    def probed(self, entry):
+        """
+        Consulta a la tabla de transposición; entry es None si no estaba.
+        """
+
+
+def put_first(moves, move):
+    """
+    Mueve un movimiento al principio de la lista si está presente.
+    """
+    if move is not None and move in moves:
+        moves.remove(move)
+        moves.insert(0, move)
 
 
+class MoveOrdering:
+    """
+    Orden opcional de los movimientos de minimax: primero el movimiento de la variación principal
+    o de la tabla de transposición, luego los movimientos asesinos de la capa y después según el
+    historial de cortes y el orden estático. El historial se conserva entre búsquedas; los
+    asesinos se reinician en cada turno. Sin él minimax solo adelanta el movimiento de la tabla, y
+    con eso ya más del 94% de los cortes ocurren en el primer movimiento: en benchmark.py
+    --ordering este orden no reduce la ramificación efectiva y cuesta tiempo, así que el Engine no
+    lo usa por defecto.
+    """
+    KILLER_SLOTS = 2
+    STATIC_RANGE = 64  # El historial pesa más que cualquier diferencia del orden estático
 
-def minimax(board, depth, maximizing, alpha, beta):
+    def __init__(self):
+        size = DRAW_CODE + 3
+        self.history = ([0] * size, [0] * size)  # Indexado por maximizing (MIN, MAX)
+        self.killers = []
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self):
+        """
+        Prepara un nuevo turno: borra los asesinos y reduce a la mitad el historial.
+        """
+        self.killers = []
+        for history in self.history:
+            for code in range(len(history)):
+                history[code] >>= 1
+
+    def order(self, moves, ply, maximizing, first_move, board):
+        """
+        Ordena la lista de movimientos en su lugar, de mejor a peor candidato.
+        """
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        history = self.history[maximizing]
+        hand = board.hand
+        tables = board.tables
+
+        def score(move):
+            if move.__class__ is not int:
+                return -1  # Robar o pasar siempre al final: robar expande todas las respuestas
+            if move == first_move:
+                return 1 << 40
+            if move in killers:
+                return (1 << 30) - killers.index(move)
+            value = history[move] * self.STATIC_RANGE + tables.static_score[move]
+            if maximizing:
+                # Prefiere las fichas que dejan abierto un número que todavía tenemos
+                a, b = tables.tiles[move]
+                exposed = b if a == board.left or a == board.right else a
+                value += (hand & ~(1 << move) & tables.pip_masks[exposed]).bit_count()
+            return value
+
+        moves.sort(key=score, reverse=True)
+
+    def order_draws(self, tiles, board):
+        """
+        Ordena en su lugar las fichas que MAX podría robar en un nodo de azar: primero las que
+        puede jugar de inmediato, que suelen decidir antes los cortes de Star1.
+        """
+        open_mask = board.tables.open_masks[board.left][board.right]
+        static_score = board.tables.static_score
+        tiles.sort(key=lambda tile: ((open_mask >> tile) & 1, static_score[tile]), reverse=True)
+
+    def record_cutoff(self, move, ply, depth, maximizing, index):
+        """
+        Registra un corte beta provocado por un movimiento en la posición index de la lista.
+        """
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        while len(self.killers) <= ply:
+            self.killers.append([None] * self.KILLER_SLOTS)
+        slots = self.killers[ply]
+        if slots[0] != move:
+            slots[1:] = slots[:-1]
+            slots[0] = move
+        self.history[maximizing][encode_move(move)] += depth * depth
+
+
+def draw_outcomes(board, tiles):
+    """
+    Resultados posibles de un robo de MAX con su peso. Sin información sobre la mano del oponente
+    cada ficha incierta puede ser la siguiente del pozo con la misma probabilidad; las fichas que
+    el oponente no puede tener (no son candidatas) están seguro en el pozo y pesan más que las
+    candidatas, que solo están en el pozo si no están en su mano.
+    :return: Lista de tuplas (ficha, peso entero); las fichas imposibles se omiten.
+    """
+    candidates = board.candidates
+    if candidates == board.uncertain:
+        return [(tile, 1) for tile in tiles]
+    known = candidates.bit_count()
+    in_pile = known - board.num_opponent_tiles
+    outcomes = [(tile, in_pile if (candidates >> tile) & 1 else known) for tile in tiles]
+    return [outcome for outcome in outcomes if outcome[1]]
+
+
+def chance_value(board, tiles, depth, alpha, beta, table=None, deadline=None, ordering=None, ply=0, stats=None):
+    """
+    Valor esperado de un robo de MAX, ponderado con draw_outcomes. Si la ficha robada se puede
+    jugar, se juega; si no, MAX vuelve a mover.
+    Poda Star1: con las fichas ya evaluadas y la cota ±WIN para las restantes, cada hijo se busca
+    con la ventana que todavía puede cambiar el resultado respecto a (alpha, beta); cuando un hijo
+    queda fuera de ella, el promedio ya no puede entrar en la ventana y se devuelve la cota.
+    :param board: SearchState con MAX al turno.
+    :param tiles: Fichas que podría robar MAX.
+    :return: Valor esperado, o una cota fuera de (alpha, beta) si hubo corte.
+    """
+    search = minimax if stats is None else stats.minimax
+    outcomes = draw_outcomes(board, tiles)
+    open_mask = board.tables.open_masks[board.left][board.right]
+    total_weight = remaining = sum(weight for _, weight in outcomes)
+    total = 0.0
+    for tile, weight in outcomes:
+        remaining -= weight
+        # Límites del hijo para que el promedio quede dentro de (alpha, beta)
+        low = (total_weight * alpha - total - WIN * remaining) / weight
+        high = (total_weight * beta - total + WIN * remaining) / weight
+        if low >= WIN:
+            return (total + WIN * (remaining + weight)) / total_weight
+        if high <= -WIN:
+            return (total - WIN * (remaining + weight)) / total_weight
+
+        board.make("draw", 'MAX', tile)
+        if (open_mask >> tile) & 1:
+            board.make(tile, 'MAX')
+            eval, _ = search(board, depth - 1, False, max(low, -WIN), min(high, WIN), table, deadline,
+                             ordering=ordering, ply=ply + 1, stats=stats)
+            board.unmake()
+        else:
+            eval, _ = search(board, depth - 1, True, max(low, -WIN), min(high, WIN), table, deadline,
+                             ordering=ordering, ply=ply + 1, stats=stats)
+        board.unmake()
+
+        total += weight * eval
+        if eval <= low:
+            return (total + WIN * remaining) / total_weight
+        if eval >= high:
+            return (total - WIN * remaining) / total_weight
+    return total / total_weight
+
+
+def minimax(board, depth, maximizing, alpha, beta, table=None, deadline=None, first_move=None, ordering=None,
+            ply=0, stats=None):
+    """
+    Alfa-beta sobre el estado de la búsqueda. Si recibe un Board lo copia en un SearchState y
+    recorre el árbol aplicando y deshaciendo los movimientos sobre ese único objeto; el Board
+    recibido no se modifica.
+    :param stats: NodeCounter opcional: los hijos se recorren con stats.minimax. Para contar
+        también la raíz, se llama a stats.minimax en lugar de a minimax.
+    :return: Valor del estado y mejor movimiento.
+    """
+    if board.__class__ is not SearchState:
+        board = SearchState(board)
+    if deadline is not None and time() >= deadline:
+        raise SearchTimeout()
     if depth == 0 or board.is_game_over():
         return board.heuristica(), None  # No move is associated with the leaf node
 
+    # Consulta la tabla de transposición, respetando el tipo de cota guardada
+    if table is not None:
+        key = board.key ^ board.tables.zobrist_max if maximizing else board.key
+        entry = table.probe(key)
+        if stats is not None:
+            stats.probed(entry)
+        if entry is not None and first_move is None:
+            first_move = entry[3]  # El mejor movimiento guardado se explora primero
+        if entry is not None and entry[1] >= depth:
+            value, _, flag, move = entry
+            if flag == EXACT:
+                return value, move
+            elif flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if beta <= alpha:
+                return value, move
+        alpha_orig, beta_orig = alpha, beta
+
     best_move = None
     eval=0
+    search = minimax if stats is None else stats.minimax
 
     if maximizing:
         max_eval = float('-inf')
@@ -240,77 +1096,487 @@ def minimax(board, depth, maximizing, alpha, beta):
         
 
         if legal_moves[0][0] == 'draw':
-            for move in legal_moves[1]:
-                new_board = board.make_move("draw", 'MAX', move)
-
-                # if player can use the drawn tile
-                if move in new_board.get_legal_moves("MAX")[0]:
-                    new_board=new_board.make_move(move,'MAX')
-                    eval, _ = minimax(new_board, depth - 1, False, alpha, beta)
-                else:
-                    eval, _ = minimax(new_board, depth - 1, True, alpha, beta)
-                if eval > max_eval:
-                    max_eval = eval
-                    # Storing the draw move and the drawn tile
-                    best_move = ("draw", move)
-                alpha = max(alpha, eval)
-                if beta <= alpha:
-                    break
+            # MAX no elige la ficha que roba: es un nodo de azar
+            if ordering is not None:
+                ordering.order_draws(legal_moves[1], board)
+            max_eval = chance_value(board, legal_moves[1], depth, alpha, beta, table, deadline, ordering, ply, stats)
+            best_move = ("draw", None)
         else:
-            for move in legal_moves[0]:
-                new_board = board.make_move(move, 'MAX')
-                eval, _ = minimax(new_board, depth - 1, False, alpha, beta)
+            if ordering is not None:
+                ordering.order(legal_moves[0], ply, True, first_move, board)
+            else:
+                put_first(legal_moves[0], first_move)
+            # En la frontera los hijos son hojas: se evalúan todos juntos sin recorrerlos
+            leaves = board.leaf_values(legal_moves[0], 'MAX') if depth == 1 else None
+            for index, move in enumerate(legal_moves[0]):
+                if leaves is not None:
+                    eval = leaves[index]
+                else:
+                    board.make(move, 'MAX')
+                    eval, _ = search(board, depth - 1, False, alpha, beta, table, deadline,
+                                     ordering=ordering, ply=ply + 1, stats=stats)
+                    board.unmake()
                 if eval > max_eval:
                     max_eval = eval
                     best_move = move  # Storing the move
                 alpha = max(alpha, eval)
                 if beta <= alpha:
+                    if ordering is not None:
+                        ordering.record_cutoff(move, ply, depth, True, index)
                     break
+        if table is not None:
+            store_result(table, key, max_eval, depth, alpha_orig, beta_orig, best_move)
         return max_eval, best_move
 
     else:
 
         min_eval = float('inf')
         legal_moves = board.get_legal_moves("MIN")
+        if ordering is not None:
+            ordering.order(legal_moves[0], ply, False, first_move, board)
+        else:
+            put_first(legal_moves[0], first_move)
 
-        for move in legal_moves[0]:
-            new_board = board.make_move(move, 'MIN')
-            if move == 'draw':
-                for move in new_board.get_legal_moves("MIN")[0]:
-                    if move=="draw":    
-                        eval, _ = minimax(new_board, depth - 1, False, alpha, beta)
-                    else:
-                        new_board = board.make_move(move, "MIN") 
-                        eval, _ = minimax(new_board, depth - 1, True, alpha, beta)
-                        
+        leaves = board.leaf_values(legal_moves[0], 'MIN') if depth == 1 else None
+        for index, move in enumerate(legal_moves[0]):
+            if leaves is not None:
+                eval = leaves[index]
             else:
-                eval, _ = minimax(new_board, depth - 1, True, alpha, beta)
+                board.make(move, 'MIN')
+                # Tras robar, MIN vuelve a mover; la ficha robada no cambia lo que MAX sabe
+                eval, _ = search(board, depth - 1, move != 'draw', alpha, beta, table, deadline,
+                                 ordering=ordering, ply=ply + 1, stats=stats)
+                board.unmake()
 
             if eval < min_eval:
                 min_eval = eval
                 best_move = move  # Storing the move
             beta = min(beta, eval)
             if beta <= alpha:
+                if ordering is not None:
+                    ordering.record_cutoff(move, ply, depth, False, index)
                 break
+        if table is not None:
+            store_result(table, key, min_eval, depth, alpha_orig, beta_orig, best_move)
         return min_eval, best_move
 
-class DominoesGame:
-    def __init__(self):
+
+def root_children(board):
+    """
+    Genera los hijos de la raíz para MAX tal como los recorre minimax, incluyendo cada resultado
+    ("draw", ficha) del nodo de azar: si la ficha robada se puede jugar, se juega de inmediato.
+    :return: Lista de tuplas (movimiento, tablero hijo, maximizing del hijo).
+    """
+    legal_moves, draw_list = board.get_legal_moves("MAX")
+    children = []
+    if legal_moves[0] == 'draw':
+        for tile in draw_list:
+            child = board.make_move("draw", 'MAX', tile)
+            if tile in child.get_legal_moves("MAX")[0]:
+                children.append((("draw", tile), child.make_move(tile, 'MAX'), False))
+            else:
+                children.append((("draw", tile), child, True))
+    else:
+        for move in legal_moves:
+            children.append((move, board.make_move(move, 'MAX'), False))
+    return children
+
+
+# Tablas de transposición propias de cada proceso del pool, una por juego de fichas (las claves de
+# Zobrist de juegos distintos coinciden); se conservan entre tareas
+_worker_tables = {}
+
+
+def worker_table(domino_set):
+    """
+    Tabla de transposición del proceso para un juego de fichas, que se crea si no existe.
+    """
+    table = _worker_tables.get(domino_set)
+    if table is None:
+        table = _worker_tables[domino_set] = TranspositionTable()
+    return table
+
+
+def init_search_worker(domino_set=DOUBLE_SIX):
+    """
+    Inicializador de los procesos de búsqueda paralela: crea la tabla del juego del pool antes de
+    la primera tarea.
+    """
+    domino_tables(domino_set)
+    worker_table(DominoSet(*domino_set))
+
+
+def search_packed(packed_board, depth, maximizing, alpha, beta, deadline):
+    """
+    Busca un tablero serializado con Board.pack dentro de un proceso del pool.
+    :return: Valor minimax del tablero.
+    """
+    board = Board.unpack(packed_board)
+    value, _ = minimax(board, depth, maximizing, alpha, beta, worker_table(board.tables.domino_set), deadline)
+    return value
+
+
+def parallel_minimax(board, depth, executor, workers, table=None, deadline=None, first_move=None):
+    """
+    Minimax con paralelismo en la raíz (young brothers wait): el primer hijo se busca en este
+    proceso para fijar alfa y los demás se reparten entre los procesos del pool. Cada tarea
+    nueva se envía con el mejor alfa conocido en ese momento, de modo que la cota se difunde
+    a medida que terminan las anteriores.
+    :param executor: ProcessPoolExecutor inicializado con init_search_worker.
+    :param workers: Número máximo de tareas en vuelo.
+    :return: Valor y mejor movimiento, como minimax.
+    """
+    from concurrent.futures import FIRST_COMPLETED, wait  # Solo con pool: importar game no carga multiprocessing
+    if depth == 0 or board.is_game_over():
+        return minimax(board, depth, True, float('-inf'), float('inf'), table, deadline)
+
+    children = root_children(board)
+    if isinstance(children[0][0], tuple):
+        # Nodo de azar: con la ventana completa Star1 no corta, así que todas las fichas se buscan a la vez
+        weights = dict(draw_outcomes(board, [move[1] for move, _, _ in children]))
+        futures = [(weights[move[1]], executor.submit(search_packed, child.pack(), depth - 1, child_maximizing,
+                                                      -WIN, WIN, deadline))
+                   for move, child, child_maximizing in children if move[1] in weights]
+        try:
+            total = sum(weight * future.result() for weight, future in futures)
+            return total / sum(weight for weight, _ in futures), ("draw", None)
+        finally:
+            for _, future in futures:
+                future.cancel()
+
+    for index, child in enumerate(children):
+        if child[0] == first_move:
+            children.insert(0, children.pop(index))
+            break
+
+    move, child, child_maximizing = children[0]
+    best_value, _ = minimax(child, depth - 1, child_maximizing, float('-inf'), float('inf'), table, deadline)
+    best_move = move
+
+    pending = deque(children[1:])
+    running = {}
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                move, child, child_maximizing = pending.popleft()
+                future = executor.submit(search_packed, child.pack(), depth - 1, child_maximizing,
+                                         best_value, float('inf'), deadline)
+                running[future] = move
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                move = running.pop(future)
+                value = future.result()
+                if value > best_value:
+                    best_value, best_move = value, move
+    finally:
+        for future in running:
+            future.cancel()
+    return best_value, best_move
+
+
+def max_search_depth(board):
+    """
+    Cota de la profundidad útil: cada ficha que no está en la mesa puede robarse y jugarse.
+    """
+    return 2 * (board.hand.bit_count() + board.uncertain.bit_count()) + 2
+
+
+def iterative_deepening(board, time_budget, table=None, max_depth=None, ordering=None, executor=None, workers=1,
+                        stats=None):
+    """
+    Profundiza minimax una capa a la vez hasta agotar el tiempo asignado.
+    Cada iteración explora primero el mejor movimiento de la anterior; si una iteración
+    se interrumpe, se descarta y se usa el resultado de la última completa.
+    :param board: Estado desde el que busca MAX.
+    :param time_budget: Segundos disponibles para la búsqueda.
+    :param table: Tabla de transposición opcional.
+    :param max_depth: Profundidad máxima; por defecto la cota de max_search_depth.
+    :param ordering: MoveOrdering opcional con asesinos e historial.
+    :param executor: ProcessPoolExecutor opcional; si se da, las iteraciones usan parallel_minimax.
+    :param workers: Número de procesos del executor.
+    :param stats: NodeCounter opcional; las iteraciones en el pool no se cuentan.
+    :return: Valor, mejor movimiento y profundidad de la última iteración completa.
+    """
+    search = minimax if stats is None else stats.minimax
+    deadline = time() + time_budget
+    if max_depth is None:
+        max_depth = max_search_depth(board)
+
+    # La primera iteración siempre se completa para tener un movimiento que devolver
+    value, best_move = search(board, 1, True, float('-inf'), float('inf'), table, ordering=ordering, stats=stats)
+    depth = 1
+    if len(board.get_legal_moves("MAX")[0]) == 1:
+        # Robar, pasar o una sola ficha jugable: no hay nada que decidir
+        return value, best_move, depth
+    while depth < max_depth and time() < deadline:
+        try:
+            if executor is not None:
+                value, best_move = parallel_minimax(board, depth + 1, executor, workers, table, deadline, best_move)
+            else:
+                value, best_move = search(board, depth + 1, True, float('-inf'), float('inf'), table,
+                                          deadline, best_move, ordering, stats=stats)
+        except SearchTimeout:
+            break
+        depth += 1
+    return value, best_move, depth
+
+
+def principal_variation(board, table, max_length):
+    """
+    Reconstruye la variación principal siguiendo los mejores movimientos de la tabla de
+    transposición desde la raíz. Se detiene en un nodo de azar (robo de MAX), en una posición
+    que no está en la tabla o en un movimiento que ya no es legal.
+    :return: Lista de movimientos, empezando por el de MAX.
+    """
+    state = SearchState(board)
+    maximizing = True
+    variation = []
+    while len(variation) < max_length and not state.is_game_over():
+        entry = table.probe(state.key ^ state.tables.zobrist_max if maximizing else state.key)
+        if entry is None or entry[3] is None:
+            break
+        move = entry[3]
+        player = 'MAX' if maximizing else 'MIN'
+        legal_moves = state.get_legal_moves(player)[0]
+        if isinstance(move, tuple):
+            if legal_moves[0] == 'draw':
+                variation.append(move)
+            break
+        if move not in legal_moves:
+            break
+        variation.append(move)
+        state.make(move, player)
+        if move != 'draw':
+            maximizing = not maximizing
+    return variation
+
+
+class PonderDeadline:
+    """
+    Límite de tiempo que además se puede cancelar desde otro hilo. minimax lo compara como un
+    deadline normal (time() >= deadline): la comparación llega a __le__, que también se cumple
+    en cuanto se pide cancelar, y la búsqueda se interrumpe con SearchTimeout.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.cancelled = Event()
+
+    def __le__(self, now):
+        return self.cancelled.is_set() or now >= self.limit
+
+    def __gt__(self, now):
+        return not self.__le__(now)
+
+
+# Robos seguidos del humano que se piensan antes de su jugada: cada robo más agrega una respuesta
+# por ficha jugable y es cada vez menos probable
+PONDER_DRAWS = 3
+
+
+class Ponderer:
+    """
+    Búsqueda en segundo plano durante el turno del humano. Desde la posición con MIN al turno
+    genera cada respuesta posible del humano (cada ficha jugable o pasar; tras robar, las que
+    siguen al robo) y profundiza minimax desde cada una como lo haría la máquina, una capa a la
+    vez para todas. Los resultados quedan en la tabla de transposición compartida: en el turno de
+    la máquina, iterative_deepening encuentra el valor exacto de la raíz hasta la profundidad
+    pensada y sigue desde ahí. La tabla y el orden de movimientos no se usan a la vez: stop()
+    espera a que termine el hilo.
+    """
+
+    def __init__(self, table, ordering=None):
+        self.table = table
+        self.ordering = ordering
+        self.thread = None
+        self.deadline = None
+        self.depth = 0  # Profundidad completada en todas las respuestas
+
+    def start(self, board, time_limit=MOVE_TIME_LIMIT):
+        """
+        Empieza a pensar en las respuestas del humano sin bloquear el hilo que llama.
+        :param board: Tablero desde el punto de vista de la máquina con el humano (MIN) al turno.
+        :param time_limit: Segundos tras los que deja de buscar aunque nadie lo detenga.
+        """
+        self.stop()
+        self.depth = 0
+        self.deadline = PonderDeadline(time() + time_limit)
+        self.table.new_search()
+        if self.ordering is not None:
+            self.ordering.new_search()
+        self.thread = Thread(target=self.run, args=(board, self.deadline), daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def replies(board):
+        """
+        Tableros con MAX al turno que pueden resultar de la jugada del humano.
+        """
+        children = []
+        legal_moves = board.get_legal_moves("MIN")[0]
+        for move in legal_moves:
+            if move != 'draw':
+                children.append(board.make_move(move, 'MIN'))
+        if legal_moves[-1] == 'draw':
+            children.extend(Ponderer.draw_replies(board))
+        return [child for child in children if not child.is_game_over()]
+
+    @staticmethod
+    def draw_replies(board):
+        """
+        Tableros tras robar el humano de una a PONDER_DRAWS veces y jugar la última ficha robada,
+        con las candidatas que deja OpponentTracker: quien roba no tiene ningún número de los
+        extremos, salvo en las fichas robadas, que la máquina no ve. Si el pozo se vacía decide el
+        final exacto, así que esas secuencias no se piensan.
+        """
+        excluded = board.tables.open_masks[board.left][board.right]
+        pile = board.uncertain.bit_count() - board.num_opponent_tiles
+        children = []
+        for draws in range(1, min(PONDER_DRAWS, pile - 1) + 1):
+            num_opponent_tiles = board.num_opponent_tiles + draws - 1
+            for tile in mask_to_indices(board.uncertain & excluded):
+                # La ficha jugada es la última robada: antes de robar el humano no tenía jugables
+                child = board.make_move(tile, 'MIN')
+                candidates = child.uncertain & ~excluded
+                if candidates.bit_count() < num_opponent_tiles:
+                    candidates = child.uncertain  # Como OpponentTracker.candidates
+                children.append(Board(child.left, child.right, child.hand, num_opponent_tiles, child.uncertain,
+                                      child.played, candidates=candidates, tables=board.tables))
+        return children
+
+    def run(self, board, deadline):
+        children = self.replies(board)
+        if not children:
+            return
+        best_moves = [None] * len(children)
+        max_depth = max(max_search_depth(child) for child in children)
+        try:
+            for depth in range(1, max_depth + 1):
+                for index, child in enumerate(children):
+                    _, best_moves[index] = minimax(child, depth, True, float('-inf'), float('inf'), self.table,
+                                                   deadline, best_moves[index], self.ordering)
+                self.depth = depth
+        except SearchTimeout:
+            pass
+
+    def stop(self):
+        """
+        Cancela la búsqueda en curso y espera a que el hilo termine (a lo sumo un nodo de minimax).
+        :return: Profundidad completada en todas las respuestas.
+        """
+        if self.thread is not None:
+            self.deadline.cancelled.set()
+            self.thread.join()
+            self.thread = None
+        return self.depth
+
+
+class OpponentTracker:
+    """
+    Inferencia sobre la mano del oponente a partir de sus robos, pases y jugadas durante una partida.
+    Con las reglas del juego solo se roba o se pasa sin fichas jugables, así que en ese momento el
+    oponente no tiene ningún número de los extremos. Un pase conserva lo ya excluido; un robo lo
+    reinicia a los extremos actuales, porque las fichas robadas pueden tener números excluidos antes.
+    """
+
+    def __init__(self, tables=None):
+        """
+        :param tables: DominoTables del juego de la partida; por defecto el doble seis.
+        """
+        self.tables = DEFAULT_TABLES if tables is None else tables
+        self.reset()
+
+    def reset(self):
+        """
+        Empieza una partida nueva sin información.
+        """
+        self.excluded_pips = 0  # Bit p encendido: el oponente no tiene fichas con el número p
+        self.events = []  # Registro de la partida: ('draw' | 'pass', izquierdo, derecho) o ('play', ficha)
+
+    def record_draw(self, left, right):
+        """
+        El oponente robó una ficha con los extremos abiertos left y right.
+        """
+        self.events.append(('draw', left, right))
+        self.excluded_pips = 0 if left == EMPTY else (1 << left) | (1 << right)
+
+    def record_pass(self, left, right):
+        """
+        El oponente pasó con los extremos abiertos left y right.
+        """
+        self.events.append(('pass', left, right))
+        if left != EMPTY:
+            self.excluded_pips |= (1 << left) | (1 << right)
+
+    def record_play(self, tile):
+        """
+        El oponente jugó la ficha con índice tile. Justo después de robar puede ser la ficha robada;
+        si no, una ficha con un número excluido indica que no siguió las reglas que supone la
+        inferencia y se descarta lo aprendido.
+        """
+        just_drew = bool(self.events) and self.events[-1][0] == 'draw'
+        self.events.append(('play', tile))
+        a, b = self.tables.tiles[tile]
+        if not just_drew and self.excluded_pips & ((1 << a) | (1 << b)):
+            self.excluded_pips = 0
+
+    def excluded_tiles(self):
+        """
+        Máscara de las fichas que el oponente no puede tener.
+        """
+        mask = 0
+        for pip, pip_mask in enumerate(self.tables.pip_masks):
+            if (self.excluded_pips >> pip) & 1:
+                mask |= pip_mask
+        return mask
+
+    def candidates(self, uncertain, num_opponent_tiles):
+        """
+        Fichas inciertas que el oponente puede tener. Si no alcanzan para su mano, la inferencia no
+        es consistente con lo observado y se devuelven todas las inciertas.
+        """
+        candidates = uncertain & ~self.excluded_tiles()
+        if candidates.bit_count() < num_opponent_tiles:
+            return uncertain
+        return candidates
+
+
+class DominoRules:
+    """
+    Estado y reglas de una partida sin interfaz ni búsqueda: mesa, manos, pozo, lo observado del
+    humano y los movimientos. DominoesGame le agrega la máquina y la consola; el servidor y
+    selfplay la usan directamente, sin reservar tabla de transposición ni libro.
+    """
+
+    def __init__(self, domino_set=DOUBLE_SIX):
+        """
+        :param domino_set: Juego de fichas de la partida (DominoSet); por defecto el doble seis.
+        """
+        self.domino_set = DominoSet(*domino_set)
+        self.tables = domino_tables(domino_set)  # Tablas del juego; los Board de la partida las llevan
         self.board = deque()  # Representación del tablero como deque
-        self.all_dominoes = [Domino(a, b) for a in range(7) for b in range(a, 7)]  # Genera las 28 fichas de dominó
+        self.all_dominoes = [Domino(a, b) for a, b in self.tables.tiles]  # Genera las fichas del juego (28 en el doble seis)
         self.player1 = []  # nuestro jugador
         self.player2 = []  # jugador oponente
         self.pile = []  # fichas que no se han repartido
-        self.previous_winner = None  
+        self.previous_winner = None
         self.previous_game_tied = False
-        
+        self.opponent_tracker = OpponentTracker(self.tables)  # Lo que se sabe de la mano del jugador humano
+        self.deal = []  # Índices de all_dominoes tras mezclar: manos y pozo
+        self.moves = []  # Movimientos de la partida en el formato de minimax ('draw', 'pass' o ficha)
 
-    def deal_dominoes(self):
-        
-        random.shuffle(self.all_dominoes) #se mezclan las fichas
-        self.player1 = self.all_dominoes[:7] #se reparten las fichas 7 para nuestro jugador
-        self.player2 = self.all_dominoes[7:14] #se reparten las fichas 7 para el oponente
-        self.pile = self.all_dominoes[14:] #se reparten las fichas restantes al pozo
+    def deal_dominoes(self, rng=random):
+        # Con un generador con semilla el reparto es reproducible aunque se reutilice el juego
+        hand_size = self.tables.hand_size
+        self.board = deque()
+        self.all_dominoes.sort(key=lambda domino: (domino.left, domino.right))
+        rng.shuffle(self.all_dominoes) #se mezclan las fichas
+        self.player1 = self.all_dominoes[:hand_size] #se reparten las fichas (7 en el doble seis) para nuestro jugador
+        self.player2 = self.all_dominoes[hand_size:2 * hand_size] #se reparten las fichas para el oponente
+        self.pile = self.all_dominoes[2 * hand_size:] #se reparten las fichas restantes al pozo
+        self.opponent_tracker.reset()
+        self.deal = [self.tile_index(domino) for domino in self.all_dominoes]
+        self.moves = []
 
     def print_dominoes(self, player):
         for i, domino in enumerate(player):
@@ -322,33 +1588,49 @@ class DominoesGame:
     def print_board(self):
         print(" ".join([str(domino) for domino in self.board]))
 
+    def open_ends(self):
+        """
+        Extremos abiertos del tablero, o (EMPTY, EMPTY) si está vacío.
+        """
+        if self.board:
+            return self.board[0].left, self.board[-1].right
+        return EMPTY, EMPTY
+
     def draw_from_pile(self, hand):
         if self.pile: #si el pozo no esta vacio
             draw_domino = self.pile.pop() #se saca una ficha del pozo
             hand.append(draw_domino)
+            self.moves.append('draw')
             return draw_domino
         else: #si el pozo esta vacio
             return None #no se saca ninguna ficha
 
+    def tile_index(self, domino):
+        """
+        Índice de la ficha en las tablas del juego, el que usan Board y los movimientos de búsqueda.
+        """
+        return self.tables.tile_index[(domino.left, domino.right)]
+
     def is_legal_move(self, domino):
         if not self.board:
             return ('left', 'normal')  # Si el tablero está vacío, podemos colocar el dominó en cualquier extremo. Elegimos 'left' por defecto.
-        
-        # Verificar si el dominó puede colocarse en el extremo izquierdo del tablero
-        if domino.right == self.board[0].left:
-            return ('left', 'reversed')
-        elif domino.left == self.board[0].left:
-            return ('left', 'normal')
-        
-        # Verificar si el dominó puede colocarse en el extremo derecho del tablero
-        if domino.right == self.board[-1].right:
-            return ('right', 'normal')
-        elif domino.left == self.board[-1].right:
-            return ('right', 'reversed')
-        
-        # Si no se puede colocar en ningún extremo, retornar None
-        return None
-        
+
+        # La tabla del par de extremos dice en qué extremo encaja el dominó (primero el izquierdo) y
+        # con qué orientación; None si no se puede colocar en ningún extremo
+        return self.tables.placements[self.board[0].left][self.board[-1].right][domino.left][domino.right]
+
+    def has_playable(self, hand):
+        """
+        Indica si alguna ficha de la mano se puede jugar en los extremos actuales.
+        :param hand: Lista de Domino.
+        """
+        left, right = self.open_ends()
+        placements = self.tables.placements[left][right]
+        for domino in hand:
+            if placements[domino.left][domino.right]:
+                return True
+        return False
+
     def place_domino(self, domino):
         legal_moves = self.is_legal_move(domino)
         
@@ -372,37 +1654,32 @@ class DominoesGame:
             
     def is_game_tied(self):
         # El juego está empatado si ambos jugadores no pueden jugar y el pozo está vacío
-        for domino in self.player1:
-            if self.is_legal_move(domino):
-                return False
-        for domino in self.player2:
-            if self.is_legal_move(domino):
-                return False
         if self.pile:
             return False
-        return True
+        return not self.has_playable(self.player1) and not self.has_playable(self.player2)
     
     def highest_tile(self):
+        max_pip = self.tables.max_pip
     # Primero, vamos a buscar la mula más alta en manos de los jugadores.
-        for i in range(6, -1, -1):  # Comenzamos con la mula de 6|6 y vamos hacia abajo.
+        for i in range(max_pip, -1, -1):  # Comenzamos con la mula más alta (6|6 en el doble seis) y vamos hacia abajo.
             mula = Domino(i, i)
             if mula in self.player1:
                 return 'player'
             elif mula in self.player2:
                 return 'machine'
         
-        # Si ninguno tiene una mula, buscamos la ficha con un 6 que tenga el puntaje más alto en el otro lado.
-        for i in range(6, -1, -1):
-            tile1 = Domino(6, i)
-            tile2 = Domino(i, 6)
+        # Si ninguno tiene una mula, buscamos la ficha con el número más alto que tenga el puntaje más alto en el otro lado.
+        for i in range(max_pip, -1, -1):
+            tile1 = Domino(max_pip, i)
+            tile2 = Domino(i, max_pip)
             if tile1 in self.player1 or tile2 in self.player1:
                 return 'player'
             elif tile1 in self.player2 or tile2 in self.player2:
                 return 'machine'
         
-        # Continúa con 5, 4, 3, etc., si es necesario.
-        for num in range(5, -1, -1):
-            for i in range(6, -1, -1):
+        # Continúa con los números siguientes hacia abajo, si es necesario.
+        for num in range(max_pip - 1, -1, -1):
+            for i in range(max_pip, -1, -1):
                 tile1 = Domino(num, i)
                 tile2 = Domino(i, num)
                 if tile1 in self.player1 or tile2 in self.player1:
@@ -414,6 +1691,46 @@ class DominoesGame:
         # simplemente devuelve 'player' para que el jugador juegue primero.
         return 'player'
 
+    def board_view(self, hand, opponent, tracker=None):
+        """
+        Convierte el estado del juego en un Board desde el punto de vista del dueño de hand.
+        :param hand: Fichas del jugador que va a mover.
+        :param opponent: Fichas de su oponente (solo se usa cuántas son).
+        :param tracker: OpponentTracker opcional que restringe las fichas candidatas del oponente.
+        """
+        left, right = self.open_ends()
+
+        # Las fichas inciertas son todas las que el jugador no ve (pozo y mano del oponente), de modo
+        # que puede robar mientras haya más inciertas que fichas del oponente
+        tables = self.tables
+        hand = tables.tiles_to_mask((tile.left, tile.right) for tile in hand)
+        played = tables.tiles_to_mask((tile.left, tile.right) for tile in self.board)
+        uncertain = tables.full_mask & ~hand & ~played
+        candidates = None if tracker is None else tracker.candidates(uncertain, len(opponent))
+        return Board(left, right, hand, len(opponent), uncertain, played, candidates=candidates, tables=tables)
+
+
+class DominoesGame(DominoRules):
+    def __init__(self, time_budget=DEFAULT_TIME_BUDGET, workers=1, engine='minimax', stats_path=None, profile=False,
+                 ponder=True, opening_book=True, record_path=None, domino_set=DOUBLE_SIX):
+        if engine not in ENGINES:
+            raise ValueError(f"Motor inválido: {engine}")
+        super().__init__(domino_set)
+        # La máquina busca con un Engine (engine.py): tabla, orden, libro y motores se conservan entre turnos
+        from engine import Engine  # engine importa este módulo
+        self.searcher = Engine(engine, workers, time_budget, opening_book, domino_set=domino_set)
+        self.transposition_table = self.searcher.table
+        self.move_ordering = self.searcher.ordering  # None: el Engine no ordena por defecto
+        self.opening_book = self.searcher.book  # OpeningBook con la primera jugada de la máquina (openingbook.py)
+        self.time_budget = time_budget  # Segundos de búsqueda por movimiento de la máquina
+        self.engine = engine  # Motor de búsqueda de la máquina, uno de ENGINES
+        self.stats_path = stats_path  # Archivo JSON lines con las estadísticas de cada turno (opcional)
+        self.profile = profile  # Si es True, cada turno de la máquina se perfila con cProfile
+        self.last_stats = None  # SearchStats del último turno instrumentado
+        # Búsqueda en segundo plano mientras el humano piensa (solo con minimax, que comparte la tabla)
+        self.ponderer = Ponderer(self.transposition_table, self.move_ordering) if ponder else None
+        self.record_path = record_path  # Archivo de registros de partidas (gamerecord.py), opcional
+        self.deal_seed = 0  # Semilla del último reparto de play()
 
     def player_input(self):
         print("Tablero Actual:")  # Imprime el tablero actual
@@ -427,9 +1744,15 @@ class DominoesGame:
 
         while True:
             domino_choice = input("Elige un dominó para jugar (por ejemplo, '1|2'), 'draw', o 'pass': ")  # Pide al jugador que elija una ficha
-            
+
+            if domino_choice in ("draw", "pass") and self.has_playable(self.player1):
+                # Solo se roba o se pasa sin fichas jugables: OpponentTracker excluye los números de
+                # los extremos de la mano del jugador cuando lo hace
+                print("Tienes una ficha jugable: no puedes pescar ni pasar.")
+                continue
             if domino_choice == "draw":  # Si el jugador elige pescar
                 if self.pile:  # Si hay fichas en el pozo
+                    self.opponent_tracker.record_draw(*self.open_ends())
                     drawn_domino = self.draw_from_pile(self.player1)
                     print(f"Has pescado {drawn_domino}.")
                     sleep (1)   
@@ -456,43 +1779,85 @@ class DominoesGame:
                     print("No tienes esa ficha. Elige otra.")
                     continue
                 else:
-                    return chosen_domino
+                    # La ficha de la mano, con su orientación: la partida no depende de cómo se escribió
+                    return self.player1[self.player1.index(chosen_domino)]
 
                 
 
+    def search_move(self, board):
+        """
+        Elige un movimiento para el Board con el motor configurado.
+        :return: Índice de ficha, 'pass' o ("draw", None).
+        """
+        best_move, _ = self.searcher.choose_move(board, self.time_budget)
+        return best_move
+
+    def analyze_move(self, board, profile=False):
+        """
+        Como search_move, pero instrumentando la búsqueda.
+        :param profile: Si es True, también perfila la búsqueda con cProfile.
+        :return: Movimiento y SearchStats del turno.
+        """
+        return self.searcher.choose_move(board, self.time_budget, instrument=True, profile=profile)
+
+    def start_pondering(self):
+        """
+        Empieza a buscar en segundo plano las respuestas del humano, si el motor lo permite.
+        """
+        from endgame import is_endgame  # endgame importa este módulo
+        if self.ponderer is None or self.engine != 'minimax':
+            return
+        # El tablero de la máquina con el humano al turno: minimax lo recorre desde MIN
+        board = self.board_view(self.player2, self.player1, self.opponent_tracker)
+        if not is_endgame(board) and not board.is_game_over():
+            self.ponderer.start(board)
+
+    def stop_pondering(self):
+        """
+        Detiene la búsqueda en segundo plano; lo encontrado queda en la tabla de transposición.
+        """
+        if self.ponderer is not None:
+            self.ponderer.stop()
+
     def machine_move(self):
-        # Verificar si el tablero tiene fichas y, de ser así, obtener los extremos
-        draw_count = 0
-        if len(self.board) > 0:
-            sides = np.array([self.board[0].left, self.board[-1].right])
+        # Convertir el estado actual del juego a un objeto Board (una sola vez por turno)
+        board = self.board_view(self.player2, self.player1, self.opponent_tracker)
+        if self.stats_path is not None or self.profile:
+            best_move, self.last_stats = self.analyze_move(board, self.profile)
+            if self.stats_path is not None:
+                with open(self.stats_path, 'a') as stream:
+                    stream.write(self.last_stats.to_json() + "\n")
         else:
-            sides = np.array([None, None])
+            best_move = self.search_move(board)
 
-        # Convertir el estado actual del juego a un objeto Board
-        hand = np.array([[tile.left, tile.right] for tile in self.player2])
-        num_opponent_tiles = len(self.player1)
-        uncertain_tiles = np.array([[tile.left, tile.right] for tile in self.pile])
-        board = Board(sides, hand, num_opponent_tiles, uncertain_tiles)
-        
-        # Llamar al algoritmo minimax para determinar el mejor movimiento
-        _, best_move = minimax(board, 4, True, float('-inf'), float('inf'))
-        
         if best_move == "pass":
             return None
-        elif best_move[0] == "draw":
-            drawn_tile = self.draw_from_pile(self.player2)
-            self.player2.append(drawn_tile)  
-            return drawn_tile
-        
+        elif isinstance(best_move, tuple):  # ("draw", None): la ficha real sale del pozo
+            return self.draw_from_pile(self.player2)
+
         else:
             # Buscar y devolver la instancia correspondiente de self.player2
+            best_tile = Domino(*self.tables.tiles[best_move])
             for tile in self.player2:
-                if tile.left == best_move[0] and tile.right == best_move[1]:
+                if tile == best_tile:
                     return tile
 
 
+    def save_record(self, first_seat):
+        """
+        Agrega la partida terminada al archivo de registros. El asiento 0 es el humano y el 1 la máquina.
+        :param first_seat: Asiento que empezó la partida.
+        """
+        import gamerecord  # gamerecord importa este módulo
+        record = gamerecord.GameRecord(self.deal_seed, first_seat, 1 << 1, self.domino_set, bytes(self.deal),
+                                       bytes(gamerecord.encode_move(move) for move in self.moves))
+        with gamerecord.RecordWriter(self.record_path, append=True) as writer:
+            writer.write(record)
+
     def play(self):
-        self.deal_dominoes()  # Reparte las fichas
+        # Con la semilla guardada el registro de la partida permite repetir el reparto
+        self.deal_seed = random.getrandbits(32)
+        self.deal_dominoes(random.Random(self.deal_seed))  # Reparte las fichas
         print("Bienvenido al juego de dominó.")
         sleep(1)
         new_game = input("¿Es un nuevo juego? (sí/no): ").strip().lower() == "sí"
@@ -520,14 +1885,21 @@ class DominoesGame:
                 player_turn = False
 
         sleep(2)
+        first_seat = 0 if player_turn else 1
 
         while True: # Ciclo principal del juego
             self.print_board()
             if player_turn: # Si es el turno del jugador
                 start_time = time()
-                domino = self.player_input()
+                self.start_pondering()
+                try:
+                    domino = self.player_input()
+                finally:
+                    self.stop_pondering()
                 elapsed_time = time() - start_time
-                if elapsed_time > 60: # Si el jugador tarda más de 60 segundos en realizar su movimiento
+                if domino is None:
+                    self.opponent_tracker.record_pass(*self.open_ends())
+                if elapsed_time > MOVE_TIME_LIMIT: # Si el jugador tarda más de 60 segundos en realizar su movimiento
                     print("Has excedido el límite de tiempo de 60 segundos para realizar tu movimiento.")
                     print("El turno pasa a la máquina.")
                     player_turn = not player_turn  # Cambia el turno
@@ -547,7 +1919,7 @@ class DominoesGame:
                         sleep(1)
                 else:
                     print("La máquina pasa su turno.")
-                if elapsed_time > 60:
+                if elapsed_time > MOVE_TIME_LIMIT:
                     print("La máquina ha excedido el límite de tiempo de 60 segundos para realizar su movimiento.")
                     print("El turno pasa a ti.")
                     player_turn = not player_turn
@@ -557,7 +1929,9 @@ class DominoesGame:
             if domino: # Si se ha jugado una ficha
                 if self.is_legal_move(domino): # Verifica si el movimiento es legal
                     self.place_domino(domino) # Coloca la ficha en el tablero
+                    self.moves.append(self.tile_index(domino))
                     if player_turn:
+                        self.opponent_tracker.record_play(self.tile_index(domino))
                         self.player1.remove(domino)
                     else:
                         self.player2.remove(domino)
@@ -567,6 +1941,7 @@ class DominoesGame:
                     continue  # Vuelve al inicio del ciclo
             else:
                 print("Pasas tu turno.")
+                self.moves.append('pass')
                 sleep(1)
 
             # Cambiar el turno
@@ -601,5 +1976,10 @@ class DominoesGame:
                 print("Juego Terminado")
                 break
 
-game = DominoesGame()
-game.play()
+        if self.record_path is not None:
+            self.save_record(first_seat)
+
+if __name__ == "__main__":
+    # Se juega con el módulo importado como game, el mismo que usan e instrumentan los demás módulos
+    import game
+    game.DominoesGame().play()
@@ -0,0 +1,236 @@
+"""
+Registro binario compacto de partidas, con lectura y escritura en flujo, reproducción y análisis.
+Cada partida ocupa 8 bytes de cabecera (semilla del reparto, asiento que empieza, asientos de la
+máquina y el juego de fichas: número más alto y fichas por mano), el orden de las fichas del juego
+(28 en el doble seis: las 7 del asiento 0, las 7 del asiento 1 y el pozo, que se roba desde el
+final) y un byte por acción: índice de ficha (0-90), DRAW, PASS y END al terminar.
+Quién mueve se deduce al reproducir: tras robar vuelve a mover el mismo asiento y tras jugar o
+pasar mueve el otro. El análisis vuelve a buscar cada movimiento grabado de la máquina con una
+búsqueda más profunda, repartiendo los archivos (fragmentos) entre procesos.
+Uso: python gamerecord.py partidas-0.rec partidas-1.rec [--depth 6] [--workers 4]
+"""
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import os
+import struct
+
+import game
+from game import EMPTY, Board, DominoSet, OpponentTracker, TranspositionTable, minimax
+
+MAGIC = b'DOMREC02'
+# semilla, asiento que empieza, máscara de asientos de la máquina, número más alto y fichas por mano
+HEADER = struct.Struct('<IBBBB')
+# Por encima de cualquier índice de ficha, incluso del doble doce
+DRAW, PASS, END = 0xFD, 0xFE, 0xFF
+END_BYTE = bytes([END])
+READ_CHUNK = 2 ** 16
+DEFAULT_DEPTH = 6
+ANALYSIS_TABLE_BYTES = 4 * 2 ** 20
+
+# domino_set: DominoSet de la partida; deal: bytes con los índices de sus fichas; actions: bytes sin el END final
+GameRecord = namedtuple('GameRecord', 'seed first machine_seats domino_set deal actions')
+# Posición desde el punto de vista del asiento que mueve y movimiento en el formato de get_legal_moves
+ReplayStep = namedtuple('ReplayStep', 'seat board move')
+MoveAnalysis = namedtuple('MoveAnalysis', 'game ply played best played_value best_value')
+
+
+def deal_order(dominoes, tables):
+    """
+    Orden del reparto de DominoesGame.deal_dominoes (all_dominoes tras mezclar) como bytes.
+    :param tables: DominoTables del juego de la partida.
+    """
+    return bytes(tables.tile_index[(domino.left, domino.right)] for domino in dominoes)
+
+
+def encode_move(move):
+    """
+    Byte de un movimiento: índice de ficha, 'draw' (o ("draw", ficha)) o 'pass'.
+    """
+    if move == 'pass':
+        return PASS
+    if move == 'draw' or isinstance(move, tuple):
+        return DRAW
+    return move
+
+
+class RecordWriter:
+    """
+    Escribe partidas una a una en un archivo de registros.
+    """
+
+    def __init__(self, path, append=False):
+        """
+        :param append: Si es True, agrega al archivo existente en lugar de reemplazarlo.
+        """
+        empty = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+        self.stream = open(path, 'ab' if append else 'wb')
+        if empty:
+            self.stream.write(MAGIC)
+
+    def write(self, record):
+        self.stream.write(HEADER.pack(record.seed, record.first, record.machine_seats, *record.domino_set)
+                          + bytes(record.deal) + bytes(record.actions) + END_BYTE)
+
+    def close(self):
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_records(path):
+    """
+    Lee un archivo de registros como generador, por bloques y sin cargarlo completo en memoria.
+    """
+    with open(path, 'rb') as stream:
+        if stream.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} no es un archivo de partidas")
+        buffer, offset = b'', 0
+        while True:
+            # END se busca después de la cabecera y del reparto (la semilla sí puede contener 0xFF)
+            end = -1
+            if len(buffer) - offset >= HEADER.size:
+                seed, first, machine_seats, max_pip, hand_size = HEADER.unpack_from(buffer, offset)
+                start = offset + HEADER.size + (max_pip + 1) * (max_pip + 2) // 2
+                end = buffer.find(END_BYTE, start)
+            if end < 0:
+                chunk = stream.read(READ_CHUNK)
+                if not chunk:
+                    if offset < len(buffer):
+                        raise ValueError(f"{path} termina con una partida incompleta")
+                    return
+                buffer, offset = buffer[offset:] + chunk, 0
+                continue
+            yield GameRecord(seed, first, machine_seats, DominoSet(max_pip, hand_size),
+                             buffer[offset + HEADER.size:start], buffer[start:end])
+            offset = end + 1
+
+
+def replay(record):
+    """
+    Reproduce una partida con las reglas de DominoesGame.play. Cada asiento lleva un
+    OpponentTracker con los robos, pases y jugadas del otro, como en selfplay.
+    :return: Generador de ReplayStep, uno por acción, con el Board de quien mueve antes de mover.
+    Los tableros llevan las tablas del juego de fichas de la partida.
+    :raises ValueError: Si el juego de fichas no es válido o si una acción no es posible en la posición.
+    """
+    tables = game.domino_tables(record.domino_set)
+    deal = record.deal
+    hand_size = record.domino_set.hand_size
+    hands = [sum(1 << tile for tile in deal[:hand_size]), sum(1 << tile for tile in deal[hand_size:2 * hand_size])]
+    counts = [hand_size, hand_size]
+    pile = list(deal[2 * hand_size:])
+    left = right = EMPTY
+    played = 0
+    trackers = [OpponentTracker(tables), OpponentTracker(tables)]  # trackers[i] observa al rival de i
+    seat = record.first
+    for action in record.actions:
+        hand = hands[seat]
+        uncertain = tables.full_mask & ~hand & ~played
+        board = Board(left, right, hand, counts[1 - seat], uncertain, played,
+                      candidates=trackers[seat].candidates(uncertain, counts[1 - seat]), tables=tables)
+        observer = trackers[1 - seat]
+        if action == DRAW:
+            if not pile:
+                raise ValueError("Robo con el pozo vacío")
+            yield ReplayStep(seat, board, 'draw')
+            observer.record_draw(left, right)
+            hands[seat] |= 1 << pile.pop()
+            counts[seat] += 1
+            continue
+        if action == PASS:
+            yield ReplayStep(seat, board, 'pass')
+            observer.record_pass(left, right)
+        else:
+            if action >= len(tables.tiles) or not hand >> action & 1:
+                raise ValueError(f"La ficha {action} no está en la mano del asiento {seat}")
+            child = board.make_move(action, 'MAX')  # ValueError si no encaja en los extremos
+            yield ReplayStep(seat, board, action)
+            observer.record_play(action)
+            left, right, played = child.left, child.right, child.played
+            hands[seat] = child.hand
+            counts[seat] -= 1
+        seat = 1 - seat
+
+
+def analyze_record(record, depth, table, game_index=0, ordering=None):
+    """
+    Vuelve a buscar a profundidad depth cada movimiento de la máquina con más de una opción.
+    :param ordering: MoveOrdering opcional; por defecto, como el Engine, sin orden de movimientos.
+    :return: Lista de MoveAnalysis con el valor del movimiento jugado y el del mejor.
+    """
+    analyses = []
+    for ply, (seat, board, move) in enumerate(replay(record)):
+        if not record.machine_seats >> seat & 1 or len(board.get_legal_moves("MAX")[0]) == 1:
+            continue
+        table.new_search()
+        best_value, best = minimax(board, depth, True, float('-inf'), float('inf'), table, ordering=ordering)
+        if best == move:
+            played_value = best_value
+        else:
+            played_value, _ = minimax(board.make_move(move, 'MAX'), depth - 1, False, float('-inf'), float('inf'),
+                                      table, ordering=ordering)
+        analyses.append(MoveAnalysis(game_index, ply, move, best, played_value, best_value))
+    return analyses
+
+
+def analyze_shard(path, depth=DEFAULT_DEPTH):
+    """
+    Analiza todas las partidas de un archivo. Cada partida se analiza con su juego de fichas y con
+    una tabla de transposición de ese juego.
+    :return: Ruta y lista de MoveAnalysis.
+    """
+    tables = {}  # Juego de fichas -> tabla de transposición
+    analyses = []
+    for game_index, record in enumerate(read_records(path)):
+        table = tables.get(record.domino_set)
+        if table is None:
+            table = tables[record.domino_set] = TranspositionTable(ANALYSIS_TABLE_BYTES)
+        analyses.extend(analyze_record(record, depth, table, game_index))
+    return path, analyses
+
+
+def _analyze_task(args):
+    return analyze_shard(*args)
+
+
+def analyze_shards(paths, depth=DEFAULT_DEPTH, workers=1):
+    """
+    Analiza varios archivos, uno por tarea, en paralelo si workers > 1.
+    :return: Generador de (ruta, lista de MoveAnalysis) en el orden de paths.
+    """
+    tasks = [(path, depth) for path in paths]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(_analyze_task, tasks)
+    else:
+        yield from map(_analyze_task, tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs='+', help="Archivos de partidas (un fragmento por proceso)")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="Profundidad del nuevo análisis")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    total = agreed = 0
+    loss = 0.0
+    for path, analyses in analyze_shards(args.paths, args.depth, args.workers):
+        shard_agreed = sum(analysis.played == analysis.best for analysis in analyses)
+        shard_loss = sum(analysis.best_value - analysis.played_value for analysis in analyses)
+        print(f"{path}: {len(analyses)} movimientos, {shard_agreed} coinciden, pérdida total {shard_loss:.3f}")
+        total += len(analyses)
+        agreed += shard_agreed
+        loss += shard_loss
+    if total:
+        print(f"Total: {total} movimientos, {100 * agreed / total:.1f}% coinciden con la búsqueda a profundidad "
+              f"{args.depth}, pérdida media {loss / total:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+Motor MCTS sobre conjuntos de información (ISMCTS de un solo observador).
+Cada iteración determiniza la información oculta (mano del oponente y orden del pozo) a partir
+del mismo Board que usa minimax, desciende el árbol con UCB entre las acciones disponibles en esa
+determinización y termina con una partida aleatoria. Los nodos se guardan en arreglos compactos y
+el subárbol que corresponde a lo que realmente ocurrió se conserva entre turnos.
+"""
+from array import array
+from math import log, sqrt
+import random
+from time import time
+
+from game import Board, MAX_TILE_COUNT, mask_to_indices
+from pimc import place_tile, sample_worlds
+
+MAX_PLAYER, MIN_PLAYER = 0, 1
+# Fuera del rango de índices de ficha de cualquier juego, hasta el doble doce
+DRAW = MAX_TILE_COUNT
+PASS = MAX_TILE_COUNT + 1
+EXPLORATION = 0.7
+CHECK_EVERY = 64  # Iteraciones entre consultas al reloj
+
+
+def legal_actions(left, right, hand, can_draw, tables):
+    """
+    Acciones del jugador al turno: sus fichas jugables, o robar/pasar si no tiene ninguna.
+    :param tables: DominoTables del juego de la partida.
+    """
+    playable = hand & tables.open_masks[left][right]
+    if playable:
+        return mask_to_indices(playable)
+    return [DRAW] if can_draw else [PASS]
+
+
+def observed_actions(old, action, board):
+    """
+    Reconstruye las acciones que ocurrieron desde la última búsqueda comparando los estados.
+    :param old: Board.pack() de la raíz anterior.
+    :param action: Acción que eligió MAX en esa raíz.
+    :param board: Estado actual, de nuevo con MAX al turno.
+    :return: Lista de acciones desde la raíz anterior, o None si los estados no son consistentes.
+    """
+    _, _, old_hand, old_opponent, _, old_played, _, old_set = old
+    if old_set != board.tables.domino_set:
+        return None  # Otra partida, con otro juego de fichas
+    if action == DRAW:
+        # La máquina robó y vuelve a mover: solo cambió su mano
+        gained = board.hand & ~old_hand
+        if gained.bit_count() != 1 or board.hand & ~gained != old_hand or board.played != old_played:
+            return None
+        return [DRAW]
+
+    own = 0 if action == PASS else 1 << action
+    if board.hand != old_hand & ~own:
+        return None
+    human_played = board.played & ~old_played & ~own
+    plays = human_played.bit_count()
+    draws = board.num_opponent_tiles - old_opponent + plays
+    if plays > 1 or draws < 0:
+        return None
+    return [action] + [DRAW] * draws + (mask_to_indices(human_played) if plays else [PASS])
+
+
+class ISMCTS:
+    """
+    Árbol de búsqueda en arreglos paralelos: cada nodo es un índice y sus hijos forman una lista
+    enlazada (first_child, sibling). reward guarda la suma de resultados desde el punto de vista
+    del jugador que hizo la acción que lleva al nodo; avail cuenta cuántas veces estuvo disponible.
+    """
+
+    def __init__(self, exploration=EXPLORATION, rng=None):
+        self.exploration = exploration
+        self.rng = rng or random.Random()
+        self.root_state = None  # Board.pack() de la raíz
+        self.root_action = None  # Acción elegida en la raíz, pendiente de observar
+        self.reset()
+
+    def reset(self):
+        """
+        Descarta el árbol y crea una raíz vacía.
+        """
+        self.first_child = array('i')
+        self.sibling = array('i')
+        self.action = array('b')
+        self.mover = array('b')
+        self.visits = array('i')
+        self.avail = array('i')
+        self.reward = array('d')
+        self.root = self.add_node(-1, -1, MIN_PLAYER)
+
+    def __len__(self):
+        return len(self.visits)
+
+    def add_node(self, parent, action, mover):
+        """
+        Agrega un nodo hijo de parent alcanzado por action, jugada por mover.
+        :return: Índice del nuevo nodo.
+        """
+        index = len(self.visits)
+        self.first_child.append(-1)
+        self.action.append(action)
+        self.mover.append(mover)
+        self.visits.append(0)
+        self.avail.append(0)
+        self.reward.append(0.0)
+        if parent >= 0:
+            self.sibling.append(self.first_child[parent])
+            self.first_child[parent] = index
+        else:
+            self.sibling.append(-1)
+        return index
+
+    def child(self, node, action):
+        """
+        Devuelve el hijo de node alcanzado por action, o -1 si no existe.
+        """
+        child = self.first_child[node]
+        while child >= 0 and self.action[child] != action:
+            child = self.sibling[child]
+        return child
+
+    def reroot(self, node):
+        """
+        Convierte node en la raíz copiando su subárbol a arreglos nuevos; el resto se libera.
+        """
+        old = (self.first_child, self.sibling, self.action, self.mover, self.visits, self.avail, self.reward)
+        first_child, sibling, action, mover, visits, avail, reward = old
+        self.reset()
+        self.visits[self.root] = visits[node]
+        stack = [(node, self.root)]
+        while stack:
+            old_node, new_node = stack.pop()
+            child = first_child[old_node]
+            while child >= 0:
+                copy = self.add_node(new_node, action[child], mover[child])
+                self.visits[copy] = visits[child]
+                self.avail[copy] = avail[child]
+                self.reward[copy] = reward[child]
+                stack.append((child, copy))
+                child = sibling[child]
+
+    def sync(self, board):
+        """
+        Avanza la raíz por las acciones observadas desde la última búsqueda, conservando el
+        subárbol correspondiente; si no se puede, empieza un árbol nuevo.
+        """
+        actions = None
+        if self.root_state is not None and self.root_action is not None:
+            actions = observed_actions(self.root_state, self.root_action, board)
+        node = self.root if actions else -1
+        for action in actions or ():
+            node = self.child(node, action)
+            if node < 0:
+                break
+        if node >= 0:
+            self.reroot(node)
+        else:
+            self.reset()
+        self.root_state = board.pack()
+        self.root_action = None
+
+    def iterate(self, board):
+        """
+        Ejecuta una iteración: determinización, selección, expansión, partida aleatoria y retropropagación.
+        """
+        opponent, pile = sample_worlds(board, 1, self.rng)[0]
+        tables = board.tables
+        hands = [board.hand, opponent]
+        left, right = board.left, board.right
+        pile_pos, player, passes = 0, MAX_PLAYER, 0
+        result = None  # Resultado para MAX: 1 gana, 0 pierde, 0.5 empate
+
+        node = self.root
+        path = []
+        expanded = False
+        while result is None and not expanded:
+            actions = legal_actions(left, right, hands[player], pile_pos < len(pile), tables)
+            best, best_score = -1, -1.0
+            untried = []
+            for action in actions:
+                child = self.child(node, action)
+                if child < 0:
+                    untried.append(action)
+                    continue
+                self.avail[child] += 1
+                score = self.reward[child] / self.visits[child] + \
+                    self.exploration * sqrt(log(self.avail[child]) / self.visits[child])
+                if score > best_score:
+                    best, best_score = child, score
+            if untried:
+                action = self.rng.choice(untried)
+                node = self.add_node(node, action, player)
+                self.avail[node] = 1
+                expanded = True
+            else:
+                node = best
+                action = self.action[node]
+            path.append(node)
+
+            # Aplica la acción a la determinización
+            if action == DRAW:
+                hands[player] |= 1 << pile[pile_pos]
+                pile_pos += 1
+            elif action == PASS:
+                passes += 1
+                player ^= 1
+                if passes == 2:
+                    result = 0.5
+            else:
+                left, right = place_tile(left, right, action, tables.tiles)
+                hands[player] &= ~(1 << action)
+                passes = 0
+                if not hands[player]:
+                    result = 1.0 if player == MAX_PLAYER else 0.0
+                player ^= 1
+
+        if result is None:
+            result = self.rollout(left, right, hands, pile, pile_pos, player, passes, tables)
+
+        self.visits[self.root] += 1
+        for node in path:
+            self.visits[node] += 1
+            self.reward[node] += result if self.mover[node] == MAX_PLAYER else 1.0 - result
+
+    def rollout(self, left, right, hands, pile, pile_pos, player, passes, tables):
+        """
+        Termina la determinización con jugadas aleatorias.
+        :param tables: DominoTables del juego de la partida.
+        :return: Resultado para MAX.
+        """
+        choice = self.rng.choice
+        open_masks, tiles = tables.open_masks, tables.tiles
+        while True:
+            hand = hands[player]
+            playable = hand & open_masks[left][right]
+            if playable:
+                tile = choice(mask_to_indices(playable))
+                left, right = place_tile(left, right, tile, tiles)
+                hands[player] = hand & ~(1 << tile)
+                if not hands[player]:
+                    return 1.0 if player == MAX_PLAYER else 0.0
+                passes = 0
+                player ^= 1
+            elif pile_pos < len(pile):
+                hands[player] = hand | 1 << pile[pile_pos]
+                pile_pos += 1
+            else:
+                passes += 1
+                if passes == 2:
+                    return 0.5
+                player ^= 1
+
+    def root_visits(self):
+        """
+        Visitas de cada acción de la raíz.
+        :return: Diccionario acción -> visitas.
+        """
+        visits = {}
+        child = self.first_child[self.root]
+        while child >= 0:
+            visits[self.action[child]] = self.visits[child]
+            child = self.sibling[child]
+        return visits
+
+    def search(self, board, time_budget=None, iterations=None):
+        """
+        Itera hasta agotar el tiempo o el número de iteraciones.
+        :return: Número de iteraciones realizadas.
+        """
+        deadline = None if time_budget is None else time() + time_budget
+        done = 0
+        while (iterations is None or done < iterations) and \
+                (deadline is None or done % CHECK_EVERY or time() < deadline):
+            self.iterate(board)
+            done += 1
+        return done
+
+    def choose_move(self, board, time_budget=None, iterations=None, executor=None, workers=1, stats=None):
+        """
+        Elige el movimiento de MAX. Con un pool de procesos, cada proceso busca un árbol propio
+        durante el mismo tiempo y se suman las visitas de la raíz.
+        :param stats: NodeCounter opcional al que se suman las iteraciones de este proceso.
+        :return: Movimiento en el formato de minimax: índice de ficha, 'pass' o ("draw", None).
+        """
+        self.sync(board)
+        futures = []
+        if executor is not None:
+            for _ in range(workers - 1):
+                futures.append(executor.submit(search_root_visits, board.pack(), time_budget, iterations,
+                                               self.rng.getrandbits(32)))
+        done = self.search(board, time_budget, iterations)
+        if stats is not None:
+            stats.nodes += done
+        visits = self.root_visits()
+        for future in futures:
+            for action, count in future.result().items():
+                visits[action] = visits.get(action, 0) + count
+
+        can_draw = board.uncertain.bit_count() > board.num_opponent_tiles
+        actions = legal_actions(board.left, board.right, board.hand, can_draw, board.tables)
+        action = max(actions, key=lambda action: visits.get(action, 0))
+        self.root_action = action
+        if action == DRAW:
+            return ("draw", None)
+        elif action == PASS:
+            return 'pass'
+        return action
+
+
+def search_root_visits(packed_board, time_budget, iterations, seed):
+    """
+    Búsqueda independiente dentro de un proceso del pool.
+    :return: Visitas de cada acción de la raíz.
+    """
+    tree = ISMCTS(rng=random.Random(seed))
+    tree.search(Board.unpack(packed_board), time_budget, iterations)
+    return tree.root_visits()
@@ -0,0 +1,12 @@
+"""
+Utilidades de medición sin dependencias del motor, compartidas por los benchmarks y el servidor.
+"""
+
+
+def percentile(values, fraction):
+    """
+    Percentil por rango más cercano de una lista de valores.
+    """
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
@@ -0,0 +1,392 @@
+"""
+Libro de aperturas: el mejor primer movimiento de la máquina, precalculado.
+La primera jugada (mano de 7 fichas contra 21 inciertas) es la búsqueda más cara de la partida y
+sale de un conjunto finito de posiciones: la máquina abre con la mesa vacía o responde a la
+primera ficha del humano. Ni las reglas ni la heurística distinguen un número de otro, así que
+las posiciones que solo difieren en una permutación de los números (0-6) tienen el mismo valor
+y el libro guarda una sola, la canónica. El archivo es una tabla hash de direccionamiento abierto
+que se lee con mmap: la consulta es O(1) y no carga el libro en memoria.
+Cada entrada guarda la profundidad a la que se buscó, y la cabecera cuánto tarda en esta máquina
+completar cada profundidad desde las posiciones del libro: con más presupuesto del que costó la
+entrada, buscar en vivo llega más hondo y el libro no se usa.
+Uso: python openingbook.py [--depth 8] [--time-budget 2] [--workers 4] [--output opening_book.bin]
+     python openingbook.py --calibrate [--output opening_book.bin]
+"""
+from itertools import chain, groupby, permutations, product
+import mmap
+import os
+import random
+import struct
+from time import perf_counter
+
+import game
+from game import EMPTY, Board, HeuristicWeights, TranspositionTable, iterative_deepening, mask_to_indices
+
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+DEFAULT_DEPTH = 8
+DEFAULT_TIME_BUDGET = 2.0  # Segundos por posición: unas pocas con muchos robos explotan en profundidad
+# Las claves suponen el doble seis (28 bits por máscara y 3 por extremo): con otro juego no hay libro
+BOOK_SET = game.DOUBLE_SIX
+BOOK_TABLES = game.domino_tables(BOOK_SET)
+MAX_PIP, HAND_SIZE = BOOK_SET
+TILES, TILE_INDEX, FULL_MASK = BOOK_TABLES.tiles, BOOK_TABLES.tile_index, BOOK_TABLES.full_mask
+CALIBRATION_DEPTHS = 16  # Profundidades con tiempo medido en la cabecera
+CALIBRATION_POSITIONS = 24  # Posiciones del libro que se cronometran al calibrar
+CALIBRATION_LIMIT = 8.0  # Una búsqueda más lenta que esto (segundos) termina la calibración de su posición
+# Marca, ranuras, entradas, pesos de heuristica con que se calculó y segundos que tarda la
+# profundización iterativa en completar cada profundidad (mediana de la calibración, 0 sin medir)
+HEADER = struct.Struct(f'<8sII7d{CALIBRATION_DEPTHS}d')
+MAGIC = b'DOMBOOK3'
+# Clave canónica (0 = ranura vacía), ficha en números canónicos y profundidad alcanzada
+SLOT = struct.Struct('<QbB')
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+BOOK_TABLE_BYTES = 2 ** 20
+
+
+def pip_invariants(hand, played, left, right):
+    """
+    Propiedades de cada número que no cambian al permutar los números: si es el extremo izquierdo
+    o el derecho, cuántas veces está en la mesa, su grado en la mano, si tiene la mula y los
+    grados de sus vecinos.
+    """
+    degree = [0] * (MAX_PIP + 1)
+    double = [0] * (MAX_PIP + 1)
+    on_table = [0] * (MAX_PIP + 1)
+    for tile in mask_to_indices(hand):
+        a, b = TILES[tile]
+        degree[a] += 1
+        degree[b] += 1
+        double[a] |= a == b
+    for tile in mask_to_indices(played):
+        a, b = TILES[tile]
+        on_table[a] += 1
+        on_table[b] += 1
+    neighbours = [[] for _ in range(MAX_PIP + 1)]
+    for tile in mask_to_indices(hand):
+        a, b = TILES[tile]
+        if a != b:
+            neighbours[a].append(degree[b])
+            neighbours[b].append(degree[a])
+    return [(left == pip, right == pip, on_table[pip], degree[pip], double[pip], sorted(neighbours[pip]))
+            for pip in range(MAX_PIP + 1)]
+
+
+def relabel(mask, label):
+    """
+    Aplica una permutación de los números (label[número original] = número nuevo) a una máscara de fichas.
+    """
+    result = 0
+    for tile in mask_to_indices(mask):
+        a, b = TILES[tile]
+        result |= 1 << TILE_INDEX[(label[a], label[b])]
+    return result
+
+
+def pack_key(hand, played, left, right):
+    """
+    Clave exacta de 62 bits: mano y mesa (28 bits cada una) y los dos extremos (3 bits cada uno).
+    Los extremos no se ordenan: una ficha que encaja en ambos va siempre al izquierdo, así que
+    intercambiarlos cambia la partida.
+    """
+    return hand | played << len(TILES) | (left + 1) << 2 * len(TILES) | (right + 1) << 2 * len(TILES) + 3
+
+
+def canonical_form(hand, played, left, right):
+    """
+    Forma canónica de una posición bajo las permutaciones de los números: entre las permutaciones
+    que ordenan los números por pip_invariants, la de menor clave. Solo se prueban permutaciones
+    dentro de los grupos de números con las mismas propiedades, casi siempre unas pocas.
+    :return: Clave canónica y permutación usada (label[número original] = número canónico).
+    """
+    invariants = pip_invariants(hand, played, left, right)
+    order = sorted(range(MAX_PIP + 1), key=lambda pip: invariants[pip], reverse=True)
+    groups = [list(group) for _, group in groupby(order, key=lambda pip: invariants[pip])]
+    best_key = best_label = None
+    for choice in product(*[permutations(group) for group in groups]):
+        label = [0] * (MAX_PIP + 1)
+        for new, pip in enumerate(chain.from_iterable(choice)):
+            label[pip] = new
+        key = pack_key(relabel(hand, label), relabel(played, label),
+                       EMPTY if left == EMPTY else label[left], EMPTY if right == EMPTY else label[right])
+        if best_key is None or key < best_key:
+            best_key, best_label = key, label
+    return best_key, best_label
+
+
+def unpack_key(key):
+    """
+    Reconstruye el Board de la máquina para una clave: las fichas que no ve son inciertas.
+    """
+    bits = len(TILES)
+    hand = key & FULL_MASK
+    played = key >> bits & FULL_MASK
+    left = (key >> 2 * bits & 7) - 1
+    right = (key >> 2 * bits + 3 & 7) - 1
+    return Board(left, right, hand, HAND_SIZE - played.bit_count(), FULL_MASK & ~hand & ~played, played,
+                 tables=BOOK_TABLES)
+
+
+def is_book_position(board):
+    """
+    Indica si el tablero es una primera jugada de la máquina: mano completa, a lo sumo una ficha
+    en la mesa y nada observado todavía sobre la mano del humano.
+    """
+    played = board.played.bit_count()
+    return board.tables is BOOK_TABLES and played <= 1 and board.hand.bit_count() == HAND_SIZE \
+        and board.num_opponent_tiles == HAND_SIZE - played and board.candidates == board.uncertain
+
+
+def canonical_hands():
+    """
+    Una mano de 7 fichas por cada clase de equivalencia, creciendo las manos canónicas ficha a ficha.
+    """
+    level = {0}
+    for _ in range(HAND_SIZE):
+        level = {canonical_form(hand | 1 << tile, 0, EMPTY, EMPTY)[0]
+                 for hand in level for tile in range(len(TILES)) if not hand >> tile & 1}
+    return sorted(level)
+
+
+def opening_positions():
+    """
+    Claves canónicas de todas las posiciones del libro: cada mano abriendo con la mesa vacía y
+    cada mano respondiendo a cada posible primera ficha del humano, en sus dos orientaciones.
+    """
+    keys = set()
+    for hand in canonical_hands():
+        keys.add(hand)
+        for tile in range(len(TILES)):
+            if not hand >> tile & 1:
+                a, b = TILES[tile]
+                keys.add(canonical_form(hand, 1 << tile, a, b)[0])
+                keys.add(canonical_form(hand, 1 << tile, b, a)[0])
+    return sorted(keys)
+
+
+def search_position(key, depth, time_budget):
+    """
+    Busca una posición canónica del libro hasta depth o hasta agotar time_budget segundos.
+    :return: Clave, ficha elegida (en números canónicos) o None si el movimiento es forzado a
+        robar, y profundidad de la última iteración completa.
+    """
+    _, move, reached = iterative_deepening(unpack_key(key), time_budget, TranspositionTable(BOOK_TABLE_BYTES),
+                                           max_depth=depth)
+    return key, move if isinstance(move, int) else None, reached
+
+
+def _search_task(args):
+    return search_position(*args)
+
+
+def calibrate(positions=CALIBRATION_POSITIONS, limit=CALIBRATION_LIMIT, seed=0):
+    """
+    Mide cuánto tarda iterative_deepening, con una tabla nueva, en completar cada profundidad desde
+    una muestra de posiciones del libro con más de un movimiento. Una posición deja de medirse en
+    cuanto una búsqueda pasa de limit segundos; las profundidades que no alcanzó cuentan como
+    infinitas para la mediana.
+    :return: Lista de CALIBRATION_DEPTHS segundos (mediana por profundidad, 0 si no se llegó a medir).
+    """
+    keys = [key for key in opening_positions() if len(unpack_key(key).get_legal_moves("MAX")[0]) > 1]
+    times = [[] for _ in range(CALIBRATION_DEPTHS)]
+    for key in random.Random(seed).sample(keys, min(positions, len(keys))):
+        board = unpack_key(key)
+        for depth in range(1, CALIBRATION_DEPTHS + 1):
+            start = perf_counter()
+            iterative_deepening(board, float('inf'), TranspositionTable(BOOK_TABLE_BYTES), max_depth=depth)
+            times[depth - 1].append(perf_counter() - start)
+            if times[depth - 1][-1] > limit:
+                break
+    seconds = []
+    for depth_times in times:
+        depth_times = sorted(depth_times) + [float('inf')] * (len(times[0]) - len(depth_times))
+        median = depth_times[len(depth_times) // 2] if depth_times else float('inf')
+        seconds.append(median if median != float('inf') else 0.0)
+    return seconds
+
+
+def write_book(path, entries, seconds, weights=None):
+    """
+    Escribe el libro como tabla hash con sondeo lineal y al menos la mitad de las ranuras libres.
+    :param entries: Diccionario clave canónica -> (ficha, profundidad).
+    :param seconds: Calibración de calibrate.
+    :param weights: Pesos de heuristica con que se calcularon las jugadas; por defecto los actuales.
+    """
+    size = 2
+    while size < 2 * len(entries):
+        size *= 2
+    slots = [(0, 0, 0)] * size
+    for key, (move, depth) in entries.items():
+        slot = slot_of(key, size)
+        while slots[slot][0]:
+            slot = (slot + 1) & (size - 1)
+        slots[slot] = (key, move, depth)
+    with open(path, 'wb') as stream:
+        stream.write(HEADER.pack(MAGIC, size, len(entries), *(weights or game.HEURISTIC_WEIGHTS), *seconds))
+        for slot in slots:
+            stream.write(SLOT.pack(*slot))
+
+
+def slot_of(key, size):
+    """
+    Ranura inicial de una clave en una tabla de size ranuras (potencia de dos).
+    """
+    return ((key * HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> (64 - size.bit_length() + 1)
+
+
+class OpeningBook:
+    """
+    Libro de aperturas abierto con mmap, de solo lectura.
+    """
+
+    def __init__(self, path=BOOK_PATH):
+        with open(path, 'rb') as stream:
+            self.data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} no es un libro de aperturas de esta versión")
+        _, self.size, self.entries, *fields = HEADER.unpack_from(self.data)
+        self.weights = HeuristicWeights(*fields[:len(HeuristicWeights._fields)])
+        self.seconds = fields[len(HeuristicWeights._fields):]
+
+    def reachable_depth(self, time_budget):
+        """
+        Profundidad que completaría una búsqueda en vivo con time_budget segundos según la
+        calibración. Más allá de la última profundidad medida, cada capa cuesta lo que costó la
+        última respecto a la anterior.
+        """
+        measured = [seconds for seconds in self.seconds if seconds > 0]
+        depth = sum(seconds <= time_budget for seconds in measured)
+        if depth < len(measured) or len(measured) < 2:
+            return depth
+        # Factor de crecimiento de la última capa medida, al menos 2 por si las dos últimas costaron casi igual
+        seconds, growth = measured[-1], max(measured[-1] / measured[-2], 2.0)
+        while seconds * growth <= time_budget:
+            seconds *= growth
+            depth += 1
+        return depth
+
+    def lookup(self, board, min_depth=0):
+        """
+        Busca el tablero en el libro.
+        :param min_depth: Profundidad mínima de la entrada; una entrada menos profunda no se usa.
+        :return: Índice de la ficha que se debe jugar, o None si la posición no está en el libro o
+            su entrada no llega a min_depth.
+        """
+        if not is_book_position(board):
+            return None
+        key, label = canonical_form(board.hand, board.played, board.left, board.right)
+        slot = slot_of(key, self.size)
+        while True:
+            stored, move, depth = SLOT.unpack_from(self.data, HEADER.size + slot * SLOT.size)
+            if stored == 0:
+                return None
+            if stored == key:
+                break
+            slot = (slot + 1) & (self.size - 1)
+        if depth < min_depth:
+            return None
+        # La ficha está en números canónicos: se traduce con la permutación inversa
+        original = [0] * (MAX_PIP + 1)
+        for pip, new in enumerate(label):
+            original[new] = pip
+        a, b = TILES[move]
+        return TILE_INDEX[(original[a], original[b])]
+
+    def close(self):
+        self.data.close()
+
+
+def load_book(path=BOOK_PATH, domino_set=BOOK_SET):
+    """
+    Abre el libro si existe y se calculó con los pesos de heuristica actuales.
+    :param domino_set: Juego de fichas de las partidas que lo consultan.
+    :return: OpeningBook o None si no hay archivo, es de una versión anterior, sus jugadas son de
+        otros pesos o el juego no es el doble seis.
+    """
+    if not os.path.exists(path) or tuple(domino_set) != BOOK_SET:
+        return None
+    try:
+        book = OpeningBook(path)
+    except ValueError:
+        return None
+    if book.weights != game.HEURISTIC_WEIGHTS:
+        book.close()
+        return None
+    return book
+
+
+def build_book(path=BOOK_PATH, depth=DEFAULT_DEPTH, time_budget=DEFAULT_TIME_BUDGET, workers=1, progress=None):
+    """
+    Calcula y escribe el libro completo, repartiendo las posiciones entre procesos si workers > 1,
+    y lo calibra.
+    :param progress: Función opcional que recibe (posiciones hechas, total).
+    :return: Número de entradas escritas.
+    :raises ValueError: Si la heurística distingue los números (peso pip_sum), porque entonces las
+        posiciones de una misma clase canónica no son equivalentes.
+    """
+    if game.HEURISTIC_WEIGHTS.pip_sum:
+        raise ValueError("El libro no admite el peso pip_sum: la heurística debe tratar igual a todos los números")
+    from concurrent.futures import ProcessPoolExecutor  # Consultar el libro no necesita el pool
+    tasks = [(key, depth, time_budget) for key in opening_positions()]
+    entries = {}
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        results = executor.map(_search_task, tasks, chunksize=16) if executor else map(_search_task, tasks)
+        for done, (key, move, reached) in enumerate(results, 1):
+            if move is not None:
+                entries[key] = move, reached
+            if progress is not None:
+                progress(done, len(tasks))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    write_book(path, entries, calibrate())
+    return len(entries)
+
+
+def recalibrate(path=BOOK_PATH):
+    """
+    Vuelve a calibrar un libro ya calculado, en la máquina que lo va a usar, sin cambiar sus entradas.
+    :return: Segundos por profundidad de la nueva calibración.
+    """
+    book = OpeningBook(path)
+    try:
+        entries = {}
+        for slot in range(book.size):
+            key, move, depth = SLOT.unpack_from(book.data, HEADER.size + slot * SLOT.size)
+            if key:
+                entries[key] = move, depth
+        weights = book.weights
+    finally:
+        book.close()
+    seconds = calibrate()
+    write_book(path, entries, seconds, weights)
+    return seconds
+
+
+def main():
+    import argparse  # El motor abre el libro al arrancar: solo la línea de comandos necesita argparse
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="Profundidad máxima de minimax por posición")
+    parser.add_argument("--time-budget", type=float, default=DEFAULT_TIME_BUDGET, help="Segundos por posición")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", default=BOOK_PATH)
+    parser.add_argument("--calibrate", action="store_true",
+                        help="Solo vuelve a medir los tiempos por profundidad del libro existente")
+    args = parser.parse_args()
+
+    start = perf_counter()
+    if args.calibrate:
+        seconds = recalibrate(args.output)
+        print(" ".join(f"{depth}:{value:.3g}s" for depth, value in enumerate(seconds, 1) if value))
+        return
+
+    def progress(done, total):
+        if done % 500 == 0 or done == total:
+            print(f"{done}/{total} posiciones ({perf_counter() - start:.0f} s)")
+
+    entries = build_book(args.output, args.depth, args.time_budget, args.workers, progress)
+    print(f"{entries} entradas guardadas en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
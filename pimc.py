@@ -0,0 +1,230 @@
+"""
+Motor Monte Carlo de información perfecta (determinización).
+En lugar de suponer que MIN puede tener cualquier ficha incierta a la vez, se muestrean muchas
+manos del oponente y órdenes del pozo consistentes con lo que la máquina sabe, se resuelve cada
+muestra con alfa-beta de información perfecta y se promedian los valores de cada movimiento.
+"""
+from concurrent.futures import TimeoutError as FuturesTimeout, as_completed
+import random
+from time import time
+
+from game import DEFAULT_TABLES, WIN, Board, EMPTY, mask_to_indices
+
+DEFAULT_SAMPLES = 200
+DEFAULT_DEPTH = 12
+BATCH_TIME_SHARE = 0.25  # Con plazo, cada ronda del pool se dimensiona para esta parte del tiempo que queda
+
+
+def place_tile(left, right, tile, tiles):
+    """
+    Devuelve los extremos tras jugar una ficha, con la misma regla que Board.make_move.
+    :param tiles: Fichas del juego (DominoTables.tiles), para leer los números de la ficha.
+    """
+    a, b = tiles[tile]
+    if left == EMPTY:
+        return b, a  # place_domino pone la primera ficha invertida
+    elif a == left:
+        return b, right
+    elif b == left:
+        return a, right
+    elif a == right:
+        return left, b
+    return left, a
+
+
+def root_moves(board):
+    """
+    Movimientos reales de MAX en la raíz: las fichas jugables, o un único robo/pase si no hay ninguna.
+    """
+    legal_moves, _ = board.get_legal_moves("MAX")
+    if legal_moves[0] == 'draw':
+        return [("draw", None)]  # La ficha real sale del pozo; no hay nada que decidir
+    return legal_moves
+
+
+def sample_worlds(board, count, rng):
+    """
+    Muestrea manos del oponente y órdenes del pozo consistentes con el tablero: la mano del oponente
+    sale de sus fichas candidatas y el resto de las inciertas (las que no están en la mano de MAX
+    ni en la mesa) forman el pozo.
+    :return: Lista de tuplas (máscara de la mano del oponente, orden de robo del pozo).
+    """
+    candidates = mask_to_indices(board.candidates)
+    excluded = mask_to_indices(board.uncertain & ~board.candidates)
+    worlds = []
+    for _ in range(count):
+        rng.shuffle(candidates)
+        opponent = 0
+        for tile in candidates[:board.num_opponent_tiles]:
+            opponent |= 1 << tile
+        pile = candidates[board.num_opponent_tiles:]
+        if excluded:
+            pile += excluded
+            rng.shuffle(pile)
+        worlds.append((opponent, tuple(pile)))
+    return worlds
+
+
+class PerfectInformationSolver:
+    """
+    Alfa-beta con memoización para una muestra en la que se conocen ambas manos y el orden del pozo.
+    Quien no puede jugar roba del pozo (sin gastar profundidad) o pasa si está vacío; dos pases
+    seguidos cierran la partida en empate.
+    """
+
+    def __init__(self, pile, depth=DEFAULT_DEPTH, tables=None):
+        """
+        :param tables: DominoTables del juego de la muestra; por defecto el doble seis.
+        """
+        self.pile = pile
+        self.depth = depth
+        self.tables = DEFAULT_TABLES if tables is None else tables
+        self.memo = {}
+        self.nodes = 0  # Llamadas a search
+
+    def value_of(self, left, right, hand, opponent, move):
+        """
+        Valor para MAX de jugar una ficha en la raíz en esta muestra.
+        """
+        left, right = place_tile(left, right, move, self.tables.tiles)
+        return self.search(left, right, hand & ~(1 << move), opponent, 0, False, 0, self.depth - 1, -WIN, WIN)
+
+    def search(self, left, right, hand, opponent, pile_pos, maximizing, passes, depth, alpha, beta):
+        self.nodes += 1
+        if hand == 0:
+            return WIN
+        if opponent == 0:
+            return -WIN
+        if passes == 2:
+            return 0
+        if depth == 0:
+            return Board(left, right, hand, opponent.bit_count(), 0, key=0, tables=self.tables).heuristica()
+
+        key = (left, right, hand, opponent, pile_pos, maximizing, passes)
+        entry = self.memo.get(key)
+        if entry is not None and entry[1] >= depth:
+            value, _, flag = entry
+            if flag == 0:
+                return value
+            elif flag > 0:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if beta <= alpha:
+                return value
+        alpha_orig, beta_orig = alpha, beta
+
+        mover = hand if maximizing else opponent
+        playable = mover & self.tables.open_masks[left][right]
+        if not playable:
+            if pile_pos < len(self.pile):
+                # Robar es forzado y el orden del pozo es conocido: no consume profundidad
+                bit = 1 << self.pile[pile_pos]
+                if maximizing:
+                    hand |= bit
+                else:
+                    opponent |= bit
+                return self.search(left, right, hand, opponent, pile_pos + 1, maximizing, passes, depth, alpha, beta)
+            value = self.search(left, right, hand, opponent, pile_pos, not maximizing, passes + 1, depth - 1,
+                                alpha, beta)
+        elif maximizing:
+            value = -WIN - 1
+            for tile in mask_to_indices(playable):
+                new_left, new_right = place_tile(left, right, tile, self.tables.tiles)
+                value = max(value, self.search(new_left, new_right, hand & ~(1 << tile), opponent, pile_pos,
+                                               False, 0, depth - 1, alpha, beta))
+                alpha = max(alpha, value)
+                if beta <= alpha:
+                    break
+        else:
+            value = WIN + 1
+            for tile in mask_to_indices(playable):
+                new_left, new_right = place_tile(left, right, tile, self.tables.tiles)
+                value = min(value, self.search(new_left, new_right, hand, opponent & ~(1 << tile), pile_pos,
+                                               True, 0, depth - 1, alpha, beta))
+                beta = min(beta, value)
+                if beta <= alpha:
+                    break
+
+        # 0 exacto, 1 cota inferior, -1 cota superior
+        flag = -1 if value <= alpha_orig else (1 if value >= beta_orig else 0)
+        self.memo[key] = (value, depth, flag)
+        return value
+
+
+def score_samples(packed_board, moves, worlds, depth=DEFAULT_DEPTH, stats=None):
+    """
+    Resuelve un lote de muestras y suma el valor de cada movimiento de raíz. Se ejecuta tanto en
+    este proceso como en los procesos del pool.
+    :param stats: NodeCounter opcional al que se suman los nodos de los solvers (solo en este proceso).
+    :return: Lista con la suma de valores de cada movimiento, en el orden de moves.
+    """
+    board = Board.unpack(packed_board)
+    totals = [0.0] * len(moves)
+    for opponent, pile in worlds:
+        solver = PerfectInformationSolver(pile, depth, board.tables)
+        for index, move in enumerate(moves):
+            totals[index] += solver.value_of(board.left, board.right, board.hand, opponent, move)
+        if stats is not None:
+            stats.nodes += solver.nodes
+    return totals
+
+
+def pimc_search(board, samples=DEFAULT_SAMPLES, time_budget=None, depth=DEFAULT_DEPTH, executor=None, workers=1,
+                rng=None, stats=None):
+    """
+    Elige el movimiento de MAX promediando su valor sobre mundos muestreados.
+    :param board: Estado desde el que juega MAX.
+    :param samples: Número máximo de muestras.
+    :param time_budget: Segundos disponibles; se detiene al agotarse aunque no se alcancen las muestras.
+    :param depth: Profundidad del alfa-beta de información perfecta en cada muestra.
+    :param executor: ProcessPoolExecutor opcional para resolver las muestras por lotes en paralelo.
+    :param workers: Número de procesos del executor.
+    :param rng: Generador aleatorio para las muestras (reproducibilidad).
+    :param stats: NodeCounter opcional; las muestras resueltas en el pool no se cuentan.
+    :return: Valor medio, mejor movimiento y número de muestras resueltas.
+    """
+    moves = root_moves(board)
+    if len(moves) == 1:
+        return 0.0, moves[0], 0
+    rng = rng or random.Random()
+    deadline = None if time_budget is None else time() + time_budget
+    packed = board.pack()
+    totals = [0.0] * len(moves)
+    solved = 0
+
+    # Cada ronda reparte un lote por proceso; en serie, una muestra por ronda.
+    # La primera ronda siempre se resuelve para tener un movimiento que devolver. Con plazo, es de
+    # una muestra por proceso y mide cuánto tarda una; las siguientes se dimensionan con el tiempo
+    # que queda, y los lotes que no terminan antes del plazo se descartan.
+    batch = max(1, samples // (4 * workers)) if deadline is None else 1
+    sample_seconds = None
+    while solved < samples and (solved == 0 or deadline is None or time() < deadline):
+        if executor is not None:
+            if sample_seconds is not None:
+                batch = max(1, int((deadline - time()) * BATCH_TIME_SHARE / sample_seconds))
+            futures = {}  # Future -> muestras del lote
+            submitted = solved
+            while len(futures) < workers and submitted < samples:
+                count = min(batch, samples - submitted)
+                worlds = sample_worlds(board, count, rng)
+                futures[executor.submit(score_samples, packed, moves, worlds, depth)] = count
+                submitted += count
+            start = time()
+            try:
+                for future in as_completed(futures, None if deadline is None or solved == 0 else deadline - start):
+                    totals = [total + value for total, value in zip(totals, future.result())]
+                    solved += futures[future]
+            except FuturesTimeout:
+                for future in futures:
+                    future.cancel()  # Los lotes en curso terminan en el pool, pero no se esperan
+                break
+            if deadline is not None:
+                sample_seconds = max(time() - start, 1e-6) / max(futures.values())
+        else:
+            result = score_samples(packed, moves, sample_worlds(board, 1, rng), depth, stats)
+            totals = [total + value for total, value in zip(totals, result)]
+            solved += 1
+
+    best_index = max(range(len(moves)), key=lambda index: totals[index])
+    return totals[best_index] / max(solved, 1), moves[best_index], solved
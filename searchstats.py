@@ -0,0 +1,159 @@
+"""
+Instrumentación de la búsqueda de un turno: nodos por capa, cortes, consultas a la tabla de
+transposición, tiempo en get_legal_moves, make/unmake y heuristica, y la variación principal.
+SearchStats es el NodeCounter que Engine.search pasa a la búsqueda: minimax recorre cada nodo a
+través de él y los otros motores le suman sus nodos. Los tiempos por función salen de cProfile,
+que dentro de collect() perfila solo el hilo que busca, así que el pensamiento en segundo plano
+no se mezcla con el turno. Sin estadísticas la búsqueda no paga nada. La medición agrega su propio
+costo a los tiempos, así que sirven para comparar proporciones, no como valores absolutos.
+Las búsquedas de otros procesos (workers > 1) no se cuentan.
+"""
+import cProfile
+from contextlib import contextmanager
+import io
+import json
+import pstats
+from time import perf_counter
+
+from endgame import is_endgame
+import game
+
+# Funciones medidas: nombre en las estadísticas -> métodos
+TIMED = {
+    'get_legal_moves': (game.Board.get_legal_moves,),
+    'make_move': (game.Board.make_move, game.SearchState.make, game.SearchState.unmake),
+    'heuristica': (game.Board.heuristica, game.SearchState.heuristica),
+}
+PROFILE_LINES = 25
+
+
+def move_label(move, tables=game.DEFAULT_TABLES):
+    """
+    Representación legible de un movimiento de búsqueda: 'a|b', 'draw' o 'pass'.
+    :param tables: DominoTables del juego de fichas del tablero.
+    """
+    if move is None or isinstance(move, str):
+        return move
+    if isinstance(move, tuple):
+        return 'draw'
+    a, b = tables.tiles[move]
+    return f"{a}|{b}"
+
+
+class SearchStats(game.NodeCounter):
+    """
+    Estadísticas de la búsqueda de un turno. No se comparte entre hilos: cada búsqueda usa la suya.
+    """
+
+    def __init__(self, engine, tables=game.DEFAULT_TABLES):
+        super().__init__()
+        self.tables = tables  # Juego de fichas del tablero, para escribir los movimientos
+        self.engine = engine  # Motor que eligió el movimiento ('endgame' con el pozo vacío, 'book' del libro)
+        self.move = None
+        self.value = None  # Valor y profundidad de la última iteración completa de minimax
+        self.depth = None
+        self.elapsed = 0.0
+        self.nodes_by_ply = {}  # Capa (distancia a la raíz) -> nodos de minimax
+        self.iterations = []  # (profundidad, nodos, segundos, valor) de cada iteración completa
+        self.fail_high = 0  # Nodos que terminaron en un corte beta
+        self.fail_low = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.calls = {name: 0 for name in TIMED}
+        self.times = {name: 0.0 for name in TIMED}
+        self.principal_variation = []
+        self.profile = None  # Resumen de cProfile, si se pidió
+
+    def minimax(self, board, depth, maximizing, alpha, beta, table=None, deadline=None, first_move=None,
+                ordering=None, ply=0, stats=None):
+        """
+        Cuenta el nodo y su capa, si terminó en corte y, en la raíz, la iteración completa.
+        """
+        self.nodes += 1
+        self.nodes_by_ply[ply] = self.nodes_by_ply.get(ply, 0) + 1
+        if ply == 0:
+            start, start_nodes = perf_counter(), self.nodes
+        value, move = game.minimax(board, depth, maximizing, alpha, beta, table, deadline, first_move, ordering,
+                                   ply, self)
+        if value >= beta:
+            self.fail_high += 1
+        elif value <= alpha:
+            self.fail_low += 1
+        if ply == 0:
+            self.iterations.append((depth, self.nodes - start_nodes + 1, perf_counter() - start, value))
+            self.depth, self.value = depth, value
+        return value, move
+
+    def probed(self, entry):
+        self.tt_probes += 1
+        if entry is not None:
+            self.tt_hits += 1
+
+    def to_dict(self):
+        """
+        Estadísticas como diccionario serializable en JSON.
+        """
+        return {
+            'engine': self.engine,
+            'move': move_label(self.move, self.tables),
+            'value': self.value,
+            'depth': self.depth,
+            'elapsed': self.elapsed,
+            'nodes': self.nodes,
+            'nodes_per_second': self.nodes / self.elapsed if self.elapsed else 0.0,
+            'nodes_by_ply': {str(ply): count for ply, count in sorted(self.nodes_by_ply.items())},
+            'iterations': [{'depth': depth, 'nodes': nodes, 'seconds': seconds, 'value': value}
+                           for depth, nodes, seconds, value in self.iterations],
+            'fail_high': self.fail_high,
+            'fail_low': self.fail_low,
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'calls': self.calls,
+            'times': self.times,
+            'principal_variation': [move_label(move, self.tables) for move in self.principal_variation],
+            'profile': self.profile,
+        }
+
+    def to_json(self):
+        """
+        Estadísticas en una línea JSON.
+        """
+        return json.dumps(self.to_dict())
+
+
+@contextmanager
+def collect(stats, profile=False):
+    """
+    Mide el bloque with en este hilo y guarda en stats la duración y los tiempos por función. La
+    búsqueda del bloque debe recibir stats para contar sus nodos.
+    :param stats: SearchStats que se llena.
+    :param profile: Si es True, también guarda el resumen de cProfile.
+    """
+    profiler = cProfile.Profile()
+    start = perf_counter()
+    profiler.enable()
+    try:
+        yield stats
+    finally:
+        profiler.disable()
+        stats.elapsed = perf_counter() - start
+    codes = {function.__code__: name for name, functions in TIMED.items() for function in functions}
+    for entry in profiler.getstats():
+        name = codes.get(entry.code)
+        if name is not None:
+            stats.calls[name] += entry.callcount
+            stats.times[name] += entry.totaltime
+    if profile:
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        stats.profile = output.getvalue()
+
+
+def engine_for(board, engine, book=None, book_depth=0):
+    """
+    Motor que usará Engine.search para el tablero ('book' si la posición está en el libro con al
+    menos book_depth de profundidad).
+    """
+    if book is not None and book.lookup(board, book_depth) is not None:
+        return 'book'
+    return 'endgame' if is_endgame(board) else engine
@@ -0,0 +1,275 @@
+"""
+Simulador de partidas sin interfaz para evaluar motores a gran escala.
+Juega motor contra motor o contra una política simple con reparto por semilla, sin input(), print()
+ni sleep(), reparte las partidas entre procesos y escribe un registro binario compacto por partida.
+Uso: python selfplay.py minimax:2 random --games 1000 --workers 4 --output resultados.bin
+     [--records partidas-0.rec partidas-1.rec] [--max-pip 9]
+"""
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import random
+import struct
+from time import perf_counter, time
+
+from endgame import EndgameSolver, is_endgame
+from engine import ENDGAME_SHARE
+import game
+import gamerecord
+
+# semilla, ganador (índice del agente, -1 empate), agente que jugó como player1, movimientos,
+# nodos, tiempo medio y máximo por movimiento en segundos
+RECORD = struct.Struct('<IbbHIff')
+GameResult = namedtuple('GameResult', 'seed winner first_agent moves nodes mean_move_time max_move_time')
+MAX_MOVES = 500  # Protección contra partidas que no terminan
+SELFPLAY_TABLE_BYTES = 2 ** 20
+
+def random_policy(board, rng):
+    """
+    Juega una ficha jugable al azar; si no hay, roba o pasa.
+    """
+    legal_moves, _ = board.get_legal_moves("MAX")
+    if legal_moves[0] == 'draw':
+        return ("draw", None)
+    return rng.choice(legal_moves)
+
+
+def greedy_policy(board, rng):
+    """
+    Juega la ficha jugable con más puntos; si no hay, roba o pasa.
+    """
+    legal_moves, _ = board.get_legal_moves("MAX")
+    if legal_moves[0] == 'draw':
+        return ("draw", None)
+    if legal_moves[0] == 'pass':
+        return 'pass'
+    return max(legal_moves, key=lambda tile: sum(board.tables.tiles[tile]))
+
+
+POLICIES = {'random': random_policy, 'greedy': greedy_policy}
+
+
+class Agent:
+    """
+    Jugador del simulador descrito por una especificación 'nombre[:límite]':
+    'random', 'greedy', 'minimax:profundidad', 'pimc:muestras' o 'ismcts:iteraciones'.
+    Los motores conservan su estado (tabla, orden, árbol) durante toda la partida.
+    """
+
+    def __init__(self, spec, rng, time_budget=None, weights=None):
+        """
+        :param weights: Pesos de heuristica del agente (HeuristicWeights); None usa los del proceso.
+        """
+        name, _, limit = spec.partition(':')
+        if name not in POLICIES and name not in game.ENGINES:
+            raise ValueError(f"Agente inválido: {spec}")
+        self.name = name
+        self.limit = int(limit) if limit else None
+        self.rng = rng
+        self.time_budget = time_budget
+        self.weights = weights
+        self.endgame_solver = EndgameSolver()
+        if name == 'minimax':
+            self.table = game.TranspositionTable(SELFPLAY_TABLE_BYTES)
+        elif name == 'ismcts':
+            from ismcts import ISMCTS
+            self.tree = ISMCTS(rng=rng)
+
+    def choose(self, board):
+        """
+        Elige un movimiento en el formato de minimax.
+        :return: Movimiento y número de nodos visitados.
+        """
+        if self.weights is not None:
+            game.set_weights(self.weights)  # Los dos agentes comparten el proceso
+        if self.name in POLICIES:
+            return POLICIES[self.name](board, self.rng), 0
+        counter = game.NodeCounter()
+        time_budget = self.time_budget
+        if is_endgame(board):
+            # Como Engine.search: con el pozo vacío se juega el final exacto, con parte del presupuesto
+            start, start_nodes = time(), self.endgame_solver.nodes
+            deadline = None if time_budget is None else start + time_budget * ENDGAME_SHARE
+            try:
+                return self.endgame_solver.solve(board, deadline).move, self.endgame_solver.nodes - start_nodes
+            except game.SearchTimeout:
+                # No se resolvió a tiempo: el motor del agente decide con el tiempo que queda
+                counter.nodes = self.endgame_solver.nodes - start_nodes
+                time_budget -= time() - start
+        if self.name == 'minimax':
+            self.table.new_search()
+            budget = float('inf') if time_budget is None else time_budget
+            _, move, _ = game.iterative_deepening(board, budget, self.table, max_depth=self.limit, stats=counter)
+        elif self.name == 'pimc':
+            import pimc
+            _, move, _ = pimc.pimc_search(board, samples=self.limit or pimc.DEFAULT_SAMPLES,
+                                          time_budget=time_budget, rng=self.rng, stats=counter)
+        else:
+            move = self.tree.choose_move(board, time_budget, self.limit, stats=counter)
+        return move, counter.nodes
+
+
+def play_game(specs, seed, time_budget=None, positions=None, records=None, weights=None, domino_set=game.DOUBLE_SIX):
+    """
+    Juega una partida completa con las reglas de DominoesGame.play, sin interfaz.
+    En partidas de semilla impar los agentes cambian de asiento. Cada asiento lleva un
+    OpponentTracker con los robos, pases y jugadas del otro, como la máquina con el humano.
+    :param specs: Especificaciones de los dos agentes.
+    :param positions: Lista opcional en la que se agrega el Board de cada turno (partida grabada).
+    :param records: Lista opcional en la que se agrega el GameRecord de la partida.
+    :param weights: Pesos de heuristica de cada agente (opcional); al terminar se restauran los del proceso.
+    :param domino_set: Juego de fichas de la partida.
+    :return: GameResult de la partida.
+    """
+    rules = game.DominoRules(domino_set)  # Solo las reglas: sin tabla de transposición ni libro
+    rng = random.Random(seed)
+    rules.deal_dominoes(rng)
+    deal = gamerecord.deal_order(rules.all_dominoes, rules.tables)
+    first_agent = seed % 2
+    previous_weights = game.HEURISTIC_WEIGHTS
+    if weights is None:
+        weights = (None, None)
+    else:
+        # Un agente sin pesos propios usa los del proceso, que el otro agente cambia al mover
+        weights = [previous_weights if agent_weights is None else agent_weights for agent_weights in weights]
+    seats = [Agent(specs[first_agent], rng, time_budget, weights[first_agent]),
+             Agent(specs[1 - first_agent], rng, time_budget, weights[1 - first_agent])]
+    hands = [rules.player1, rules.player2]
+    trackers = [game.OpponentTracker(rules.tables), game.OpponentTracker(rules.tables)]  # trackers[i] observa al rival de i
+
+    turn = 0 if rules.highest_tile() == 'player' else 1
+    first_seat = turn
+    actions = bytearray()
+    moves = nodes = 0
+    move_times = []
+    winner_seat = None
+    while moves < MAX_MOVES:
+        hand, opponent = hands[turn], hands[1 - turn]
+        board = rules.board_view(hand, opponent, trackers[turn])
+        if positions is not None:
+            positions.append(board)
+        start = perf_counter()
+        move, move_nodes = seats[turn].choose(board)
+        move_times.append(perf_counter() - start)
+        nodes += move_nodes
+        moves += 1
+        actions.append(gamerecord.encode_move(move))
+
+        observer = trackers[1 - turn]
+        if isinstance(move, tuple):
+            # Como en play(): la ficha robada se juega si se puede; si no, vuelve a mover el mismo jugador
+            observer.record_draw(*rules.open_ends())
+            domino = rules.draw_from_pile(hand)
+            if domino is not None and not rules.is_legal_move(domino):
+                continue
+        elif move == 'pass':
+            observer.record_pass(*rules.open_ends())
+            domino = None
+        else:
+            domino = next(tile for tile in hand if tile == game.Domino(*rules.tables.tiles[move]))
+        if domino is not None:
+            if isinstance(move, tuple):
+                actions.append(rules.tile_index(domino))  # La ficha robada se juega
+            observer.record_play(rules.tile_index(domino))
+            rules.place_domino(domino)
+            hand.remove(domino)
+
+        if not hand:
+            winner_seat = turn
+            break
+        if rules.is_game_tied():
+            break
+        turn = 1 - turn
+
+    if records is not None:
+        machine_seats = sum(1 << seat for seat, agent in enumerate(seats) if agent.name in game.ENGINES)
+        records.append(gamerecord.GameRecord(seed, first_seat, machine_seats, rules.domino_set, deal, bytes(actions)))
+    game.set_weights(previous_weights)
+    if winner_seat is None:
+        winner = -1
+    else:
+        winner = first_agent if winner_seat == 0 else 1 - first_agent
+    return GameResult(seed, winner, first_agent, moves, nodes, sum(move_times) / len(move_times), max(move_times))
+
+
+def _play_game_task(args):
+    specs, seed, time_budget, record, domino_set = args
+    records = [] if record else None
+    result = play_game(specs, seed, time_budget, records=records, domino_set=domino_set)
+    return result, records[0] if record else None
+
+
+def run_matches(specs, games, seed=0, workers=1, output=None, time_budget=None, record_paths=None,
+                domino_set=game.DOUBLE_SIX):
+    """
+    Juega una serie de partidas, en paralelo si workers > 1, y escribe cada resultado en cuanto llega.
+    :param output: Ruta del archivo binario de resultados (opcional).
+    :param record_paths: Archivos de registro de partidas (gamerecord) opcionales; las partidas se
+        reparten entre ellos en turno rotativo, como fragmentos para el análisis en paralelo.
+    :param domino_set: Juego de fichas de las partidas.
+    :return: Lista de GameResult en el orden en que terminaron.
+    """
+    tasks = [(specs, seed + index, time_budget, bool(record_paths), domino_set) for index in range(games)]
+    results = []
+    stream = open(output, 'wb') if output else None
+    writers = [gamerecord.RecordWriter(path) for path in record_paths or ()]
+    try:
+        if workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            iterator = executor.map(_play_game_task, tasks, chunksize=max(1, games // (workers * 16)))
+        else:
+            executor = None
+            iterator = map(_play_game_task, tasks)
+        for result, record in iterator:
+            if writers:
+                writers[len(results) % len(writers)].write(record)
+            results.append(result)
+            if stream is not None:
+                stream.write(RECORD.pack(*result))
+        if executor is not None:
+            executor.shutdown()
+    finally:
+        if stream is not None:
+            stream.close()
+        for writer in writers:
+            writer.close()
+    return results
+
+
+def read_results(path):
+    """
+    Lee un archivo de resultados como generador, sin cargarlo completo en memoria.
+    """
+    with open(path, 'rb') as stream:
+        while True:
+            data = stream.read(RECORD.size)
+            if len(data) < RECORD.size:
+                return
+            yield GameResult(*RECORD.unpack(data))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("agents", nargs=2, help="Especificación de cada agente, por ejemplo minimax:2 o random")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--time-budget", type=float, default=None, help="Segundos por movimiento de los motores")
+    parser.add_argument("--output", default=None, help="Archivo binario de resultados")
+    parser.add_argument("--records", nargs='+', default=None, help="Archivos de registro de partidas (fragmentos)")
+    parser.add_argument("--max-pip", type=int, choices=sorted(game.DOMINO_SETS), default=6,
+                        help="Juego de fichas: doble seis, doble nueve o doble doce")
+    args = parser.parse_args()
+
+    start = perf_counter()
+    results = run_matches(args.agents, args.games, args.seed, args.workers, args.output, args.time_budget,
+                          args.records, game.DOMINO_SETS[args.max_pip])
+    elapsed = perf_counter() - start
+    wins = [sum(result.winner == agent for result in results) for agent in (0, 1)]
+    ties = sum(result.winner == -1 for result in results)
+    print(f"{args.agents[0]}: {wins[0]}  {args.agents[1]}: {wins[1]}  empates: {ties}")
+    print(f"{len(results)} partidas en {elapsed:.1f} s ({60 * len(results) / elapsed:.0f} partidas/min)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+"""
+Servidor de partidas para muchos jugadores a la vez, sobre asyncio.
+Cada conexión TCP es una sesión con su propia partida contra la máquina. El protocolo es de
+líneas: el cliente envía un comando por línea y recibe una línea JSON con el resultado.
+  new [semilla]   reparte una partida nueva (si la máquina empieza, ya viene su jugada)
+  play a|b        juega una ficha; draw roba del pozo; pass pasa con el pozo vacío
+  state           estado de la partida
+  stats           latencias de la máquina (p50/p95/p99), profundidad de la cola y contadores
+  quit            cierra la sesión
+Las búsquedas de la máquina corren en un pool acotado de procesos, cada uno con su propio
+Engine (tabla, libro y final exacto compartidos por las sesiones que atiende, y un árbol de
+ISMCTS por sesión). Si hay demasiadas búsquedas en cola, el comando se rechaza con "busy" sin
+cambiar la partida. Cada movimiento tiene el plazo de 60 segundos de play(): si se vence, el
+turno pasa al otro jugador.
+Uso: python server.py [--port 8765] [--workers 4] [--time-budget 1] [--max-queue 64] [--engine minimax]
+                      [--max-pip 9]
+     python server.py --load-test 200 [--games 1] [--port 8765] [--max-pip 9]
+"""
+import argparse
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import json
+import random
+from time import perf_counter, time
+
+from engine import choose_move, init_worker
+import game
+from metrics import percentile
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_TIME_BUDGET = 1.0  # Segundos de búsqueda por movimiento: el servidor atiende muchas partidas
+SEARCH_MARGIN = 0.5  # La búsqueda termina al menos este margen antes del plazo del movimiento
+LATENCY_WINDOW = 10000  # Latencias recientes que se usan para los percentiles
+LINE_LIMIT = 1024  # Longitud máxima de un comando
+
+def search_task(packed_board, engine, time_budget, deadline, session_id):
+    """
+    Elige el movimiento de la máquina dentro de un proceso del pool, con el Engine del proceso.
+    El tiempo que la tarea pasó en cola se descuenta del plazo del movimiento.
+    :param deadline: Momento (time()) en que vence el movimiento.
+    :param session_id: Sesión de la partida, con la que el Engine guarda su árbol de ISMCTS.
+    :return: Movimiento en el formato de choose_move, o None si el plazo ya no alcanza.
+    """
+    budget = min(time_budget, deadline - time() - SEARCH_MARGIN)
+    if budget <= 0:
+        return None
+    move, _ = choose_move(packed_board, budget, engine, session_id)
+    return move
+
+
+class GameSession(game.DominoRules):
+    """
+    Partida de una conexión, con las reglas de DominoesGame.play. Solo tiene el estado de
+    DominoRules: la máquina busca en los procesos del servidor, así que una sesión ocupa poco
+    más que sus fichas.
+    """
+
+    def __init__(self, session_id=0, domino_set=game.DOUBLE_SIX):
+        super().__init__(domino_set)  # player1 es el humano de la sesión y player2 la máquina
+        self.session_id = session_id  # Distingue la partida en los Engine de los procesos de búsqueda
+        self.player_turn = None  # True si mueve el humano, False si la máquina, None sin partida en curso
+        self.turn_started = 0.0  # Momento en que empezó el turno del humano
+        self.result = None  # 'player', 'machine' o 'tie' al terminar la partida
+
+    def start(self, seed=None):
+        """
+        Reparte una partida nueva; empieza quien ganó la anterior o, si no hay, la ficha más alta.
+        """
+        self.deal_dominoes(random.Random(seed))
+        self.result = None
+        if self.previous_winner:
+            self.player_turn = self.previous_winner == 'player'
+        else:
+            self.player_turn = self.highest_tile() == 'player'
+        self.turn_started = time()
+
+    def end_turn(self, player_turn):
+        """
+        Comprueba si la partida terminó y, si no, pasa el turno.
+        """
+        if not self.player1 or not self.player2:
+            self.result = 'player' if not self.player1 else 'machine'
+            self.previous_winner, self.previous_game_tied = self.result, False
+        elif self.is_game_tied():
+            self.result = 'tie'
+            self.previous_winner, self.previous_game_tied = None, True
+        if self.result is not None:
+            self.player_turn = None
+        else:
+            self.player_turn = player_turn
+            if player_turn:
+                self.turn_started = time()
+
+    def human_move(self, command):
+        """
+        Aplica el movimiento del humano como play(): robar no termina el turno. Solo se puede robar
+        o pasar sin fichas jugables.
+        :param command: 'draw', 'pass' o una ficha 'a|b'.
+        :return: Evento aplicado ('timeout' si se venció el plazo y el turno pasó a la máquina).
+        :raises ValueError: Si el movimiento no es válido; la partida no cambia.
+        """
+        if self.player_turn is not True:
+            raise ValueError("No es tu turno")
+        if time() - self.turn_started > game.MOVE_TIME_LIMIT:
+            self.end_turn(False)
+            return 'timeout'
+        if command in ('draw', 'pass') and self.has_playable(self.player1):
+            # A diferencia de play() se exige la regla: la inferencia de la máquina supone que quien
+            # roba o pasa no tiene fichas que coincidan con los extremos
+            raise ValueError("Tienes una ficha jugable: no puedes pescar ni pasar.")
+        if command == 'draw':
+            if not self.pile:
+                raise ValueError("El pozo está vacío. No puedes pescar.")
+            self.opponent_tracker.record_draw(*self.open_ends())
+            return f"draw {self.draw_from_pile(self.player1)}"
+        if command == 'pass':
+            if self.pile:
+                raise ValueError("No puedes pasar mientras haya fichas en el pozo. Debes pescar.")
+            self.opponent_tracker.record_pass(*self.open_ends())
+            self.end_turn(False)
+            return 'pass'
+        domino = game.Domino.from_string(command, self.tables.max_pip)
+        if domino is None or domino not in self.player1:
+            raise ValueError("No tienes esa ficha. Elige otra.")
+        if not self.is_legal_move(domino):
+            raise ValueError("Movimiento no permitido.")
+        domino = self.player1[self.player1.index(domino)]
+        self.opponent_tracker.record_play(self.tile_index(domino))
+        self.place_domino(domino)
+        self.player1.remove(domino)
+        self.end_turn(False)
+        return f"play {domino}"
+
+    def apply_machine_move(self, move):
+        """
+        Aplica el movimiento elegido por la búsqueda, como play(): si la ficha robada no se puede
+        jugar, la máquina vuelve a mover.
+        :param move: Resultado de choose_move, o None si se venció el plazo.
+        :return: Evento para el cliente ('machine draw' no muestra la ficha robada).
+        """
+        if move is None:
+            self.end_turn(True)
+            return 'machine timeout'
+        if move == 'pass':
+            self.end_turn(True)
+            return 'machine pass'
+        if isinstance(move, tuple):
+            domino = self.draw_from_pile(self.player2)
+            if not self.is_legal_move(domino):
+                return 'machine draw'
+            event = f"machine draw, play {domino}"
+        else:
+            domino = self.player2[self.player2.index(game.Domino(*self.tables.tiles[move]))]
+            event = f"machine play {domino}"
+        self.place_domino(domino)
+        self.player2.remove(domino)
+        self.end_turn(True)
+        return event
+
+    def view(self):
+        """
+        Estado visible para el humano.
+        """
+        return {
+            'board': [str(domino) for domino in self.board],
+            'hand': [str(domino) for domino in self.player1],
+            'machine_tiles': len(self.player2),
+            'pile': len(self.pile),
+            'turn': None if self.player_turn is None else 'player' if self.player_turn else 'machine',
+            'result': self.result,
+        }
+
+
+class GameServer:
+    """
+    Sesiones concurrentes sobre un pool acotado de procesos de búsqueda.
+    """
+
+    def __init__(self, workers=1, time_budget=DEFAULT_TIME_BUDGET, engine='minimax', max_queue=None,
+                 domino_set=game.DOUBLE_SIX):
+        """
+        :param workers: Procesos de búsqueda; es el número de movimientos de la máquina en paralelo.
+        :param time_budget: Segundos de búsqueda por movimiento de la máquina.
+        :param max_queue: Búsquedas admitidas (en cola o en curso) a partir de las cuales los comandos
+            se rechazan con "busy"; por defecto 16 por proceso.
+        :param domino_set: Juego de fichas de todas las sesiones (DominoSet).
+        """
+        if engine not in game.ENGINES:
+            raise ValueError(f"Motor inválido: {engine}")
+        self.domino_set = game.DominoSet(*domino_set)
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                            initargs=(engine, self.domino_set))
+        self.engine = engine
+        self.time_budget = time_budget
+        self.max_queue = max_queue if max_queue is not None else 16 * workers
+        self.queue_depth = 0  # Búsquedas enviadas al pool que no han terminado
+        self.max_queue_depth = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)  # Segundos de cada movimiento de la máquina, con la cola
+        self.sessions = 0  # Conexiones abiertas
+        self.connections = 0  # Conexiones atendidas desde el arranque; numeran las sesiones
+        self.games = 0
+        self.machine_moves = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    async def search(self, session):
+        """
+        Busca el movimiento de la máquina en el pool sin bloquear el bucle de eventos.
+        :return: Movimiento, o None si se venció el plazo de 60 segundos.
+        """
+        deadline = time() + game.MOVE_TIME_LIMIT
+        packed = session.board_view(session.player2, session.player1, session.opponent_tracker).pack()
+        loop = asyncio.get_running_loop()
+        start = perf_counter()
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            # La tarea se limita sola con el plazo; wait_for protege al cliente si el pool no responde
+            move = await asyncio.wait_for(loop.run_in_executor(self.executor, search_task, packed, self.engine,
+                                                               self.time_budget, deadline, session.session_id),
+                                          game.MOVE_TIME_LIMIT)
+        except asyncio.TimeoutError:
+            move = None
+        finally:
+            self.queue_depth -= 1
+        self.latencies.append(perf_counter() - start)
+        self.machine_moves += 1
+        if move is None:
+            self.timeouts += 1
+        return move
+
+    async def machine_turns(self, session, events):
+        """
+        Juega los turnos de la máquina hasta que le toque al humano o termine la partida.
+        """
+        while session.player_turn is False:
+            events.append(session.apply_machine_move(await self.search(session)))
+
+    async def handle(self, session, line):
+        """
+        Ejecuta un comando de la sesión.
+        :return: Respuesta como diccionario.
+        """
+        command, _, argument = line.strip().partition(' ')
+        if command == 'stats':
+            return {'ok': True, 'stats': self.stats()}
+        if command == 'state':
+            return {'ok': True, 'events': [], **session.view()}
+        if command not in ('new', 'play', 'draw', 'pass'):
+            return {'ok': False, 'error': f"Comando desconocido: {command}"}
+        if self.queue_depth >= self.max_queue:
+            # Contrapresión: se rechaza antes de tocar la partida y el cliente puede reintentar
+            self.rejected += 1
+            return {'ok': False, 'error': 'busy', 'queue_depth': self.queue_depth}
+
+        events = []
+        try:
+            if command == 'new':
+                session.start(int(argument) if argument else None)
+                self.games += 1
+            else:
+                events.append(session.human_move(argument.strip() if command == 'play' else command))
+        except ValueError as error:
+            return {'ok': False, 'error': str(error), **session.view()}
+        await self.machine_turns(session, events)
+        return {'ok': True, 'events': events, **session.view()}
+
+    async def serve_client(self, reader, writer):
+        """
+        Atiende una conexión: una sesión con su partida hasta 'quit' o hasta que el cliente cierre.
+        """
+        self.connections += 1
+        session = GameSession(self.connections, self.domino_set)
+        self.sessions += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):
+                    break
+                if not line or line.strip() == b'quit':
+                    break
+                response = await self.handle(session, line.decode(errors='replace'))
+                writer.write(json.dumps(response).encode() + b'\n')
+                # Si el cliente no lee, la escritura espera aquí y la sesión deja de leer comandos
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+    def stats(self):
+        """
+        Métricas para pruebas de carga: latencia de la máquina (incluida la espera en la cola),
+        profundidad de la cola y contadores.
+        """
+        latencies = list(self.latencies)
+        return {
+            'sessions': self.sessions,
+            'games': self.games,
+            'machine_moves': self.machine_moves,
+            'timeouts': self.timeouts,
+            'rejected': self.rejected,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'latency_p50': percentile(latencies, 0.50) if latencies else None,
+            'latency_p95': percentile(latencies, 0.95) if latencies else None,
+            'latency_p99': percentile(latencies, 0.99) if latencies else None,
+        }
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        Acepta conexiones hasta que se cancele.
+        """
+        server = await asyncio.start_server(self.serve_client, host, port, limit=LINE_LIMIT)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+def human_reply(response, rng, max_pip=6):
+    """
+    Movimiento de un jugador de prueba: una ficha jugable al azar; si no hay, roba o pasa.
+    :param max_pip: Número más alto del juego de fichas del servidor.
+    """
+    hand = [game.Domino.from_string(tile, max_pip) for tile in response['hand']]
+    if response['board']:
+        left = game.Domino.from_string(response['board'][0], max_pip).left
+        right = game.Domino.from_string(response['board'][-1], max_pip).right
+        hand = [domino for domino in hand if left in (domino.left, domino.right) or
+                right in (domino.left, domino.right)]
+    if hand:
+        return f"play {rng.choice(hand)}"
+    return 'draw' if response['pile'] else 'pass'
+
+
+async def load_client(host, port, games, seed, max_pip=6):
+    """
+    Cliente de la prueba de carga: juega partidas completas con human_reply.
+    :return: Segundos de espera de cada respuesta a un movimiento.
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port, limit=2 ** 16)
+    waits = []
+
+    async def send(command):
+        while True:
+            start = perf_counter()
+            writer.write(command.encode() + b'\n')
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            if response.get('error') != 'busy':
+                waits.append(perf_counter() - start)
+                return response
+            await asyncio.sleep(0.1 + rng.random() * 0.1)
+
+    for game_index in range(games):
+        response = await send(f"new {seed * games + game_index}")
+        while response['result'] is None:
+            response = await send(human_reply(response, rng, max_pip))
+    writer.write(b'quit\n')
+    await writer.drain()
+    writer.close()
+    return waits
+
+
+async def load_test(host, port, clients, games, max_pip=6):
+    """
+    Abre clients sesiones a la vez contra un servidor en marcha y muestra sus métricas.
+    :param max_pip: Número más alto del juego de fichas del servidor.
+    """
+    start = perf_counter()
+    results = await asyncio.gather(*[load_client(host, port, games, seed, max_pip) for seed in range(clients)])
+    elapsed = perf_counter() - start
+    waits = [wait for client in results for wait in client]
+    print(f"{clients} sesiones, {clients * games} partidas, {len(waits)} respuestas en {elapsed:.1f} s")
+    print(f"Espera del cliente: p50 {percentile(waits, 0.50) * 1000:.1f} ms, "
+          f"p95 {percentile(waits, 0.95) * 1000:.1f} ms, p99 {percentile(waits, 0.99) * 1000:.1f} ms")
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'stats\n')
+    await writer.drain()
+    print(json.dumps(json.loads(await reader.readline())['stats'], indent=2))
+    writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--time-budget", type=float, default=DEFAULT_TIME_BUDGET, help="Segundos por movimiento")
+    parser.add_argument("--max-queue", type=int, default=None, help="Búsquedas en cola antes de responder busy")
+    parser.add_argument("--engine", choices=game.ENGINES, default='minimax')
+    parser.add_argument("--max-pip", type=int, choices=sorted(game.DOMINO_SETS), default=6,
+                        help="Juego de fichas: doble seis, doble nueve o doble doce")
+    parser.add_argument("--load-test", type=int, default=0, metavar="SESIONES",
+                        help="En lugar de servir, abre este número de sesiones contra un servidor en marcha")
+    parser.add_argument("--games", type=int, default=1, help="Partidas por sesión de la prueba de carga")
+    args = parser.parse_args()
+
+    if args.load_test:
+        # El cliente lee las fichas del mismo juego que el servidor
+        asyncio.run(load_test(args.host, args.port, args.load_test, args.games, args.max_pip))
+        return
+    server = GameServer(args.workers, args.time_budget, args.engine, args.max_queue,
+                        game.DOMINO_SETS[args.max_pip])
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
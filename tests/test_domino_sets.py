@@ -0,0 +1,38 @@
+"""
+Partidas con juegos de fichas distintos en el mismo proceso: cada partida, tablero y Engine lleva
+las tablas de su juego, y el estado serializado incluye el juego.
+"""
+import pytest
+
+import engine
+from engine import Engine
+from game import DOUBLE_NINE, DOUBLE_SIX, Board, DominoesGame
+
+
+def test_second_set_does_not_break_existing_game():
+    first = DominoesGame(time_budget=0.05, ponder=False, opening_book=False)
+    first.deal_dominoes()
+    second = DominoesGame(time_budget=0.05, ponder=False, opening_book=False, domino_set=DOUBLE_NINE)
+
+    tile = first.machine_move()
+    assert tile in first.player2
+
+    second.deal_dominoes()
+    assert len(second.player1) == DOUBLE_NINE.hand_size
+    assert second.machine_move() in second.player2
+    assert first.is_legal_move(first.player1[0]) == ('left', 'normal')
+    assert len(first.player1) == DOUBLE_SIX.hand_size
+
+
+def test_packed_board_carries_its_set():
+    rules = DominoesGame(ponder=False, opening_book=False, domino_set=DOUBLE_NINE)
+    rules.deal_dominoes()
+    board = rules.board_view(rules.player2, rules.player1)
+    packed = board.pack()
+    assert packed[-1] == DOUBLE_NINE
+    assert Board.unpack(packed).tables is board.tables
+
+    move, _ = engine.choose_move(packed, 0.05)
+    assert move in board.get_legal_moves("MAX")[0]
+    with pytest.raises(ValueError):
+        Engine(opening_book=False).search(board, 0.05)
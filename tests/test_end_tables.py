@@ -0,0 +1,108 @@
+"""
+Las tablas por par de extremos (open_masks, placements de DominoTables) frente a la comparación extremo por extremo
+que usaban is_legal_move, place_domino e is_game_tied antes de ellas, para todos los pares de
+extremos y todos los juegos de fichas.
+"""
+from collections import deque
+from itertools import product
+import random
+
+import pytest
+
+import game
+from game import DOUBLE_NINE, DOUBLE_SIX, DOUBLE_TWELVE, EMPTY, Domino
+
+
+def scanning_is_legal_move(board, domino):
+    """
+    is_legal_move original: prueba el extremo izquierdo y después el derecho.
+    """
+    if not board:
+        return ('left', 'normal')
+    if domino.right == board[0].left:
+        return ('left', 'reversed')
+    elif domino.left == board[0].left:
+        return ('left', 'normal')
+    if domino.right == board[-1].right:
+        return ('right', 'normal')
+    elif domino.left == board[-1].right:
+        return ('right', 'reversed')
+    return None
+
+
+def scanning_place_domino(board, domino):
+    """
+    place_domino original sobre un deque de Domino.
+    """
+    legal_move = scanning_is_legal_move(board, domino)
+    if not legal_move:
+        return
+    position, orientation = legal_move
+    placed = Domino(domino.left, domino.right) if orientation == 'reversed' else Domino(domino.right, domino.left)
+    if position == 'left':
+        board.appendleft(placed)
+    else:
+        board.append(placed)
+
+
+def scanning_is_game_tied(board, player1, player2, pile):
+    """
+    is_game_tied original: nadie tiene una ficha jugable y el pozo está vacío.
+    """
+    if any(scanning_is_legal_move(board, domino) for domino in player1 + player2):
+        return False
+    return not pile
+
+
+def as_pairs(board):
+    return [(domino.left, domino.right) for domino in board]
+
+
+@pytest.fixture(params=[DOUBLE_SIX, DOUBLE_NINE, DOUBLE_TWELVE], ids=lambda domino_set: f"double-{domino_set.max_pip}")
+def rules(request):
+    return game.DominoRules(request.param)
+
+
+def end_pairs(tables):
+    pips = range(tables.max_pip + 1)
+    return [(EMPTY, EMPTY)] + list(product(pips, pips))
+
+
+def board_with_ends(left, right):
+    return deque() if left == EMPTY else deque([Domino(left, right)])
+
+
+def test_placements_match_scanning(rules):
+    tables = rules.tables
+    for left, right in end_pairs(tables):
+        board = board_with_ends(left, right)
+        open_mask = 0
+        for a, b in tables.tiles:
+            for domino in (Domino(a, b), Domino(b, a)):
+                rules.board = deque(board)
+                expected = scanning_is_legal_move(board, domino)
+                assert rules.is_legal_move(domino) == expected, (left, right, domino)
+                assert tables.placements[left][right][domino.left][domino.right] == expected
+
+                rules.place_domino(domino)
+                expected_board = deque(board)
+                scanning_place_domino(expected_board, domino)
+                assert as_pairs(rules.board) == as_pairs(expected_board), (left, right, domino)
+            if scanning_is_legal_move(board, Domino(a, b)):
+                open_mask |= 1 << tables.tile_index[(a, b)]
+        assert tables.open_masks[left][right] == open_mask, (left, right)
+
+
+def test_tie_check_matches_scanning(rules):
+    rng = random.Random(7)
+    pairs = end_pairs(rules.tables)[1:]
+    for _ in range(2000):
+        left, right = rng.choice(pairs)
+        rules.board = board_with_ends(left, right)
+        tiles = [Domino(a, b) if rng.random() < 0.5 else Domino(b, a)
+                 for a, b in rng.sample(rules.tables.tiles, rng.randint(0, 6))]
+        split = rng.randint(0, len(tiles))
+        rules.player1, rules.player2 = tiles[:split], tiles[split:]
+        rules.pile = [] if rng.random() < 0.8 else [Domino(0, 0)]
+        expected = scanning_is_game_tied(rules.board, rules.player1, rules.player2, rules.pile)
+        assert rules.is_game_tied() == expected, (left, right, tiles)
@@ -0,0 +1,63 @@
+"""
+El plazo del final exacto: EndgameSolver.solve abandona con SearchTimeout y lo ya resuelto
+sigue siendo válido para el siguiente intento, y el Engine y los agentes del autojuego deciden
+con su motor cuando el final no se resuelve en su parte del presupuesto.
+"""
+import random
+from time import time
+
+import pytest
+
+import selfplay
+from endgame import EndgameSolver, is_endgame
+from engine import Engine
+from game import DOUBLE_SIX, DOUBLE_TWELVE, SearchTimeout
+
+
+def first_endgames(seeds, domino_set=DOUBLE_SIX):
+    """
+    Primera posición con el pozo vacío de partidas greedy contra greedy.
+    """
+    boards = []
+    for seed in seeds:
+        positions = []
+        selfplay.play_game(['greedy', 'greedy'], seed, positions=positions, domino_set=domino_set)
+        boards.extend([board for board in positions if is_endgame(board)][:1])
+    return boards
+
+
+def test_expired_deadline_raises():
+    # Con el doble doce la semilla 4 llega a un final de 19 contra 11 fichas, de varios segundos
+    board, = first_endgames([4], DOUBLE_TWELVE)
+    with pytest.raises(SearchTimeout):
+        EndgameSolver().solve(board, time() - 1)
+
+
+def test_interrupted_solve_keeps_exact_results():
+    for board in first_endgames(range(20)):
+        solver = EndgameSolver()
+        try:
+            solver.solve(board, time() - 1)
+        except SearchTimeout:
+            pass
+        assert solver.solve(board) == EndgameSolver().solve(board)
+
+
+def test_engine_keeps_time_budget_in_large_endgame():
+    board, = first_endgames([4], DOUBLE_TWELVE)
+    searcher = Engine('minimax', opening_book=False, domino_set=DOUBLE_TWELVE)
+    move, stats = searcher.choose_move(board, 0.5)
+    # El final no se resuelve en 0.25 s: decide minimax con el resto del presupuesto
+    assert stats.engine == 'minimax' and stats.elapsed < 0.6
+    assert move in board.get_legal_moves("MAX")[0]
+
+
+def test_selfplay_agent_keeps_time_budget_in_large_endgame():
+    board, = first_endgames([4], DOUBLE_TWELVE)
+    agent = selfplay.Agent('minimax', random.Random(0), time_budget=0.5)
+    start = time()
+    move, nodes = agent.choose(board)
+    assert time() - start < 0.6
+    # Cuenta los nodos del intento de final y los de minimax
+    assert nodes > agent.endgame_solver.nodes
+    assert move in board.get_legal_moves("MAX")[0]
@@ -0,0 +1,49 @@
+"""
+SearchState.leaf_values frente a heuristica en cada hijo, aplicando el movimiento con make/unmake
+y con Board.make_move, en posiciones de autojuego con semilla fija de todos los juegos de fichas.
+"""
+import pytest
+
+import game
+import selfplay
+from game import DOUBLE_NINE, DOUBLE_SIX, DOUBLE_TWELVE, HeuristicWeights, SearchState
+
+
+def positions(domino_set, seeds=range(6)):
+    boards = []
+    for seed in seeds:
+        selfplay.play_game(['random', 'random'], seed, positions=boards, domino_set=domino_set)
+    return boards
+
+
+def assert_leaf_values_match(boards):
+    checked = 0
+    for board in boards:
+        state = SearchState(board)
+        for player in ('MAX', 'MIN'):
+            # El robo de MAX es un nodo de azar: leaf_values no lo evalúa
+            moves = [move for move in state.get_legal_moves(player)[0] if not (player == 'MAX' and move == 'draw')]
+            expected = []
+            for move in moves:
+                state.make(move, player)
+                expected.append(state.heuristica())
+                state.unmake()
+                assert board.make_move(move, player).heuristica() == pytest.approx(expected[-1])
+            assert state.leaf_values(moves, player) == pytest.approx(expected), (board.pack(), player)
+            checked += len(moves)
+    assert checked > 0
+
+
+@pytest.mark.parametrize('domino_set', [DOUBLE_SIX, DOUBLE_NINE, DOUBLE_TWELVE],
+                         ids=lambda domino_set: f"double-{domino_set.max_pip}")
+def test_leaf_values_match_heuristica(domino_set):
+    assert_leaf_values_match(positions(domino_set))
+
+
+def test_leaf_values_match_heuristica_with_optional_features():
+    previous = game.HEURISTIC_WEIGHTS
+    try:
+        game.set_weights(HeuristicWeights(*previous[:4], pip_sum=0.5, suit_control=1.0, doubles=-0.5))
+        assert_leaf_values_match(positions(DOUBLE_SIX, range(3)))
+    finally:
+        game.set_weights(previous)
@@ -0,0 +1,55 @@
+"""
+El bloqueo de MIN por conteo de fichas de Board.get_legal_moves frente a la enumeración de
+subconjuntos con itertools.combinations que reemplazó.
+"""
+from itertools import combinations
+import random
+
+from game import DEFAULT_TABLES, EMPTY, Board, mask_to_indices
+
+
+def combinations_min_moves(board):
+    """
+    Movimientos de MIN como los calculaba la versión con combinations: MIN puede robar o pasar si
+    algún subconjunto de num_opponent_tiles fichas candidatas no encaja en ningún extremo.
+    """
+    open_mask = DEFAULT_TABLES.pip_masks[board.left] | DEFAULT_TABLES.pip_masks[board.right]
+    legal_moves = mask_to_indices(board.candidates & open_mask)
+    no_play_found = False
+    for subset in combinations(mask_to_indices(board.candidates), board.num_opponent_tiles):
+        if all(not (open_mask >> tile) & 1 for tile in subset):
+            no_play_found = True
+            break
+    if no_play_found:
+        legal_moves.append('draw' if board.num_opponent_tiles < board.uncertain.bit_count() else 'pass')
+    return legal_moves
+
+
+def random_position(rng):
+    """
+    Posición con MIN al turno: extremos, fichas jugadas, mano de MAX, hasta 14 fichas inciertas y
+    a veces solo una parte de ellas como candidatas.
+    """
+    tiles = list(range(len(DEFAULT_TABLES.tiles)))
+    rng.shuffle(tiles)
+    played = tiles[:rng.randint(1, 10)]
+    unseen = tiles[len(played):]
+    hand = unseen[:rng.randint(1, 7)]
+    uncertain = unseen[len(hand):][:14]
+    num_opponent_tiles = rng.randint(1, min(7, len(uncertain)))
+    candidates = uncertain
+    if rng.random() < 0.5:
+        candidates = [tile for tile in uncertain if rng.random() < 0.7]
+    mask = lambda indices: sum(1 << tile for tile in indices)
+    return Board(rng.randint(0, 6), rng.randint(0, 6), mask(hand), num_opponent_tiles, mask(uncertain),
+                 mask(played), candidates=mask(candidates) & mask(uncertain))
+
+
+def test_blocked_count_matches_combinations():
+    rng = random.Random(2)
+    for _ in range(3000):
+        board = random_position(rng)
+        assert board.left != EMPTY
+        legal_moves, draw_list = board.get_legal_moves("MIN")
+        assert legal_moves == combinations_min_moves(board)
+        assert draw_list == []
@@ -0,0 +1,42 @@
+"""
+El libro de aperturas solo responde cuando su entrada es al menos tan profunda como lo que
+alcanzaría la búsqueda con el presupuesto del Engine.
+"""
+import random
+
+import pytest
+
+from engine import Engine
+from game import DominoRules
+from openingbook import load_book
+
+
+@pytest.fixture
+def opening():
+    if load_book() is None:
+        pytest.skip("Sin libro de aperturas para los pesos actuales")
+    rules = DominoRules()
+    for seed in range(100):
+        rules.deal_dominoes(random.Random(seed))
+        board = rules.board_view(rules.player2, rules.player1)
+        if len(board.get_legal_moves("MAX")[0]) > 1:
+            return board
+
+
+def test_reachable_depth_grows_with_budget():
+    book = load_book()
+    if book is None:
+        pytest.skip("Sin libro de aperturas para los pesos actuales")
+    depths = [book.reachable_depth(budget) for budget in (0.0, 0.01, 0.1, 1.0, 10.0, 100.0)]
+    assert depths == sorted(depths) and depths[0] == 0 and depths[-1] > depths[1]
+
+
+def test_book_used_only_when_deep_enough(opening):
+    searcher = Engine('minimax', max_depth=8)
+    assert searcher.book.lookup(opening) is not None
+    move, stats = searcher.choose_move(opening, 0.001)
+    assert stats.engine == 'book' and move == searcher.book.lookup(opening)
+    # Con presupuesto de sobra la búsqueda llega a la profundidad 8, más que cualquier entrada
+    assert searcher.book.lookup(opening, 8) is None
+    move, stats = searcher.choose_move(opening, 100)
+    assert stats.engine == 'minimax' and stats.depth == 8
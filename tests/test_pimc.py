@@ -0,0 +1,25 @@
+"""
+El plazo de pimc_search con un pool de procesos: los lotes se dimensionan con el tiempo que queda
+y los que no terminan a tiempo se descartan.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import random
+from time import time
+
+import game
+from benchmark import random_midgame
+from pimc import pimc_search, root_moves
+
+
+def test_executor_search_keeps_time_budget():
+    rng = random.Random(3)
+    board = random_midgame(rng, hand_size=6, opponent_tiles=6, uncertain_size=14)
+    while len(root_moves(board)) == 1:
+        board = random_midgame(rng, hand_size=6, opponent_tiles=6, uncertain_size=14)
+    with ProcessPoolExecutor(max_workers=2, initializer=game.init_search_worker) as executor:
+        executor.submit(int).result()  # Arranca el pool fuera del tiempo medido
+        start = time()
+        _, move, solved = pimc_search(board, samples=10 ** 6, time_budget=0.3, executor=executor, workers=2)
+        elapsed = time() - start
+    assert solved > 0 and move in board.get_legal_moves("MAX")[0]
+    assert elapsed < 0.45
@@ -0,0 +1,170 @@
+"""
+Ajuste de los pesos de heuristica por autojuego con SPSA (aproximación estocástica por
+perturbación simultánea). En cada iteración todos los pesos elegidos se perturban a la vez en
+una dirección aleatoria de ±1, los pesos +c y -c se enfrentan en partidas sin interfaz (cada
+reparto se juega dos veces, con los pesos en los dos asientos) y la diferencia de puntos estima
+el gradiente. Las partidas se reparten en un pool de procesos y el estado se guarda en un
+checkpoint JSON tras cada iteración, así que un ajuste interrumpido se retoma con --resume.
+Los pesos resultantes se guardan en el formato de game.load_weights: copiados a
+heuristic_weights.json, Board los usa al arrancar.
+Uso: python tuning.py [--iterations 100] [--games 200] [--workers 4] [--agent minimax:2]
+                      [--params diversity ratio suit_control doubles] [--checkpoint tuning_checkpoint.json]
+                      [--resume] [--output tuned_weights.json]
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import random
+from time import perf_counter
+
+import game
+import selfplay
+
+DEFAULT_AGENT = 'minimax:2'
+DEFAULT_ITERATIONS = 100
+DEFAULT_GAMES = 200  # Partidas por iteración, en pares con el mismo reparto
+CHECKPOINT_PATH = 'tuning_checkpoint.json'
+OUTPUT_PATH = 'tuned_weights.json'
+# Pesos que se ajustan por defecto: la suma de puntos queda fuera porque distingue unos números de
+# otros y el libro de aperturas supone que la heurística no lo hace
+DEFAULT_PARAMS = ('diversity', 'diversity_offset', 'ratio', 'ratio_offset', 'suit_control', 'doubles')
+# Escala de cada peso: la perturbación y el paso de SPSA se miden en estas unidades
+PARAM_SCALES = {'diversity': 0.5, 'diversity_offset': 0.5, 'ratio': 0.05, 'ratio_offset': 0.05,
+                'pip_sum': 0.5, 'suit_control': 0.5, 'doubles': 0.5}
+# Ganancias de SPSA (Spall): a_k = STEP / (k + 1 + STABILITY)^ALPHA, c_k = PERTURBATION / (k + 1)^GAMMA
+STEP = 1.0
+STABILITY = 10
+PERTURBATION = 1.0
+ALPHA = 0.602
+GAMMA = 0.101
+
+
+def _match_task(args):
+    spec, seed, weights = args
+    return selfplay.play_game([spec, spec], seed, weights=weights).winner
+
+
+def match_score(first, second, spec, games, seed, executor=None):
+    """
+    Puntos de first contra second (ganar 1, empatar 0.5) como fracción de las partidas. Cada
+    semilla se juega con los pesos en un asiento y en el otro.
+    """
+    tasks = []
+    for index in range(games // 2):
+        tasks.append((spec, seed + index, (first, second)))
+        tasks.append((spec, seed + index, (second, first)))
+    if executor is not None:
+        winners = executor.map(_match_task, tasks, chunksize=max(1, len(tasks) // 64))
+    else:
+        winners = map(_match_task, tasks)
+    points = 0.0
+    for (_, _, (weights, _)), winner in zip(tasks, winners):
+        if winner == -1:
+            points += 0.5
+        elif (winner == 0) == (weights is first):
+            points += 1
+    return points / len(tasks)
+
+
+def perturbed(weights, params, direction, size):
+    """
+    Pesos desplazados size unidades de escala en la dirección dada (un ±1 por parámetro ajustado).
+    """
+    values = weights._asdict()
+    for name, sign in zip(params, direction):
+        values[name] += sign * size * PARAM_SCALES[name]
+    return game.HeuristicWeights(**values)
+
+
+def save_checkpoint(path, state):
+    """
+    Escribe el checkpoint de forma atómica: un ajuste interrumpido nunca deja un archivo a medias.
+    """
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as stream:
+        json.dump(state, stream, indent=2)
+    os.replace(temporary, path)
+
+
+def tune(iterations=DEFAULT_ITERATIONS, games=DEFAULT_GAMES, params=DEFAULT_PARAMS, spec=DEFAULT_AGENT,
+         workers=1, seed=0, checkpoint=CHECKPOINT_PATH, resume=False, progress=None):
+    """
+    Ajusta los pesos con SPSA partiendo de los del proceso (o del checkpoint si resume).
+    :param progress: Función opcional que recibe (iteración, puntos de +c contra -c, pesos).
+    :return: HeuristicWeights ajustados.
+    """
+    if resume and os.path.exists(checkpoint):
+        with open(checkpoint) as stream:
+            state = json.load(stream)
+    else:
+        unknown = set(params) - set(game.HeuristicWeights._fields)
+        if unknown:
+            raise ValueError(f"Pesos desconocidos: {', '.join(sorted(unknown))}")
+        state = {'iteration': 0, 'weights': game.HEURISTIC_WEIGHTS._asdict(), 'params': list(params),
+                 'agent': spec, 'games': games, 'seed': seed, 'history': []}
+    weights = game.HeuristicWeights(**state['weights'])
+    params, spec, games, seed = state['params'], state['agent'], state['games'], state['seed']
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for iteration in range(state['iteration'], iterations):
+            # La dirección depende solo de la semilla y la iteración: al retomar se repite igual
+            rng = random.Random(seed * 1000003 + iteration)
+            direction = [rng.choice((-1, 1)) for _ in params]
+            size = PERTURBATION / (iteration + 1) ** GAMMA
+            plus = perturbed(weights, params, direction, size)
+            minus = perturbed(weights, params, direction, -size)
+            score = match_score(plus, minus, spec, games, seed + iteration * games, executor)
+            # Gradiente de los puntos de +c (en unidades de escala) y paso de ascenso
+            difference = 2 * score - 1
+            step = STEP / (iteration + 1 + STABILITY) ** ALPHA
+            weights = perturbed(weights, params, [difference / (2 * size * sign) for sign in direction], step)
+            state['iteration'] = iteration + 1
+            state['weights'] = weights._asdict()
+            state['history'].append({'iteration': iteration, 'score': score, 'weights': weights._asdict()})
+            save_checkpoint(checkpoint, state)
+            if progress is not None:
+                progress(iteration, score, weights)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--games", type=int, default=DEFAULT_GAMES, help="Partidas por iteración")
+    parser.add_argument("--params", nargs='+', default=list(DEFAULT_PARAMS), choices=game.HeuristicWeights._fields)
+    parser.add_argument("--agent", default=DEFAULT_AGENT, help="Agente de selfplay que juega con los pesos")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--resume", action='store_true', help="Continúa desde el checkpoint")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    args = parser.parse_args()
+
+    start = perf_counter()
+
+    def progress(iteration, score, weights):
+        values = ', '.join(f"{name}={value:.4f}" for name, value in weights._asdict().items())
+        print(f"Iteración {iteration + 1}: +c {score:.3f} contra -c; {values} ({perf_counter() - start:.0f} s)")
+
+    weights = tune(args.iterations, args.games, args.params, args.agent, args.workers, args.seed,
+                   args.checkpoint, args.resume, progress)
+    game.save_weights(weights, args.output)
+    print(f"Pesos guardados en {args.output}")
+    # Comprobación final con repartos que el ajuste no usó
+    executor = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    try:
+        score = match_score(weights, game.DEFAULT_WEIGHTS, args.agent, args.games, args.seed + args.iterations * args.games,
+                            executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    print(f"Pesos ajustados contra los de defecto: {score:.3f} de los puntos en {args.games // 2 * 2} partidas")
+
+
+if __name__ == "__main__":
+    main()